@@ -33,3 +33,4 @@ class AquifersConfig(AppConfig):
 
     def ready(self):
         post_migrate.connect(post_migration_callback, sender=self)
+        import aquifers.signals #noqa
@@ -0,0 +1,48 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+import json
+import logging
+
+from django.core.management.base import BaseCommand
+
+from aquifers.notations import fetch_notation_aquifer_ids, parse_notation_aquifer_ids, store_notation_aquifer_ids
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Refresh the aquifers with water notations from DataBC, used when searching aquifers.
+
+    Run from command line:
+    python manage.py refresh_aquifer_notations
+    python manage.py refresh_aquifer_notations --file notations.json
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', type=str, nargs='?',
+                            help='Read a saved WFS (GeoJSON) response instead of asking DataBC',
+                            default=None)
+
+    def handle(self, *args, **options):
+        if options['file']:
+            with open(options['file']) as f:
+                aquifer_ids = parse_notation_aquifer_ids(json.load(f))
+        else:
+            aquifer_ids = fetch_notation_aquifer_ids()
+
+        added, removed = store_notation_aquifer_ids(aquifer_ids)
+        self.stdout.write(self.style.SUCCESS(
+            'Refreshed aquifer notations: {} aquifers, {} added, {} removed'.format(
+                len(aquifer_ids), added, removed)))
@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Adds aquifer_notation, a local copy of the aquifers with water notations in DataBC. Run the
+    refresh_aquifer_notations management command to fill it in.
+    """
+    dependencies = [
+        ('aquifers', '0039_add_material_subtype_to_aquifer_view'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AquiferNotation',
+            fields=[
+                ('aquifer_id', models.IntegerField(db_comment='The Aquifer Number of an aquifer with a water notation.', primary_key=True, serialize=False)),
+                ('update_date', models.DateTimeField(auto_now=True, db_comment='Date and time the notation was last seen in DataBC.')),
+            ],
+            options={
+                'db_table': 'aquifer_notation',
+                'ordering': ['aquifer_id'],
+            },
+        ),
+    ]
@@ -650,3 +650,24 @@ class AquiferResource(AuditModel):
 
     def __str__(self):
         return self.name
+
+
+class AquiferNotation(models.Model):
+    """
+    An aquifer with a water notation in DataBC (WHSE_WATER_MANAGEMENT.WLS_WATER_NOTATION_AQUIFERS_SP).
+    A local copy, kept up to date by the refresh_aquifer_notations management command, so searching
+    on notations doesn't depend on DataBC.
+    """
+    aquifer_id = models.IntegerField(
+        primary_key=True,
+        db_comment='The Aquifer Number of an aquifer with a water notation.')
+    update_date = models.DateTimeField(
+        auto_now=True,
+        db_comment='Date and time the notation was last seen in DataBC.')
+
+    class Meta:
+        db_table = 'aquifer_notation'
+        ordering = ['aquifer_id']
+
+    def __str__(self):
+        return '{}'.format(self.aquifer_id)
@@ -0,0 +1,88 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+import logging
+
+import requests
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from aquifers.models import AquiferNotation
+
+"""
+Aquifers with water notations, as listed by DataBC. Aquifer searches read them from the
+aquifer_notation table (through a short lived cache) instead of asking DataBC on every request;
+the refresh_aquifer_notations management command (run daily by a cronjob) brings the table up to date.
+Searches are never sent to DataBC: while the table is empty (e.g. straight after migrating, before the
+first refresh), searches ignore the notations filter.
+"""
+
+logger = logging.getLogger(__name__)
+
+NOTATIONS_URL = "https://openmaps.gov.bc.ca/geo/pub/wfs?SERVICE=WFS&VERSION=2.0.0" + \
+    "&REQUEST=GetFeature&outputFormat=json&srsName=epsg:4326" + \
+    "&typeNames=WHSE_WATER_MANAGEMENT.WLS_WATER_NOTATION_AQUIFERS_SP" + \
+    "&propertyName=AQUIFER_ID"
+NOTATIONS_REQUEST_TIMEOUT = 60
+
+NOTATIONS_CACHE_KEY = 'aquifers:notation_aquifer_ids'
+# The cache is per process, so a refresh by the management command is picked up by the web
+# processes once this expires.
+NOTATIONS_CACHE_TIMEOUT = 60 * 15
+
+
+def parse_notation_aquifer_ids(data):
+    """ The aquifer ids in a WFS GetFeature response (GeoJSON) for the notations layer. """
+    return {feature['properties']['AQUIFER_ID'] for feature in data['features']
+            if feature['properties'].get('AQUIFER_ID') is not None}
+
+
+def fetch_notation_aquifer_ids():
+    """ Ask DataBC for the aquifers with notations. """
+    resp = requests.get(NOTATIONS_URL, timeout=NOTATIONS_REQUEST_TIMEOUT)
+    resp.raise_for_status()
+    return parse_notation_aquifer_ids(resp.json())
+
+
+@transaction.atomic
+def store_notation_aquifer_ids(aquifer_ids):
+    """
+    Replace the stored notations with the given aquifer ids.
+
+    :return: (number added, number removed)
+    """
+    aquifer_ids = set(aquifer_ids)
+    existing = set(AquiferNotation.objects.values_list('aquifer_id', flat=True))
+
+    removed, _ = AquiferNotation.objects.exclude(aquifer_id__in=aquifer_ids).delete()
+    AquiferNotation.objects.filter(aquifer_id__in=existing & aquifer_ids).update(update_date=timezone.now())
+    AquiferNotation.objects.bulk_create(
+        [AquiferNotation(aquifer_id=aquifer_id) for aquifer_id in aquifer_ids - existing])
+
+    cache.delete(NOTATIONS_CACHE_KEY)
+    return len(aquifer_ids - existing), removed
+
+
+def notation_aquifer_ids():
+    """
+    The ids of aquifers with notations, from the local store, or None if none have been stored yet
+    (the notations filter is then ignored).
+    """
+    aquifer_ids = cache.get(NOTATIONS_CACHE_KEY)
+    if aquifer_ids is None:
+        aquifer_ids = list(AquiferNotation.objects.values_list('aquifer_id', flat=True))
+        if not aquifer_ids:
+            logger.warning('No aquifer notations stored, run the refresh_aquifer_notations command')
+        cache.set(NOTATIONS_CACHE_KEY, aquifer_ids, NOTATIONS_CACHE_TIMEOUT)
+    return aquifer_ids or None
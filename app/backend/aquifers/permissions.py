@@ -12,7 +12,7 @@
     limitations under the License.
 """
 from rest_framework.permissions import BasePermission, SAFE_METHODS
-from gwells.roles import AQUIFERS_EDIT_ROLE
+from gwells.roles import AQUIFERS_EDIT_ROLE, has_role
 
 
 class HasAquiferEditRoleOrReadOnly(BasePermission):
@@ -25,7 +25,7 @@ class HasAquiferEditRoleOrReadOnly(BasePermission):
             request.method in SAFE_METHODS or
             request.user and
             request.user.is_authenticated and
-            request.user.groups.filter(name=AQUIFERS_EDIT_ROLE).exists()
+            has_role(request.user, AQUIFERS_EDIT_ROLE)
         )
 
 
@@ -38,5 +38,5 @@ class HasAquiferEditRole(BasePermission):
         return (
             request.user and
             request.user.is_authenticated and
-            request.user.groups.filter(name=AQUIFERS_EDIT_ROLE).exists()
+            has_role(request.user, AQUIFERS_EDIT_ROLE)
         )
@@ -0,0 +1,39 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+from django.dispatch import receiver
+from django.db.models.signals import pre_save, post_save, post_delete
+
+from aquifers.models import Aquifer
+from gwells.tiles import AQUIFER_LAYERS, invalidate_tiles
+
+
+@receiver(pre_save, sender=Aquifer)
+def remember_tile_geom(sender, instance, **kwargs):
+    """
+    Keep the stored geometry of an aquifer so the vector tiles it was drawn on can be invalidated
+    once the save completes.
+    """
+    instance._tile_geom = None
+    if instance.pk and not instance._state.adding:
+        instance._tile_geom = sender.objects.filter(pk=instance.pk).values_list('geom', flat=True).first()
+
+
+@receiver(post_save, sender=Aquifer)
+def invalidate_aquifer_tiles(sender, instance, **kwargs):
+    invalidate_tiles(AQUIFER_LAYERS, [getattr(instance, '_tile_geom', None), instance.geom])
+
+
+@receiver(post_delete, sender=Aquifer)
+def invalidate_deleted_aquifer_tiles(sender, instance, **kwargs):
+    invalidate_tiles(AQUIFER_LAYERS, [instance.geom])
@@ -11,17 +11,28 @@
     See the License for the specific language governing permissions and
     limitations under the License.
 """
+import io
+import json
+import tempfile
+from unittest.mock import patch
+
 from django.contrib.gis.geos import GEOSGeometry
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
 from django.core.exceptions import ValidationError
 from django.contrib.auth.models import User, Group
 from django.utils import timezone
-from rest_framework.test import APITestCase
+from rest_framework.test import APITestCase, APIRequestFactory
 from rest_framework import status
 from rest_framework.reverse import reverse
 
-from aquifers.models import Aquifer
+from aquifers.models import Aquifer, AquiferMaterial, AquiferNotation
+from aquifers.notations import NOTATIONS_CACHE_KEY
+from aquifers.views_v2 import _aquifer_qs
+from aquifers.views import AQUIFER_EXPORT_FIELDS, aquifer_export_rows
 from gwells.settings import REST_FRAMEWORK
+from wells.models import AquiferParameters, Well
 from gwells.roles import roles_to_groups, AQUIFERS_EDIT_ROLE, AQUIFERS_VIEWER_ROLE
 
 # Create your tests here.
@@ -91,12 +102,102 @@ class TestAquifersEditRole(APITestCase):
             )
             self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_document_uploaded(self):
+        cache.set('documents:aquifer:1:public', [])
+        url = reverse('aquifer-document-uploaded', kwargs={'aquifer_id': 1, 'version': 'v1'})
+
+        response = self.client.post(url)
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertIsNone(cache.get('documents:aquifer:1:public'))
+
     def test_export_csv(self):
         url = reverse('aquifers-list-csv-v1')
         response = self.client.get(
             url
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(','), AQUIFER_EXPORT_FIELDS)
+        self.assertEqual(lines[1].split(',')[0], '1')
+
+    def test_export_rows_resolve_codes(self):
+        material = AquiferMaterial.objects.create(
+            code='TEST', description='Test material', display_order=1,
+            create_user='TEST_GWELLS', update_user='TEST_GWELLS')
+        Aquifer.objects.filter(aquifer_id=1).update(material=material, aquifer_name='Test aquifer')
+
+        rows = list(aquifer_export_rows(Aquifer.objects.all(), AQUIFER_EXPORT_FIELDS))
+
+        row = dict(zip(AQUIFER_EXPORT_FIELDS, rows[0]))
+        self.assertEqual(row['aquifer_name'], 'Test aquifer')
+        self.assertEqual(row['material'], str(material))
+        self.assertIsNone(row['subtype'])
+
+
+class TestAquiferNotations(APITestCase):
+    fixtures = ['aquifer_notations.json']
+
+    def setUp(self):
+        group = Group(name=AQUIFERS_EDIT_ROLE)
+        group.save()
+        user, _created = User.objects.get_or_create(username='test')
+        user.profile.username = user.username
+        user.save()
+        roles_to_groups(user, [AQUIFERS_EDIT_ROLE])
+        self.client.force_authenticate(user)
+        cache.delete(NOTATIONS_CACHE_KEY)
+        for aquifer_id in (1, 2, 3):
+            Aquifer(aquifer_id=aquifer_id).save()
+
+    def export_ids(self, **params):
+        response = self.client.get(reverse('aquifers-list-csv-v2'), params)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        return [line.split(',')[0] for line in lines[1:]]
+
+    @patch('aquifers.notations.requests.get')
+    def test_search_reads_local_notations(self, wfs_get):
+        self.assertEqual(self.export_ids(aquifer_notations='true'), ['2'])
+        self.assertEqual(self.export_ids(), ['1', '2', '3'])
+        wfs_get.assert_not_called()
+
+    @patch('aquifers.notations.requests.get')
+    def test_empty_notations_ignored(self, wfs_get):
+        # Straight after migrating nothing is stored, so the filter is ignored rather than asking DataBC.
+        AquiferNotation.objects.all().delete()
+
+        self.assertEqual(self.export_ids(aquifer_notations='true'), ['1', '2', '3'])
+        wfs_get.assert_not_called()
+
+    def test_refresh_command(self):
+        wfs_response = {'features': [{'properties': {'AQUIFER_ID': 1}}, {'properties': {'AQUIFER_ID': 3}}]}
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as f:
+            json.dump(wfs_response, f)
+            f.flush()
+            call_command('refresh_aquifer_notations', file=f.name, stdout=io.StringIO())
+
+        self.assertEqual(list(AquiferNotation.objects.values_list('aquifer_id', flat=True)), [1, 3])
+        self.assertEqual(self.export_ids(aquifer_notations='true'), ['1', '3'])
+
+
+class TestAquiferParametersFilter(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='test')
+        for aquifer_id in (1, 2, 3):
+            Aquifer(aquifer_id=aquifer_id).save()
+        tested_well = Well.objects.create(aquifer_id=1, create_user='test', update_user='test')
+        Well.objects.create(aquifer_id=2, create_user='test', update_user='test')
+        AquiferParameters.objects.create(well=tested_well, create_user='test', update_user='test')
+
+    def test_filter_is_a_single_query(self):
+        request = APIRequestFactory().get('/', {'resources__section__code': 'Q'})
+        request.user = self.user
+
+        # one query for the user's groups, and one for the aquifers
+        with self.assertNumQueries(2):
+            aquifer_ids = [aquifer.aquifer_id for aquifer in _aquifer_qs(request)]
+        self.assertEqual(aquifer_ids, [1])
 
 
 class TestAquifersSpatial(APITestCase):
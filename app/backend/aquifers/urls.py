@@ -94,6 +94,10 @@ urlpatterns = [
     re_path(api_path_prefix() + r'/aquifers/(?P<aquifer_id>[0-9]+)/presigned_put_url$',
         never_cache(views.PreSignedDocumentKey.as_view()), name='aquifer-pre-signed-url'),
 
+    # Document uploaded (aquifer records)
+    re_path(api_path_prefix() + r'/aquifers/(?P<aquifer_id>[0-9]+)/document_uploaded$',
+        never_cache(views.AquiferDocumentUploaded.as_view()), name='aquifer-document-uploaded'),
+
     # Document Deleting (aquifer records)
     re_path(api_path_prefix() + r'/aquifers/(?P<aquifer_id>[0-9]+)/delete_document$',
         never_cache(views.DeleteAquiferDocument.as_view()), name='aquifer-delete-document'),
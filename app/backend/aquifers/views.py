@@ -12,14 +12,14 @@
     limitations under the License.
 """
 import logging
-import csv
+import tempfile
 import openpyxl
-from openpyxl.writer.excel import save_virtual_workbook
-import requests
 
 from django_filters import rest_framework as djfilters
-from django.http import Http404, HttpResponse, JsonResponse, HttpResponseRedirect, StreamingHttpResponse
-from django.db.models import Q
+from django.http import (
+    FileResponse, Http404, HttpResponse, JsonResponse, HttpResponseRedirect, StreamingHttpResponse)
+from django.db.models import Case, CharField, Q, Value, When
+from django.db.models.functions import Concat
 from django.db import connection
 from django.views.decorators.cache import cache_page
 from django.utils import timezone
@@ -40,9 +40,10 @@ from rest_framework.pagination import PageNumberPagination
 
 from reversion.views import RevisionMixin
 
-from gwells.documents import MinioClient
-from gwells.roles import AQUIFERS_EDIT_ROLE
+from gwells.documents import MinioClient, invalidate_documents
+from gwells.roles import AQUIFERS_EDIT_ROLE, has_role
 from gwells.settings.base import get_env_variable
+from gwells.utils import csv_lines
 from gwells.views import AuditCreateMixin, AuditUpdateMixin
 from gwells.open_api import (
     get_geojson_schema,
@@ -58,6 +59,7 @@ from gwells.management.commands.export_databc import (
 
 from aquifers import models, serializers
 from aquifers.change_history import get_aquifer_history_diff
+from aquifers.notations import notation_aquifer_ids
 from aquifers.models import (
     Aquifer,
     AquiferResourceSection,
@@ -88,7 +90,7 @@ class AquiferEditDetailsAPIViewV1(RetrieveAPIView):
         now = timezone.now()
         qs = Aquifer.objects.all()
         # filter out any non-published aquifer if the user doesn't have the `aquifers_edit` perm
-        if not self.request.user.groups.filter(name=AQUIFERS_EDIT_ROLE).exists():
+        if not has_role(self.request.user, AQUIFERS_EDIT_ROLE):
             qs = qs.filter(effective_date__lte=now, expiry_date__gt=now)
         return qs
 
@@ -115,7 +117,7 @@ class AquiferRetrieveUpdateAPIView(RevisionMixin, AuditUpdateMixin, RetrieveUpda
         now = timezone.now()
         qs = Aquifer.objects.all()
         # filter out any non-published aquifer if the user doesn't have the `aquifers_edit` perm
-        if not self.request.user.groups.filter(name=AQUIFERS_EDIT_ROLE).exists():
+        if not has_role(self.request.user, AQUIFERS_EDIT_ROLE):
             qs = qs.filter(effective_date__lte=now, expiry_date__gt=now)
         return qs
 
@@ -146,19 +148,10 @@ def _aquifer_qs(request):
         filters.append(Q(subtype__code__in=serializers.HYDRAULIC_SUBTYPES))
 
     if notations:
-        # Get list of aquifers from DataBC that have notations
-        url = "https://openmaps.gov.bc.ca/geo/pub/wfs?SERVICE=WFS&VERSION=2.0.0" + \
-          "&REQUEST=GetFeature&outputFormat=json&srsName=epsg:4326" + \
-          "&typeNames=WHSE_WATER_MANAGEMENT.WLS_WATER_NOTATION_AQUIFERS_SP" + \
-          "&propertyName=AQUIFER_ID"
-        try:
-            resp = requests.get(url)
-            data = resp.json()
-            properties = [feature["properties"] for feature in data["features"]]
-            aquifer_ids = [prop["AQUIFER_ID"] for prop in properties]
+        # Aquifers that have notations in DataBC, from the local copy (ignored until it has been filled)
+        aquifer_ids = notation_aquifer_ids()
+        if aquifer_ids is not None:
             filters.append(Q(aquifer_id__in=aquifer_ids))
-        except Exception as e:
-            print("Cannot get aquifer notations, call to DataBC failed: " + e)
 
     # ignore missing and empty string for resources__section__code qs param
     if resources__section__code:
@@ -186,7 +179,7 @@ def _aquifer_qs(request):
         qs = qs.filter(disjunction)
 
     # exclude non-published and non-retired aquifer if the user doesn't have `aquifers_edit` perm
-    if not request.user.groups.filter(name=AQUIFERS_EDIT_ROLE).exists():
+    if not has_role(request.user, AQUIFERS_EDIT_ROLE):
         qs = qs.filter(effective_date__lte=timezone.now(), expiry_date__gt=timezone.now(), retire_date__gt=now)
 
     qs = qs.select_related(
@@ -346,8 +339,7 @@ class ListFiles(APIView):
         })
     )})
     def get(self, request, aquifer_id, **kwargs):
-        user_is_staff = self.request.user.groups.filter(
-            name=AQUIFERS_EDIT_ROLE).exists()
+        user_is_staff = has_role(self.request.user, AQUIFERS_EDIT_ROLE)
 
         client = MinioClient(
             request=request, disable_private=(not user_is_staff))
@@ -376,7 +368,7 @@ class AquiferNameList(ListAPIView):
         now = timezone.now()
         qs = Aquifer.objects.all()
         # filter out any non-published aquifer if the user doesn't have the `aquifers_edit` perm
-        if not self.request.user.groups.filter(name=AQUIFERS_EDIT_ROLE).exists():
+        if not has_role(self.request.user, AQUIFERS_EDIT_ROLE):
             qs = qs.filter(effective_date__lte=now, expiry_date__gt=now, retire_date__gt=now)
         return qs
 
@@ -446,6 +438,23 @@ class PreSignedDocumentKey(APIView):
         return JsonResponse({"object_name": object_name, "url": url})
 
 
+class AquiferDocumentUploaded(APIView):
+    """
+    Called once a document has been uploaded with a pre-signed key
+
+    post:
+    Clear the aquifer's cached document listing, so the new document is listed.
+    """
+
+    permission_classes = (HasAquiferEditRole,)
+
+    @swagger_auto_schema(auto_schema=None)
+    def post(self, request, aquifer_id, **kwargs):
+        invalidate_documents(int(aquifer_id), "aquifer")
+
+        return HttpResponse(status=204)
+
+
 class DeleteAquiferDocument(APIView):
     """
     Delete a document from a S3 compatible store.
@@ -472,6 +481,7 @@ class DeleteAquiferDocument(APIView):
             int(aquifer_id), "aquifer") + "/" + request.GET.get("filename")
         client.delete_document(
             object_name, bucket_name=bucket_name, private=is_private)
+        invalidate_documents(int(aquifer_id), "aquifer")
 
         return HttpResponse(status=204)
 
@@ -591,7 +601,7 @@ def aquifer_geojson_simplified_v1(request, **kwargs):
     FROM aquifer
     """
 
-    if not request.user.groups.filter(name=AQUIFERS_EDIT_ROLE).exists():
+    if not has_role(request.user, AQUIFERS_EDIT_ROLE):
         sql += "WHERE effective_date <= NOW() AND expiry_date >= NOW() AND retire_date >= NOW()"
 
     iterator = GeoJSONIterator(
@@ -619,37 +629,80 @@ AQUIFER_EXPORT_FIELDS = [
 ]
 
 
-def csv_export(request, **kwargs):
+# Code tables in the exports, written out as "code - description" (how they display).
+AQUIFER_EXPORT_CODE_FIELDS = (
+    'material',
+    'subtype',
+    'vulnerability',
+    'productivity',
+    'demand',
+)
+
+# Aquifers are read from the database this many at a time when exporting.
+EXPORT_CHUNK_SIZE = 2000
+
+XLSX_MIME_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def _code_description(field):
+    return Case(
+        When(**{'{}__isnull'.format(field): False},
+             then=Concat('{}__code'.format(field), Value(' - '), '{}__description'.format(field))),
+        default=None,
+        output_field=CharField())
+
+
+def aquifer_export_rows(queryset, fields):
     """
-    Export aquifers as CSV. This is done in a vanilla functional Django view instead of DRF,
-    because DRF doesn't have native CSV support.
+    The rows of an aquifer export. Only the exported columns are selected (so aquifer geometries
+    are never loaded), code tables are resolved to their descriptions in the query, and rows are
+    read from a server side cursor a chunk at a time.
     """
+    annotations = {}
+    columns = []
+    for field in fields:
+        if field in AQUIFER_EXPORT_CODE_FIELDS:
+            annotations['export_{}'.format(field)] = _code_description(field)
+            columns.append('export_{}'.format(field))
+        else:
+            columns.append(field)
+    return queryset.annotate(**annotations).values_list(*columns).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
 
-    # Create the HttpResponse object with the appropriate CSV header.
-    response = HttpResponse(content_type='text/csv')
+def csv_export_response(fields, rows):
+    # Stream the rows, so the export doesn't have to be held in memory.
+    response = StreamingHttpResponse(csv_lines(fields, rows), content_type='text/csv')
     response['Content-Disposition'] = 'attachment; filename="aquifers.csv"'
-    writer = csv.writer(response)
-    writer.writerow(AQUIFER_EXPORT_FIELDS)
+    return response
 
-    queryset = _aquifer_qs(request)
-    for aquifer in queryset:
-        writer.writerow([getattr(aquifer, f) for f in AQUIFER_EXPORT_FIELDS])
 
+def xlsx_export_response(fields, rows):
+    # A write only workbook keeps rows on disk as they're added, rather than building the whole
+    # sheet in memory. openpyxl can't write to a stream, so the workbook is saved to a temporary file.
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(fields)
+    for row in rows:
+        ws.append(['' if value is None else str(value) for value in row])
+    outfile = tempfile.NamedTemporaryFile(delete=True)
+    wb.save(outfile.name)
+    response = FileResponse(outfile, content_type=XLSX_MIME_TYPE)
+    response['Content-Disposition'] = 'attachment; filename=aquifers.xlsx'
     return response
 
 
+def csv_export(request, **kwargs):
+    """
+    Export aquifers as CSV. This is done in a vanilla functional Django view instead of DRF,
+    because DRF doesn't have native CSV support.
+    """
+    queryset = _aquifer_qs(request)
+    return csv_export_response(AQUIFER_EXPORT_FIELDS, aquifer_export_rows(queryset, AQUIFER_EXPORT_FIELDS))
+
+
 def xlsx_export(request, **kwargs):
     """
     Export aquifers as XLSX.
     """
-
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.append(AQUIFER_EXPORT_FIELDS)
     queryset = _aquifer_qs(request)
-    for aquifer in queryset:
-        ws.append([str(getattr(aquifer, f)) for f in AQUIFER_EXPORT_FIELDS])
-    response = HttpResponse(content=save_virtual_workbook(
-        wb), content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=aquifers.xlsx'
-    return response
+    return xlsx_export_response(AQUIFER_EXPORT_FIELDS, aquifer_export_rows(queryset, AQUIFER_EXPORT_FIELDS))
@@ -12,14 +12,10 @@
     limitations under the License.
 """
 import logging
-import csv
-import openpyxl
-from openpyxl.writer.excel import save_virtual_workbook
-import requests
 from django_filters import rest_framework as djfilters
-from django.http import HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.http import HttpResponseRedirect, StreamingHttpResponse
 from django.db import connection
-from django.db.models import Q, Func, TextField
+from django.db.models import Exists, OuterRef, Q, Func, TextField
 from django.db.models.functions import Cast
 from django.contrib.gis.db.models.functions import Transform
 from django.views.decorators.cache import cache_page
@@ -42,12 +38,15 @@ from gwells.management.commands.export_databc import (
 )
 from gwells.roles import (
   AQUIFERS_EDIT_ROLE,
-  AQUIFERS_VIEWER_ROLE
+  AQUIFERS_VIEWER_ROLE,
+  has_role
 )
 from aquifers import serializers, serializers_v2
 from aquifers.models import Aquifer
-from wells.models import Well, AquiferParameters
+from wells.models import AquiferParameters
 from aquifers.filters import BoundingBoxFilterBackend
+from aquifers.notations import notation_aquifer_ids
+from aquifers.views import aquifer_export_rows, csv_export_response, xlsx_export_response
 from aquifers.permissions import HasAquiferEditRole, HasAquiferEditRoleOrReadOnly
 
 logger = logging.getLogger(__name__)
@@ -65,7 +64,7 @@ class AquiferEditDetailsAPIViewV2(RetrieveAPIView):
         now = timezone.now()
         qs = Aquifer.objects.all()
         # filter out any non-published aquifer if the user doesn't have the `aquifers_edit` perm
-        if not self.request.user.groups.filter(name=AQUIFERS_EDIT_ROLE).exists():
+        if not has_role(self.request.user, AQUIFERS_EDIT_ROLE):
             qs = qs.filter(effective_date__lte=now, expiry_date__gt=now)
         return qs
 
@@ -88,14 +87,14 @@ class AquiferRetrieveUpdateAPIViewV2(RevisionMixin, AuditUpdateMixin, RetrieveUp
         now = timezone.now()
         qs = Aquifer.objects.all()
         # filter out any non-published aquifer if the user doesn't have the `aquifers_edit` perm
-        if not self.request.user.groups.filter(name=AQUIFERS_EDIT_ROLE).exists():
+        if not has_role(self.request.user, AQUIFERS_EDIT_ROLE):
             qs = qs.filter(effective_date__lte=now, expiry_date__gt=now)
         return qs
 
     def get(self, request, *args, **kwargs):
         """ Removes notes field for users without the aquifer view role """
         response = super().get(self, request, *args, **kwargs)
-        if not request.user.groups.filter(name=AQUIFERS_VIEWER_ROLE).exists():
+        if not has_role(request.user, AQUIFERS_VIEWER_ROLE):
             response.data.pop('notes', None)
         return response
 
@@ -133,19 +132,10 @@ def _aquifer_qs(request):
         filters.append(Q(expiry_date__lt=now))
 
     if notations:
-        # Get list of aquifers from DataBC that have notations
-        url = "https://openmaps.gov.bc.ca/geo/pub/wfs?SERVICE=WFS&VERSION=2.0.0" + \
-          "&REQUEST=GetFeature&outputFormat=json&srsName=epsg:4326" + \
-          "&typeNames=WHSE_WATER_MANAGEMENT.WLS_WATER_NOTATION_AQUIFERS_SP" + \
-          "&propertyName=AQUIFER_ID"
-        try:
-            resp = requests.get(url)
-            data = resp.json()
-            properties = [feature["properties"] for feature in data["features"]]
-            aquifer_ids = [prop["AQUIFER_ID"] for prop in properties]
+        # Aquifers that have notations in DataBC, from the local copy (ignored until it has been filled)
+        aquifer_ids = notation_aquifer_ids()
+        if aquifer_ids is not None:
             filters.append(Q(aquifer_id__in=aquifer_ids))
-        except Exception as e:
-            print("Cannot get aquifer notations, call to DataBC failed: " + e)
 
     # ignore missing and empty string for resources__section__code qs param
     # remove Aquifer parameters code from resource__section__code if present and set a flag
@@ -177,7 +167,7 @@ def _aquifer_qs(request):
         qs = qs.filter(disjunction)
 
     # filter out any non-published aquifer if the user doesn't have the `aquifers_edit` perm
-    if not request.user.groups.filter(name=AQUIFERS_EDIT_ROLE).exists():
+    if not has_role(request.user, AQUIFERS_EDIT_ROLE):
         qs = qs.filter(effective_date__lte=now, expiry_date__gt=now)
 
     qs = qs.select_related(
@@ -189,21 +179,10 @@ def _aquifer_qs(request):
 
     qs = qs.distinct()
 
-    # if Aquifer parameters flag is set, obtain list of wells with aquifer parameters set and compare its aquifer id against the original query set
-    # remove aquifers that doesn't have a match from the original query set
+    # if Aquifer parameters flag is set, only keep aquifers with a well that has aquifer parameters,
+    # checked in the database as a semi-join on the well and aquifer parameters foreign key indexes
     if (aquifer_parameters):
-        # Get wells that are associated with an aquifer
-        well_qs = Well.objects.filter(aquifer_id__isnull=False)
-        # Get AquiferParameter records with a non null well_tag_number
-        aquifer_parameter_qs = AquiferParameters.objects.filter(Q(well__isnull=False)).values()
-        # Make an array with just well_tag_number and strip out everything else
-        aquiferparameter_well_tag_array = [aquiferparameter['well_id'] for aquiferparameter in aquifer_parameter_qs]
-        # Filter wells queryset to get only the wells with aquifer parameters
-        wells_with_ap_qs = well_qs.filter(well_tag_number__in = aquiferparameter_well_tag_array)
-        # Make an array with just aquifer_id and strip out everything else
-        well_aquifer_id_array = [well.aquifer_id for well in wells_with_ap_qs]
-        # Filter Aquifer queryset to get only aquifers that have a well with aquifer parameters
-        qs = qs.filter(aquifer_id__in = well_aquifer_id_array)
+        qs = qs.filter(Exists(AquiferParameters.objects.filter(well__aquifer=OuterRef('pk'))))
 
     return qs
 
@@ -347,34 +326,15 @@ def csv_export_v2(request, **kwargs):
     Export aquifers as CSV. This is done in a vanilla functional Django view instead of DRF,
     because DRF doesn't have native CSV support.
     """
-
-    # Create the HttpResponse object with the appropriate CSV header.
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="aquifers.csv"'
-    writer = csv.writer(response)
-    writer.writerow(AQUIFER_EXPORT_FIELDS_V2)
-
     qs = _aquifer_qs(request)
     qs = qs.filter(retire_date__gt=timezone.now()) # filter out retired aquifers
-    for aquifer in qs:
-        writer.writerow([getattr(aquifer, f) for f in AQUIFER_EXPORT_FIELDS_V2])
-
-    return response
+    return csv_export_response(AQUIFER_EXPORT_FIELDS_V2, aquifer_export_rows(qs, AQUIFER_EXPORT_FIELDS_V2))
 
 
 def xlsx_export_v2(request, **kwargs):
     """
     Export aquifers as XLSX.
     """
-
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.append(AQUIFER_EXPORT_FIELDS_V2)
     qs = _aquifer_qs(request)
     qs = qs.filter(retire_date__gt=timezone.now()) # filter out retired aquifers
-    for aquifer in qs:
-        ws.append([str(getattr(aquifer, f)) for f in AQUIFER_EXPORT_FIELDS_V2])
-    response = HttpResponse(content=save_virtual_workbook(
-        wb), content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=aquifers.xlsx'
-    return response
+    return xlsx_export_response(AQUIFER_EXPORT_FIELDS_V2, aquifer_export_rows(qs, AQUIFER_EXPORT_FIELDS_V2))
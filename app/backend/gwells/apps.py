@@ -33,3 +33,5 @@ class GWellsConfig(AppConfig):
 
     def ready(self):
         post_migrate.connect(post_migration_callback, sender=self)
+        from gwells.code_tables import connect_code_table_signals
+        connect_code_table_signals()
@@ -11,21 +11,51 @@
     See the License for the specific language governing permissions and
     limitations under the License.
 """
+import hashlib
+import json
+import time
 import jwt
 
 from datetime import datetime
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.utils import timezone
 from rest_framework import exceptions
 from rest_framework.request import Request
 from rest_framework_simplejwt.authentication import JWTTokenUserAuthentication
 from gwells.models import Profile
-from gwells.roles import roles_to_groups
+from gwells.roles import roles_to_groups, user_roles
 from gwells.settings.base import get_env_variable
 
 KEYCLOAK_GOLD_REALM_URL = 'loginproxy.gov.bc.ca/auth/realms/standard'
 
+# The user id and roles of an authenticated token are cached for this long (or until the token expires,
+# if sooner), so repeat requests with the same token don't decode it or sync the user again. The user is
+# still loaded on every request, so a deactivated user loses access straight away.
+TOKEN_CACHE_TIMEOUT = 60 * 5
+# The claims last synced to a user are kept for this long. A new token with the same claims (e.g.
+# after a token refresh) then only loads the user, instead of updating the user, profile and groups.
+CLAIMS_CACHE_TIMEOUT = 60 * 30
+
+# The claims copied to the user, profile and groups.
+SYNCED_CLAIMS = (
+    'iss',
+    'aud',
+    'sub',
+    'auth_time',
+    'email',
+    'family_name',
+    'preferred_username',
+    'name',
+    'identity_provider',
+    'idir_username',
+    'bceid_username',
+    'client_roles',
+    'realm_access',
+)
+
+
 class JwtOidcAuthentication(JWTTokenUserAuthentication):
     """
     Authenticate users who provide a JSON Web Token in the request headers (e.g. Authorization: JWT xxxxxxxxx)
@@ -33,8 +63,6 @@ class JwtOidcAuthentication(JWTTokenUserAuthentication):
 
     def authenticate(self, request: Request):
 
-        User = get_user_model()
-
         header = self.get_header(request)
         if header is None:
             return None
@@ -44,6 +72,15 @@ class JwtOidcAuthentication(JWTTokenUserAuthentication):
             return None
 
         jwt_string = bytes.decode(raw_token)
+        token_key = 'auth:token:{}'.format(hashlib.sha256(raw_token).hexdigest())
+        cached = cache.get(token_key)
+        if cached is not None:
+            user = self.load_user(*cached)
+            if user is not None:
+                return user, jwt_string
+            # Deactivated or deleted since the token was cached: authenticate the token from scratch.
+            cache.delete(token_key)
+
         payload = jwt.decode(jwt_string,
                              "-----BEGIN PUBLIC KEY-----\n" +
                              get_env_variable('SSO_PUBKEY') +
@@ -67,6 +104,52 @@ class JwtOidcAuthentication(JWTTokenUserAuthentication):
             raise exceptions.AuthenticationFailed(
                 'Preferred username is invalid.')
 
+        claims = json.dumps({claim: payload.get(claim) for claim in SYNCED_CLAIMS}, sort_keys=True)
+        claims_key = 'auth:claims:{}'.format(realm_user_id)
+        user = self.get_synced_user(claims_key, claims)
+        if user is None:
+            user = self.sync_user(payload, realm_user_id)
+            cache.set(claims_key, (claims, user.id, user_roles(user)), CLAIMS_CACHE_TIMEOUT)
+
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+
+        timeout = TOKEN_CACHE_TIMEOUT
+        if payload.get('exp'):
+            timeout = min(timeout, int(payload['exp'] - time.time()))
+        if timeout > 0:
+            cache.set(token_key, (user.id, user_roles(user)), timeout)
+
+        return user, jwt_string
+
+    @staticmethod
+    def load_user(user_id, roles):
+        """
+        The active user with user_id (and their profile), with the roles they were last synced with, or
+        None if the user has been deactivated or deleted.
+        """
+        user = get_user_model().objects.select_related('profile').filter(id=user_id, is_active=True).first()
+        if user is not None:
+            user._roles = roles
+        return user
+
+    def get_synced_user(self, claims_key, claims):
+        """
+        The active user, if their claims haven't changed since they were last synced, or None.
+        """
+        synced = cache.get(claims_key)
+        if synced is None or synced[0] != claims:
+            return None
+        _claims, user_id, roles = synced
+        return self.load_user(user_id, roles)
+
+    def sync_user(self, payload, realm_user_id):
+        """
+        Get or create the user for the token, and bring the user, their profile and their groups up to
+        date with the token's claims.
+        """
+        User = get_user_model()
+
         # There are various values we can get from the Token, we don't technically need most of them,
         # but they are useful to put in the user table for debugging purposes.
         payload_user_mapping = {
@@ -180,7 +263,7 @@ class JwtOidcAuthentication(JWTTokenUserAuthentication):
         # Put user in groups based on role.
         roles_to_groups(user, roles)
 
-        return user, jwt_string
+        return user
 
     @staticmethod
     def is_gold_shared_realm(payload):
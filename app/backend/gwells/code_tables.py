@@ -0,0 +1,111 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+import hashlib
+import json
+import logging
+
+from django.apps import apps
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models.signals import post_save, post_delete
+from django.utils import timezone
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from gwells.models import CodeTableModel, BasicCodeTableModel
+
+"""
+Cache for the option lists built from code tables (e.g. the dropdowns on the submission forms).
+
+Cached options are keyed by a code table version, which is bumped whenever a code table row is saved
+or deleted, so a change shows up on the next request. The cache is per process, so other processes
+pick up a change when their copy expires (CODE_TABLE_CACHE_TIMEOUT). Options leave out codes past their
+expiry date, so they are also keyed by the current date.
+"""
+
+logger = logging.getLogger(__name__)
+
+CODE_TABLE_VERSION_KEY = 'code_tables:version'
+# Short, as the version is only bumped in the process that saved the change.
+CODE_TABLE_CACHE_TIMEOUT = 60 * 5
+
+# Tables used for options that don't extend CodeTableModel or BasicCodeTableModel.
+OTHER_CODE_TABLE_MODELS = (
+    'wells.WaterQualityCharacteristic',
+    'registries.RegionalArea',
+)
+
+
+def code_table_version():
+    version = cache.get(CODE_TABLE_VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.add(CODE_TABLE_VERSION_KEY, version, None)
+    return version
+
+
+def bump_code_table_version(**kwargs):
+    """ Signal receiver: drops every cached set of options by moving to a new version. """
+    cache.set(CODE_TABLE_VERSION_KEY, code_table_version() + 1, None)
+
+
+def is_code_table(model):
+    return issubclass(model, (CodeTableModel, BasicCodeTableModel)) or \
+        model._meta.label in OTHER_CODE_TABLE_MODELS
+
+
+def connect_code_table_signals():
+    """ Bump the code table version whenever any code table changes. """
+    for model in apps.get_models():
+        if is_code_table(model):
+            post_save.connect(bump_code_table_version, sender=model,
+                              dispatch_uid='code_table_version_save')
+            post_delete.connect(bump_code_table_version, sender=model,
+                                dispatch_uid='code_table_version_delete')
+
+
+def cached_options(name, build):
+    """
+    Returns (options, etag) for the options built by build(), from the cache if the code tables
+    haven't changed since they were built today.
+
+    The options are stored as they are rendered (JSON types), and the ETag is a hash of them, so it
+    is the same in every process.
+    """
+    key = 'code_tables:{}:{}:{}'.format(name, code_table_version(), timezone.localdate().isoformat())
+    cached = cache.get(key)
+    if cached is None:
+        content = json.dumps(build(), cls=DjangoJSONEncoder, sort_keys=True)
+        etag = '"{}"'.format(hashlib.md5(content.encode('utf-8')).hexdigest())
+        cached = (json.loads(content), etag)
+        cache.set(key, cached, CODE_TABLE_CACHE_TIMEOUT)
+    return cached
+
+
+def cached_options_response(request, name, build):
+    """
+    A response with the cached options, or 304 Not Modified if the client already has them
+    (If-None-Match).
+    """
+    options, etag = cached_options(name, build)
+    # Weak comparison, as GZipMiddleware makes the ETag weak when it compresses the response.
+    client_etags = [tag[2:] if tag.startswith('W/') else tag
+                    for tag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))]
+    if etag in client_etags or '*' in client_etags:
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(options)
+    response['ETag'] = etag
+    return response
@@ -11,18 +11,108 @@
     See the License for the specific language governing permissions and
     limitations under the License.
 """
-import sys
 import os
 import logging
 import re
+import socket
+import threading
 from datetime import timedelta
 from django.urls import reverse
 from urllib.parse import quote, unquote_plus
+from django.core.cache import cache
+import certifi
+import urllib3
+from urllib3.connection import HTTPConnection
 from minio import Minio
 from gwells.settings.base import get_env_variable
 
 logger = logging.getLogger(__name__)
 
+# Minio clients are shared by every request (and thread) in a process, so that connections,
+# including their TLS sessions, are kept alive and reused rather than set up for each document call.
+MINIO_POOL_SIZE = int(get_env_variable('MINIO_POOL_SIZE', 10, warn=False))
+MINIO_KEEPALIVE = get_env_variable('MINIO_KEEPALIVE', '1', warn=False) == '1'
+MINIO_TIMEOUT = int(get_env_variable('MINIO_TIMEOUT', 300, warn=False))
+
+# Large files (e.g. the well exports) are uploaded in parts, several parts at a time.
+UPLOAD_PART_SIZE = 16 * 1024 * 1024
+UPLOAD_PARALLEL_PARTS = int(get_env_variable('MINIO_UPLOAD_PARALLEL_PARTS', 4, warn=False))
+
+_minio_clients = {}
+_minio_clients_lock = threading.Lock()
+
+# Document listings are cached briefly, as detail pages list a resource's documents on every view.
+# Completed uploads and deletes clear the listing for the resource (see invalidate_documents), but only
+# in the process that handled them, so listings are only kept for a minute.
+PUBLIC_DOCUMENTS_CACHE_TIMEOUT = 60
+PRIVATE_DOCUMENTS_CACHE_TIMEOUT = 60
+
+
+def get_minio_client(host, access_key=None, secret_key=None, secure=True):
+    """ Returns the process-wide Minio client for a host and account, creating it on first use """
+    key = (host, access_key, secret_key, bool(secure))
+    client = _minio_clients.get(key)
+    if client is None:
+        with _minio_clients_lock:
+            client = _minio_clients.get(key)
+            if client is None:
+                client = Minio(host, access_key=access_key, secret_key=secret_key, secure=bool(secure),
+                               http_client=_create_pool_manager())
+                _minio_clients[key] = client
+    return client
+
+
+def get_public_minio_client():
+    """ The Minio client for the public document/export storage (S3_HOST) """
+    return get_minio_client(
+        get_env_variable('S3_HOST'),
+        access_key=get_env_variable('S3_PUBLIC_ACCESS_KEY', warn=False),
+        secret_key=get_env_variable('S3_PUBLIC_SECRET_KEY', warn=False),
+        secure=get_env_variable('S3_USE_SECURE', '1', warn=False) == '1')
+
+
+def get_private_minio_client():
+    """ The Minio client for the private document storage (S3_PRIVATE_HOST) """
+    return get_minio_client(
+        get_env_variable('S3_PRIVATE_HOST'),
+        access_key=get_env_variable('MINIO_ROOT_USER'),
+        secret_key=get_env_variable('MINIO_ROOT_PASSWORD'),
+        secure=get_env_variable('S3_USE_SECURE', '1', warn=False) == '1')
+
+
+def _create_pool_manager():
+    """ The same connection pool Minio creates by default, with a configurable size and TCP keep-alive """
+    socket_options = HTTPConnection.default_socket_options
+    if MINIO_KEEPALIVE:
+        socket_options = socket_options + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+    return urllib3.PoolManager(
+        maxsize=max(MINIO_POOL_SIZE, UPLOAD_PARALLEL_PARTS),
+        block=False,
+        timeout=urllib3.Timeout(connect=MINIO_TIMEOUT, read=MINIO_TIMEOUT),
+        cert_reqs='CERT_REQUIRED',
+        ca_certs=os.environ.get('SSL_CERT_FILE') or certifi.where(),
+        socket_options=socket_options,
+        retries=urllib3.Retry(total=5, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504]),
+    )
+
+
+def upload_file(client, bucket_name, object_name, filename):
+    """ Uploads a local file, in parallel parts if it is larger than UPLOAD_PART_SIZE """
+    return client.fput_object(bucket_name, object_name, filename,
+                              part_size=UPLOAD_PART_SIZE, num_parallel_uploads=UPLOAD_PARALLEL_PARTS)
+
+
+def _documents_cache_key(document_id, resource, private):
+    return 'documents:{}:{}:{}'.format(resource, document_id, 'private' if private else 'public')
+
+
+def invalidate_documents(document_id, resource='well'):
+    """ Clear the cached document listings for a well, aquifer or driller """
+    cache.delete_many([
+        _documents_cache_key(document_id, resource, private=False),
+        _documents_cache_key(document_id, resource, private=True),
+    ])
+
 
 class MinioClient():
     """ Load a minio client to handle public and/or private file requests
@@ -62,7 +152,7 @@ class MinioClient():
             self.use_secure = int(get_env_variable(
                 'S3_USE_SECURE', 1, warn=False))
 
-            self.public_client = Minio(
+            self.public_client = get_minio_client(
                 self.public_host,
                 access_key=self.public_access_key,
                 secret_key=self.public_secret_key,
@@ -82,7 +172,7 @@ class MinioClient():
         self.private_aquifers_bucket = get_env_variable('S3_PRIVATE_AQUIFER_BUCKET', default_value="aquifer-docs")
         self.private_drillers_bucket = get_env_variable('S3_PRIVATE_REGISTRANT_BUCKET', default_value="driller-docs")
 
-        return Minio(
+        return get_minio_client(
             self.private_host,
             access_key=self.private_access_key,
             secret_key=self.private_secret_key,
@@ -206,17 +296,8 @@ class MinioClient():
 
         # provide all requests with a "public" collection of documents
         if self.public_client:
-            pub_objects = []
-            try:
-                pub_objects = self.create_url_list(
-                    self.public_client.list_objects(
-                        public_bucket, prefix=prefix, recursive=True),
-                    self.public_host, public_bucket)
-            except Exception as e:
-                logger.error(
-                    "Could not retrieve files from public file server", exc_info=e)
-
-            objects['public'] = pub_objects
+            objects['public'] = self.get_cached_documents(
+                document_id, resource, self.public_client, public_bucket, prefix, self.public_host)
 
         # authenticated requests also receive a "private" collection
         if include_private and not self.disable_private:
@@ -227,20 +308,33 @@ class MinioClient():
             elif resource == 'driller':
                 private_bucket = self.private_drillers_bucket
 
-            priv_objects = []
-            try:
-                priv_objects = self.create_url_list(
-                    self.private_client.list_objects(
-                        private_bucket, prefix=prefix, recursive=True),
-                    self.private_host, private_bucket, private=True)
-            except:
-                logger.error(
-                    "Could not retrieve files from private file server", exc_info=sys.exc_info())
-
-            objects['private'] = priv_objects
+            objects['private'] = self.get_cached_documents(
+                document_id, resource, self.private_client, private_bucket, prefix, self.private_host,
+                private=True)
 
         return objects
 
+    def get_cached_documents(self, document_id, resource, client, bucket_name, prefix, host, private=False):
+        """Lists the documents with a prefix, from the cache if they were listed recently"""
+        key = _documents_cache_key(document_id, resource, private)
+        documents = cache.get(key)
+        if documents is not None:
+            return documents
+
+        try:
+            documents = self.create_url_list(
+                client.list_objects(bucket_name, prefix=prefix, recursive=True),
+                host, bucket_name, private=private)
+        except Exception as e:
+            logger.error(
+                "Could not retrieve files from %s file server", 'private' if private else 'public', exc_info=e)
+            # Don't cache a failed listing
+            return []
+
+        timeout = PRIVATE_DOCUMENTS_CACHE_TIMEOUT if private else PUBLIC_DOCUMENTS_CACHE_TIMEOUT
+        cache.set(key, documents, timeout)
+        return documents
+
     def get_presigned_put_url(self, object_name, bucket_name=None, private=False):
         """Retrieves the a presigned URL for putting objects into an S3 source"""
         if private:
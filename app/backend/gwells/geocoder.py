@@ -0,0 +1,277 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import Retry
+from django.utils import timezone
+
+from gwells.models import GeocodeResult
+from gwells.settings.base import get_env_variable
+
+"""
+Requests to the BC Geocoder (https://geocoder.api.gov.bc.ca).
+
+Every request in a process goes through one pooled requests.Session and one rate limiter, which slows
+down when the geocoder's RateLimit-Remaining header runs low. Address and reverse (nearest site) lookups
+are stored in the geocode_result table, keyed by the normalised address or rounded coordinates, so the
+same address or location is only geocoded once. The *_many methods look up a batch at a time: cached
+results in one query, and the rest concurrently.
+"""
+
+logger = logging.getLogger(__name__)
+
+GEOCODER_ADDRESSES_URL = 'https://geocoder.api.gov.bc.ca/addresses.json'
+GEOCODER_NEAREST_SITE_URL = 'https://geocoder.api.gov.bc.ca/sites/nearest.json'
+
+GEOCODER_WORKERS = int(get_env_variable('GEOCODER_WORKERS', 8, warn=False))
+GEOCODER_TIMEOUT = 10
+# Cached results are looked up again after this long, in case the address data changed.
+GEOCODE_CACHE_MAX_AGE = timedelta(days=int(get_env_variable('GEOCODE_CACHE_MAX_AGE_DAYS', 180, warn=False)))
+
+# The geocoder allows 1000 requests a minute: pause when fewer than RATE_LIMIT_RESERVE are left.
+RATE_LIMIT_RESERVE = 30
+RATE_LIMIT_PAUSE = 2
+
+# 5 decimal places of a degree is about a metre.
+COORDINATE_PRECISION = 5
+
+MAX_KEY_LENGTH = 255
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """ The process-wide pooled session for geocoder requests """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=1, pool_maxsize=GEOCODER_WORKERS,
+                    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504]))
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+
+class RateLimiter():
+    """ Holds back requests for a while once the geocoder says the rate limit is nearly used up """
+
+    def __init__(self, reserve=RATE_LIMIT_RESERVE, pause=RATE_LIMIT_PAUSE):
+        self.reserve = reserve
+        self.pause = pause
+        self.paused_until = 0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            delay = self.paused_until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def update(self, response):
+        pause = None
+        if response.status_code == 429:
+            pause = self.pause
+            try:
+                pause = max(pause, int(response.headers.get('Retry-After')))
+            except (TypeError, ValueError):
+                pass
+        else:
+            try:
+                remaining = int(response.headers.get('RateLimit-Remaining'))
+            except (TypeError, ValueError):
+                return
+            if remaining < self.reserve:
+                pause = self.pause
+        if pause:
+            logger.info('Approaching the geocoder rate limit, pausing requests for %s seconds', pause)
+            with self.lock:
+                self.paused_until = max(self.paused_until, time.monotonic() + pause)
+
+
+rate_limiter = RateLimiter()
+
+
+def _normalise(value):
+    return ' '.join(str(value).lower().split())
+
+
+def _cache_key(kind, params):
+    key = '{}:{}'.format(kind, urlencode(sorted(params.items())))
+    if len(key) > MAX_KEY_LENGTH:
+        key = '{}:{}'.format(kind, hashlib.sha256(key.encode('utf-8')).hexdigest())
+    return key
+
+
+def first_feature(data):
+    """ The first feature of a geocoder response, or None if it has none """
+    if not isinstance(data, dict):
+        return None
+    features = data.get('features')
+    return features[0] if features else None
+
+
+class Geocoder():
+    """
+    Geocodes addresses and reverse geocodes locations with the BC Geocoder, through the results cache.
+
+    e.g.:
+    geocoder = Geocoder()
+    geocoder.geocode_many([{"addressString": "101 main st.", "localityName": "Kelowna"}, ...])
+    geocoder.reverse_geocode_many([(-123.36, 48.43), ...])
+
+    session can be another object with requests.Session's get() (e.g. a stub for tests).
+    """
+
+    def __init__(self, session=None, workers=GEOCODER_WORKERS, limiter=rate_limiter):
+        self.session = session or get_session()
+        self.workers = workers
+        self.limiter = limiter
+
+    def get(self, url, params=None):
+        """ A rate limited GET request to the geocoder """
+        self.limiter.wait()
+        response = self.session.get(url, params=params, timeout=GEOCODER_TIMEOUT)
+        self.limiter.update(response)
+        return response
+
+    def geocode(self, options):
+        """
+        The first addresses.json feature for an address, e.g. {"addressString": "101 main st.",
+        "localityName": "Kelowna"}, or None if there is no match. Raises HTTPError if the request fails.
+        """
+        return self.geocode_many([options], raise_errors=True)[0]
+
+    def geocode_many(self, options_list, raise_errors=False):
+        """ geocode() for each of options_list. Results are None for addresses that could not be geocoded. """
+        return self._many('address', options_list, self._fetch_address, raise_errors)
+
+    def reverse_geocode(self, x, y, distance_start=200, distance_increment=200, distance_max=2000):
+        """
+        The properties of the nearest site to x/y (EPSG:4326), with 'distance', the search radius it was
+        found within (metres). The radius starts at distance_start and grows by distance_increment up to
+        distance_max. Returns None if there is no site within distance_max.
+        """
+        return self.reverse_geocode_many(
+            [(x, y)], distance_start, distance_increment, distance_max, raise_errors=True)[0]
+
+    def reverse_geocode_many(self, points, distance_start=200, distance_increment=200, distance_max=2000,
+                             raise_errors=False):
+        """ reverse_geocode() for each of points ((x, y) tuples). """
+        return self._many(
+            'site',
+            [{'point': '{:.{p}f},{:.{p}f}'.format(float(x), float(y), p=COORDINATE_PRECISION),
+              'distance_start': distance_start,
+              'distance_increment': distance_increment,
+              'distance_max': distance_max}
+             for x, y in points],
+            self._fetch_nearest_site, raise_errors)
+
+    def _fetch_address(self, options):
+        response = self.get(GEOCODER_ADDRESSES_URL, params=options)
+        response.raise_for_status()
+        data = response.json()
+        if not isinstance(data, dict):
+            raise ValueError('Unexpected geocoder response')
+        return first_feature(data)
+
+    def _fetch_nearest_site(self, params):
+        distance = int(params['distance_start'])
+        while distance <= int(params['distance_max']):
+            response = self.get(GEOCODER_NEAREST_SITE_URL, params={
+                'point': params['point'],
+                'outputFormat': 'json',
+                'maxDistance': distance,
+            })
+            if response.status_code == 200:
+                address = response.json().get('properties', {})
+                if address:
+                    address['distance'] = distance
+                    return address
+                return None
+            # Retry the whole lookup later if the geocoder is unavailable or busy, rather than
+            # searching further out.
+            if response.status_code == 429 or response.status_code >= 500:
+                response.raise_for_status()
+            distance += int(params['distance_increment'])
+        return None
+
+    def _many(self, kind, params_list, fetch, raise_errors):
+        """
+        Results for each of params_list: from the cache, or from fetch(params) for those that aren't cached
+        (run concurrently, then cached). Failed requests give None (and aren't cached), or raise if
+        raise_errors is set.
+        """
+        keys = []
+        params_by_key = {}
+        for params in params_list:
+            params = {name: value for name, value in params.items() if value not in (None, '')}
+            key = _cache_key(kind, {name: _normalise(value) for name, value in params.items()})
+            keys.append(key)
+            params_by_key.setdefault(key, params)
+
+        results = {
+            cached.key: cached.result for cached in GeocodeResult.objects.filter(
+                key__in=list(params_by_key), update_date__gte=timezone.now() - GEOCODE_CACHE_MAX_AGE)
+        }
+        missing = [key for key in params_by_key if key not in results]
+
+        def fetch_result(key):
+            try:
+                return key, fetch(params_by_key[key]), None
+            except Exception as e:
+                return key, None, e
+
+        fetched = {}
+        if missing:
+            with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(missing)))) as executor:
+                for key, result, error in executor.map(fetch_result, missing):
+                    if error is None:
+                        fetched[key] = result
+                    elif raise_errors:
+                        raise error
+                    else:
+                        logger.warning('Geocoder request failed for %s', key, exc_info=error)
+
+        if fetched:
+            now = timezone.now()
+            GeocodeResult.objects.bulk_create(
+                [GeocodeResult(key=key, result=result, update_date=now) for key, result in fetched.items()],
+                update_conflicts=True, unique_fields=['key'], update_fields=['result', 'update_date'])
+            results.update(fetched)
+
+        return [results.get(key) for key in keys]
+
+
+_geocoder = None
+
+
+def get_geocoder():
+    """ The process-wide Geocoder, using the pooled session """
+    global _geocoder
+    if _geocoder is None:
+        _geocoder = Geocoder()
+    return _geocoder
@@ -15,13 +15,18 @@ import logging
 import json
 import os
 import datetime
+import gzip
 from decimal import Decimal
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.db import connection
 
-from minio import Minio
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
+from gwells.documents import get_private_minio_client, get_public_minio_client, upload_file
 from gwells.settings.base import get_env_variable
 from gwells.management.commands import ResultIter
 
@@ -32,6 +37,18 @@ python manage.py export_databc
 During development/testing it may be useful to instead run:
 python manage.py export_databc --cleanup=0 --upload=0
 
+To only re-render the features that changed since the last export, and splice them into the previously
+published files, run:
+python manage.py export_databc --incremental=1
+
+Changes made only to joined tables (e.g. licences or code table descriptions) don't touch the update_date
+of the exported rows, so an incremental export still rebuilds each layer in full once the last full
+rebuild is older than --max-age hours (24 by default):
+python manage.py export_databc --incremental=1 --max-age=168
+
+Compressed copies (e.g. wells.json.gz) can be published next to each file with:
+python manage.py export_databc --compress=gzip,br
+
 This command runs in an OpenShift cronjob, defined in export.cj.json
 """
 
@@ -587,6 +604,46 @@ FROM aquifer AS a
 """)
 AQUIFER_CHUNK_SIZE = 100
 
+# The v1 aquifer export only contains the first polygon of each aquifer and no retire_date. Adding the
+# v1 geometry to the v2 query lets both versions be written from a single query.
+AQUIFERS_SQL = AQUIFERS_SQL_V2.replace(
+    'ST_AsGeoJSON(ST_Transform(a.geom, 4326)) :: json AS "geometry",',
+    'ST_AsGeoJSON(ST_Transform(a.geom, 4326)) :: json AS "geometry",\n'
+    '    ST_AsGeoJSON(ST_Transform(ST_GeometryN(a.geom, 1), 4326)) :: json AS "geometry_v1",', 1)
+
+# Used by the incremental export to find the features that changed since the last export. Wells are
+# also considered changed when their casings (used for the diameter column) or lithology changed.
+WELLS_CHANGED_SQL = ("""
+select well_tag_number from well where update_date > %(since)s
+union
+select well_tag_number from casing where update_date > %(since)s and well_tag_number is not null
+""")
+
+LITHOLOGY_CHANGED_SQL = (WELLS_CHANGED_SQL + """
+union
+select well_tag_number from lithology_description
+    where update_date > %(since)s and well_tag_number is not null
+""")
+
+# Aquifers also drop in or out of the export as their effective, expiry and retire dates pass.
+AQUIFERS_CHANGED_SQL = ("""
+select aquifer_id from aquifer
+where
+    update_date > %(since)s
+    or effective_date between %(since)s and now()
+    or expiry_date between %(since)s and now()
+    or retire_date between %(since)s and now()
+""")
+
+# The keys that still exist, so that the incremental export can drop features that were deleted since the
+# previous export.
+WELLS_KEYS_SQL = 'select well_tag_number from well'
+AQUIFERS_KEYS_SQL = 'select aquifer_id from aquifer'
+
+# The high-water mark is moved back by this much, so that rows saved by transactions that were still
+# open when an export started are picked up by the next export.
+WATERMARK_OVERLAP = datetime.timedelta(minutes=10)
+
 
 class LazyEncoder(json.JSONEncoder):
 
@@ -598,6 +655,10 @@ class LazyEncoder(json.JSONEncoder):
         return super().default(obj)
 
 
+GEOJSON_HEADER = '{"type": "FeatureCollection","features": ['
+GEOJSON_FOOTER = ']}'
+
+
 class GeoJSONIterator():
 
     def __init__(self, sql, chunk_size, cursor, bounds=None):
@@ -612,10 +673,10 @@ class GeoJSONIterator():
         self.fields = self.get_fields(cursor)
 
     def get_header(self):
-        return """{"type": "FeatureCollection","features": ["""
+        return GEOJSON_HEADER
 
     def get_footer(self):
-        return ']}'
+        return GEOJSON_FOOTER
 
     def format_record(self, record):
         """ Write a single record to file."""
@@ -663,6 +724,140 @@ class GeoJSONIterator():
                 return self.get_footer()
 
 
+class GeoJSONWriter():
+    """
+    Writes one version of a layer to a GeoJSON file, in the same format as GeoJSONIterator.
+
+    Each writer picks its own geometry and properties out of the columns of a shared query, so that
+    several versions of a layer can be written from a single pass over the database.
+
+    When a previous file is given, the features in it are merged with the features written to this
+    writer (both must be ordered by key); previous features whose key is in changed, or is missing from
+    existing (when given), are dropped.
+    """
+
+    def __init__(self, target, geometry='geometry', exclude=(), compress=(),
+                 key=None, previous=None, changed=(), existing=None):
+        self.target = target
+        self.geometry = geometry
+        self.exclude = set(exclude)
+        self.compress = compress
+        self.key = key
+        self.previous = previous
+        self.changed = changed
+        self.existing = existing
+        self.files = []
+        self.previous_features = None
+        self.next_previous = None
+        self.first_record = True
+        self.geometry_index = None
+        self.properties = None
+        self.key_index = None
+
+    def open(self):
+        self.files.append(open(self.target, 'w'))
+        if 'gzip' in self.compress:
+            self.files.append(gzip.open('{}.gz'.format(self.target), 'wt'))
+        if 'br' in self.compress:
+            self.files.append(BrotliFile('{}.br'.format(self.target)))
+        if self.previous:
+            self.previous_file = open(self.previous, 'r')
+            self.previous_features = (
+                feature for feature in read_features(self.previous_file, self.key)
+                if feature[0] not in self.changed and (self.existing is None or feature[0] in self.existing))
+            self.next_previous = next(self.previous_features, None)
+        self.write('{}\n'.format(GEOJSON_HEADER))
+
+    def set_fields(self, fields):
+        """ Work out which columns of the query make up this version of the layer. """
+        self.geometry_index = fields.index(self.geometry)
+        self.properties = [(index, field) for index, field in enumerate(fields)
+                           if field != self.geometry and field not in self.exclude]
+        if self.key:
+            self.key_index = fields.index(self.key)
+
+    def format_record(self, record):
+        feature = {
+            'type': 'Feature',
+            'geometry': record[self.geometry_index],
+            'properties': {}
+        }
+        for index, field in self.properties:
+            feature['properties'][field] = record[index]
+        return json.dumps(feature, cls=LazyEncoder)
+
+    def write_record(self, record):
+        if self.previous_features is not None:
+            self.write_previous(record[self.key_index])
+        self.write_feature(self.format_record(record))
+
+    def write_previous(self, until=None):
+        """
+        Write the previous features ordered before until (or all of them). Previous features with the
+        same key as until are replaced by the new features, so they are skipped.
+        """
+        while self.next_previous is not None and (until is None or self.next_previous[0] <= until):
+            if until is None or self.next_previous[0] < until:
+                self.write_feature(self.next_previous[1])
+            self.next_previous = next(self.previous_features, None)
+
+    def write_feature(self, feature):
+        if self.first_record:
+            self.first_record = False
+        else:
+            feature = ',{}'.format(feature)
+        self.write('\n{}\n'.format(feature))
+
+    def write(self, data):
+        for f in self.files:
+            f.write(data)
+
+    def close(self):
+        if self.previous_features is not None:
+            self.write_previous()
+            self.previous_file.close()
+        self.write('{}\n'.format(GEOJSON_FOOTER))
+        for f in self.files:
+            f.close()
+        self.files = []
+
+    def output_files(self):
+        """ The files produced by this writer. """
+        files = [self.target]
+        if 'gzip' in self.compress:
+            files.append('{}.gz'.format(self.target))
+        if 'br' in self.compress:
+            files.append('{}.br'.format(self.target))
+        return files
+
+
+class BrotliFile():
+    """ Minimal text file interface over a streaming brotli compressor. """
+
+    def __init__(self, filename):
+        self.file = open(filename, 'wb')
+        self.compressor = brotli.Compressor()
+
+    def write(self, data):
+        self.file.write(self.compressor.process(data.encode('utf-8')))
+
+    def close(self):
+        self.file.write(self.compressor.finish())
+        self.file.close()
+
+
+def read_features(previous_file, key):
+    """
+    Yield (key, feature json) for each feature in a file written by GeoJSONWriter,
+    which writes one feature per line.
+    """
+    for line in previous_file:
+        line = line.strip().lstrip(',')
+        if not line.startswith('{"type": "Feature",'):
+            continue
+        yield (json.loads(line)['properties'][key], line)
+
+
 class Command(BaseCommand):
 
     def __init__(self):
@@ -677,45 +872,119 @@ class Command(BaseCommand):
         self.wells_filename = 'wells.json'
         self.aquifers_filename = 'aquifers.json'
         self.lithology_filename = 'lithology.json'
+        self.state_filename = 'export_databc_state.json'
+        self.previous_prefix = 'previous_'
+        self.incremental = False
+        self.max_age = None
+        self.compress = ()
+        self.states = {}
+        self.previous_files = []
+        # Each layer is read with a single query, and written out for every version.
+        # The properties excluded for a version are columns only used by another version.
+        self.layers = [
+            {
+                'name': 'lithology',
+                'filename': self.lithology_filename,
+                'sql': LITHOLOGY_SQL,
+                'chunk_size': LITHOLOGY_CHUNK_SIZE,
+                'key': 'well_tag_number',
+                'changed_sql': LITHOLOGY_CHANGED_SQL,
+                'keys_sql': WELLS_KEYS_SQL,
+                'changed_bounds': 'and well.well_tag_number in ({changed_sql})',
+                'versions': {
+                    self.version1: {},
+                    self.version2: {},
+                },
+            },
+            {
+                'name': 'wells',
+                'filename': self.wells_filename,
+                'sql': WELLS_SQL_V1,
+                'chunk_size': WELL_CHUNK_SIZE,
+                'key': 'well_tag_number',
+                'changed_sql': WELLS_CHANGED_SQL,
+                'keys_sql': WELLS_KEYS_SQL,
+                'changed_bounds': 'and well.well_tag_number in ({changed_sql})',
+                'versions': {
+                    self.version1: {},
+                    self.version2: {'exclude': ('surface_seal_length', )},
+                },
+            },
+            {
+                'name': 'aquifers',
+                'filename': self.aquifers_filename,
+                'sql': AQUIFERS_SQL,
+                'chunk_size': AQUIFER_CHUNK_SIZE,
+                'key': 'aquifer_id',
+                'changed_sql': AQUIFERS_CHANGED_SQL,
+                'keys_sql': AQUIFERS_KEYS_SQL,
+                'changed_bounds': 'AND a.aquifer_id in ({changed_sql})',
+                'versions': {
+                    self.version1: {'geometry': 'geometry_v1', 'exclude': ('geometry', 'retire_date')},
+                    self.version2: {'exclude': ('geometry_v1', )},
+                },
+            },
+        ]
 
     def add_arguments(self, parser):
         # Arguments added for debugging purposes.
         # e.g. don't cleanup, don't upload: python manage.py export_databc --cleanup=0 --upload=0
         parser.add_argument('--cleanup', type=int, nargs='?', help='If 1, remove file when done', default=1)
         parser.add_argument('--upload', type=int, nargs='?', help='If 1, upload the file', default=1)
+        parser.add_argument('--incremental', type=int, nargs='?',
+                            help=('If 1, only re-render features changed since the last export and splice '
+                                  'them into the previously published files'),
+                            default=0)
+        parser.add_argument('--max-age', type=int, nargs='?',
+                            help=('Hours after which an incremental export rebuilds a layer in full, to '
+                                  'pick up changes made only to joined tables'),
+                            default=24)
+        parser.add_argument('--compress', type=str, nargs='?',
+                            help='Comma separated list of compressed copies to create (gzip, br)',
+                            default='')
 
     def handle(self, *args, **options):
         """
         Entry point for Django Command.
-        for each version (v1, v2), generate our outputs,
+        generate the outputs of every version in a single pass over each layer,
             upload our files if option is set,
             cleanup our filesystem if option is set
         """
-        files = (self.wells_filename, self.aquifers_filename, self.lithology_filename)
+        self.incremental = options['incremental'] == 1
+        self.max_age = datetime.timedelta(hours=options['max_age'])
+        self.compress = tuple(c.strip() for c in options['compress'].split(',') if c.strip())
+        for compression in self.compress:
+            if compression not in ('gzip', 'br'):
+                raise CommandError('Unknown compression {}'.format(compression))
+        if 'br' in self.compress and brotli is None:
+            raise CommandError('The brotli package is required for br compression')
+
+        self.states = {version: self.load_state(version) if self.incremental else {}
+                       for version in self.versions}
+
+        files = {version: [] for version in self.versions}
+        for layer in self.layers:
+            for version, version_files in self.generate_layer(layer).items():
+                files[version].extend(version_files)
 
         for version in self.versions:
-            self.generate_by_version(version)
+            state_file = self.save_state(version)
             if options['upload'] == 1:
-                self.upload_files(files, version)
+                self.upload_files(files[version], version)
+                # Only recorded once the files it describes have been published.
+                self.upload_state(state_file, version)
+            files[version].append(state_file)
 
         if options['cleanup'] == 1:
-            self.cleanup(files)
+            self.cleanup([filename for version in self.versions for filename in files[version]] +
+                         self.previous_files)
 
         logger.info('GeoJSON export complete.')
         self.stdout.write(self.style.SUCCESS('GeoJSON export complete.'))
 
-    def generate_by_version(self, version):
-        """
-        generate outputs for each version.
-        wells and lithology are the same outputs for both version1 and version2
-        aquifer outputs differ between versions so always output
-        :param version: the version number of the file to generate data for
-        """
-        logger.info(f'Starting GeoJSON {version} export.')
-        if version == self.version1:
-            self.generate_lithology(self.lithology_filename)
-        self.generate_wells(self.wells_filename, version)
-        self.generate_aquifers(self.aquifers_filename, version)
+    def local_filename(self, filename, version):
+        """ Every version is generated at once, so the local copies are prefixed with the version. """
+        return '{}_{}'.format(version, filename)
 
     def cleanup(self, files):
         """Delete all local files GeoJSON files."""
@@ -725,68 +994,166 @@ class Command(BaseCommand):
 
     def upload_files(self, files, version):
         """Upload files to S3 bucket."""
-        is_secure = get_env_variable('S3_USE_SECURE', '1', warn=False) == '1'
-        minio_client = Minio(get_env_variable('S3_HOST'),
-                             access_key=get_env_variable('S3_PUBLIC_ACCESS_KEY'),
-                             secret_key=get_env_variable('S3_PUBLIC_SECRET_KEY'),
-                             secure=is_secure)
+        minio_client = get_public_minio_client()
+        prefix = self.local_filename('', version)
         for filename in files:
             logger.info('uploading {}'.format(filename))
-            with open(filename, 'rb') as file_data:
-                file_stat = os.stat(filename)
-                target = f'api/{version}/gis/{filename}'
-                bucket = get_env_variable('S3_WELL_EXPORT_BUCKET')
-                logger.debug(
-                    'uploading {} to {}/{}'.format(filename, bucket, target))
-                minio_client.put_object(bucket,
-                                        target,
-                                        file_data,
-                                        file_stat.st_size)
-
-    def generate_geojson_chunks(self, sql, target, chunk_size):
-        logger.info('Generating GeoJSON for {}'.format(target))
-        # Open JSON file to write to.
+            target = f'api/{version}/gis/{filename[len(prefix):]}'
+            bucket = get_env_variable('S3_WELL_EXPORT_BUCKET')
+            logger.debug(
+                'uploading {} to {}/{}'.format(filename, bucket, target))
+            upload_file(minio_client, bucket, target, filename)
+
+    def download_file(self, filename, target, version):
+        """
+        Download a previously published file from the S3 bucket.
+        Returns False if the file could not be downloaded.
+        """
+        source = f'api/{version}/gis/{filename}'
+        try:
+            get_public_minio_client().fget_object(get_env_variable('S3_WELL_EXPORT_BUCKET'), source, target)
+        except Exception as e:
+            logger.warning('Unable to download {}: {}'.format(source, e))
+            return False
+        return True
+
+    def state_object_name(self, version):
+        """ The export state is internal, so it is kept in the private bucket rather than with the files. """
+        return f'export_databc/{version}/{self.state_filename}'
+
+    def upload_state(self, filename, version):
+        """Upload the export state to the private S3 bucket."""
+        bucket = get_env_variable('S3_PRIVATE_BUCKET')
+        target = self.state_object_name(version)
+        logger.debug('uploading {} to {}/{}'.format(filename, bucket, target))
+        upload_file(get_private_minio_client(), bucket, target, filename)
+
+    def load_state(self, version):
+        """
+        Load the high-water marks recorded by the previous export of this version, along with when each
+        layer was last rebuilt in full. An empty state means every layer gets a full rebuild.
+        """
+        target = self.previous_prefix + self.local_filename(self.state_filename, version)
+        self.previous_files.append(target)
+        source = self.state_object_name(version)
+        try:
+            get_private_minio_client().fget_object(get_env_variable('S3_PRIVATE_BUCKET'), source, target)
+        except Exception as e:
+            logger.warning('Unable to download {}: {}'.format(source, e))
+            return {}
+        with open(target, 'r') as f:
+            state = json.load(f)
+        states = {}
+        for layer, value in state.items():
+            if not isinstance(value, dict):
+                # State files written before full rebuilds were recorded only hold the high-water mark.
+                value = {'since': value, 'full': None}
+            states[layer] = {key: datetime.datetime.fromisoformat(value[key]) if value[key] else None
+                             for key in ('since', 'full')}
+        return states
+
+    def save_state(self, version):
+        filename = self.local_filename(self.state_filename, version)
+        with open(filename, 'w') as f:
+            json.dump({layer: {key: value.isoformat() for key, value in layer_state.items()}
+                       for layer, layer_state in self.states[version].items()}, f)
+        return filename
+
+    def get_watermark(self):
+        """ The high-water mark for an export starting now. """
         with connection.cursor() as cursor:
-            with open(target, 'w') as f:
-                reader = GeoJSONIterator(sql, chunk_size, cursor)
-                count = 0
-                for item in reader:
-                    f.write('{}\n'.format(item))
-                    count += 1
-
-    def generate_lithology(self, filename):
-        self.generate_geojson_chunks(LITHOLOGY_SQL.format(bounds=''),
-                                     filename,
-                                     LITHOLOGY_CHUNK_SIZE)
-
-    def generate_aquifers(self, filename, version):
+            cursor.execute('select now()')
+            return cursor.fetchone()[0] - WATERMARK_OVERLAP
+
+    def needs_full_rebuild(self, layer, watermark):
+        """ True if any version of a layer has no full rebuild recorded within max_age of watermark. """
+        for version in layer['versions']:
+            state = self.states[version].get(layer['name'])
+            if not state or not state['full'] or watermark - state['full'] > self.max_age:
+                return True
+        return False
+
+    def get_previous_files(self, layer):
         """
-        based on version, use the applicable sql statement version to
-            generate our geojson chunks in a file
-        :param filename: the filename to generate our geojson chunk into
-        :param version: the version number of the sql statement to use
+        Download the previously published files of a layer for an incremental export.
+        Returns None if any version is missing a previous file or high-water mark.
         """
-        if version == self.version2:
-            self.generate_geojson_chunks(AQUIFERS_SQL_V2.format(bounds=''),
-                                         filename,
-                                         AQUIFER_CHUNK_SIZE)
-        else:
-            self.generate_geojson_chunks(AQUIFERS_SQL_V1.format(bounds=''),
-                                         filename,
-                                         AQUIFER_CHUNK_SIZE)
+        previous = {}
+        for version in layer['versions']:
+            target = self.previous_prefix + self.local_filename(layer['filename'], version)
+            self.previous_files.append(target)
+            if not self.states[version].get(layer['name']) or \
+                    not self.download_file(layer['filename'], target, version):
+                return None
+            previous[version] = target
+        return previous
 
-    def generate_wells(self, filename, version):
+    def generate_layer(self, layer):
         """
-        based on version, use the applicable sql statement version to
-            generate our geojson chunks in a file
-        :param filename: the filename to generate our geojson chunk into
-        :param version: the version number of the sql statement to use
+        Generate the GeoJSON files for every version of a layer, either in full or, in incremental mode,
+        by splicing the changed features into the previously published files.
+        Returns the files generated for each version.
         """
-        if version == self.version2:
-            self.generate_geojson_chunks(WELLS_SQL_V2.format(bounds=''),
-                                         filename,
-                                         AQUIFER_CHUNK_SIZE)
+        watermark = self.get_watermark()
+        previous = None
+        if self.incremental and not self.needs_full_rebuild(layer, watermark):
+            previous = self.get_previous_files(layer)
+
+        if previous:
+            states = [self.states[version][layer['name']] for version in layer['versions']]
+            params = {'since': min(state['since'] for state in states)}
+            full = min(state['full'] for state in states)
+            with connection.cursor() as cursor:
+                cursor.execute(layer['changed_sql'], params)
+                changed = set(row[0] for row in ResultIter(cursor, WELL_CHUNK_SIZE))
+                # Features whose key no longer exists were deleted since the previous export.
+                cursor.execute(layer['keys_sql'])
+                existing = set(row[0] for row in ResultIter(cursor, WELL_CHUNK_SIZE))
+            logger.info('Splicing {} changed features into {}'.format(len(changed), layer['filename']))
+            bounds = layer['changed_bounds'].format(changed_sql=layer['changed_sql'])
         else:
-            self.generate_geojson_chunks(WELLS_SQL_V1.format(bounds=''),
-                                         filename,
-                                         WELL_CHUNK_SIZE)
+            logger.info('Generating GeoJSON for {}'.format(layer['filename']))
+            params = None
+            full = watermark
+            changed = set()
+            existing = None
+            bounds = ''
+
+        writers = {}
+        for version, options in layer['versions'].items():
+            writers[version] = GeoJSONWriter(
+                self.local_filename(layer['filename'], version),
+                compress=self.compress,
+                key=layer['key'],
+                previous=previous[version] if previous else None,
+                changed=changed,
+                existing=existing,
+                **options)
+        self.generate_geojson_chunks(layer['sql'].format(bounds=bounds), params,
+                                     list(writers.values()), layer['chunk_size'])
+
+        for version in layer['versions']:
+            self.states[version][layer['name']] = {'since': watermark, 'full': full}
+        return {version: writer.output_files() for version, writer in writers.items()}
+
+    def generate_geojson_chunks(self, sql, params, writers, chunk_size):
+        """
+        Read the query once through a server side cursor and hand every row to each writer.
+        """
+        for writer in writers:
+            writer.open()
+        try:
+            with connection.chunked_cursor() as cursor:
+                cursor.execute(sql, params)
+                fields = None
+                for record in ResultIter(cursor, chunk_size):
+                    if fields is None:
+                        # Server side cursors only have a description once rows have been fetched.
+                        fields = [column[0] for column in cursor.description]
+                        for writer in writers:
+                            writer.set_fields(fields)
+                    for writer in writers:
+                        writer.write_record(record)
+        finally:
+            for writer in writers:
+                writer.close()
@@ -0,0 +1,25 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    """
+    Adds geocode_result, the cache of BC Geocoder results used by gwells.geocoder.
+    """
+    dependencies = [
+        ('gwells', '0008_profile_silver_keycloak_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodeResult',
+            fields=[
+                ('key', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('update_date', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'geocode_result',
+            },
+        ),
+    ]
@@ -21,6 +21,7 @@ from django.contrib.gis.db import models
 from django.contrib.auth.models import User
 from django.dispatch import receiver
 from django.db.models.signals import post_save
+from django.utils import timezone
 
 from ..db_comments.model_mixins import DBComments
 from .common import *
@@ -73,6 +74,23 @@ class Border(models.Model):
     geom = models.MultiPolygonField(srid=4269)
 
 
+class GeocodeResult(models.Model, DBComments):
+    """
+    A BC Geocoder answer, kept so the same address or location isn't geocoded again (see gwells.geocoder).
+    The key is the kind of request with its normalised address or rounded coordinates. A null result
+    means the geocoder found no match.
+    """
+    key = models.CharField(primary_key=True, max_length=255)
+    result = models.JSONField(blank=True, null=True)
+    update_date = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'geocode_result'
+
+    db_table_comment = ('Cached BC Geocoder results, by normalised address or rounded coordinates, so the '
+                        'same address or location is not geocoded more than once.')
+
+
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
     if created:
@@ -1,5 +1,5 @@
 from collections import OrderedDict
-from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
 from rest_framework.response import Response
 
 
@@ -23,3 +23,13 @@ def apiLimitedPagination(limit):
     return C
 
 APILimitOffsetPagination = apiLimitedPagination(100)
+
+
+class APICursorPagination(CursorPagination):
+    """
+    Keyset pagination: each page is found by filtering on the ordering of the last page instead of with an
+    OFFSET, so later pages cost the same as the first. Subclasses set the ordering.
+    """
+    page_size = 100
+    page_size_query_param = 'limit'
+    max_page_size = 100
@@ -16,7 +16,8 @@ from gwells.roles import (
     SURVEYS_EDIT_ROLE,
     BULK_WELL_AQUIFER_CORRELATION_UPLOAD,
     BULK_AQUIFER_DOCUMENTS_UPLOAD,
-    BULK_VERTICAL_AQUIFER_EXTENTS_UPLOAD
+    BULK_VERTICAL_AQUIFER_EXTENTS_UPLOAD,
+    has_role
 )
 
 
@@ -38,8 +39,7 @@ class SurveysEditOrReadOnly(BasePermission):
     """
 
     def has_permission(self, request, view):
-        has_edit = request.user and request.user.is_authenticated and request.user.groups.filter(
-            name=SURVEYS_EDIT_ROLE).exists()
+        has_edit = request.user and request.user.is_authenticated and has_role(request.user, SURVEYS_EDIT_ROLE)
         result = has_edit or request.method in SAFE_METHODS
         return result
 
@@ -53,7 +53,7 @@ class HasBulkWellAquiferCorrelationUploadRole(BasePermission):
         return (
             request.user and
             request.user.is_authenticated and
-            request.user.groups.filter(name=BULK_WELL_AQUIFER_CORRELATION_UPLOAD).exists()
+            has_role(request.user, BULK_WELL_AQUIFER_CORRELATION_UPLOAD)
         )
 
 
@@ -66,7 +66,7 @@ class HasBulkAquiferDocumentsUploadRole(BasePermission):
         return (
             request.user and
             request.user.is_authenticated and
-            request.user.groups.filter(name=BULK_AQUIFER_DOCUMENTS_UPLOAD).exists()
+            has_role(request.user, BULK_AQUIFER_DOCUMENTS_UPLOAD)
         )
 
 
@@ -79,5 +79,5 @@ class HasBulkVerticalAquiferExtentsUploadRole(BasePermission):
         return (
             request.user and
             request.user.is_authenticated and
-            request.user.groups.filter(name=BULK_VERTICAL_AQUIFER_EXTENTS_UPLOAD).exists()
+            has_role(request.user, BULK_VERTICAL_AQUIFER_EXTENTS_UPLOAD)
         )
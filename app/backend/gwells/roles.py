@@ -121,3 +121,28 @@ def roles_to_groups(user, roles: Tuple[str] = None):
 
     if role_change:
         user.refresh_from_db()
+
+    # The user's groups are now their roles (less the excluded ones, unless they were already in them).
+    user._roles = frozenset(
+        [group for group in user_group_names if group in roles] +
+        [role for role in roles if role not in EXCLUDE])
+
+
+def user_roles(user):
+    """
+    The names of the groups (roles) a user is in. These are loaded once per user object (the
+    authentication backend fills them in when it syncs the roles), so checking several roles during a
+    request doesn't query the groups each time.
+    """
+    if not (user and user.is_authenticated):
+        return frozenset()
+    roles = getattr(user, '_roles', None)
+    if roles is None:
+        roles = frozenset(user.groups.values_list('name', flat=True))
+        user._roles = roles
+    return roles
+
+
+def has_role(user, role):
+    """ True if the user is authenticated and in the group for the role. """
+    return role in user_roles(user)
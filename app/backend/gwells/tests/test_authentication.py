@@ -0,0 +1,99 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+import time
+from unittest.mock import patch
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory
+
+from gwells.authentication import JwtOidcAuthentication, KEYCLOAK_GOLD_REALM_URL
+from gwells.roles import WELLS_EDIT_ROLE, WELLS_VIEWER_ROLE, has_role
+
+PRIVATE_KEY = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+PUBLIC_KEY = ''.join(PRIVATE_KEY.public_key().public_bytes(
+    serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+).decode().splitlines()[1:-1])
+
+ENV = {
+    'SSO_PUBKEY': PUBLIC_KEY,
+    'SSO_AUDIENCE': 'gwells',
+    'SSO_TEST_AUDIENCE': 'gwells-test',
+}
+
+
+@patch('gwells.authentication.get_env_variable', ENV.get)
+class JwtOidcAuthenticationCacheTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def authenticate(self, roles=(WELLS_VIEWER_ROLE,), **claims):
+        payload = {
+            'iss': 'https://' + KEYCLOAK_GOLD_REALM_URL,
+            'aud': 'gwells-test',
+            'sub': 'abc123@idir',
+            'exp': int(time.time()) + 300,
+            'preferred_username': 'abc123@idir',
+            'email': 'test@example.com',
+            'client_roles': list(roles),
+            **claims
+        }
+        token = jwt.encode(payload, PRIVATE_KEY, algorithm='RS256')
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION='JWT {}'.format(token))
+        user, _token = JwtOidcAuthentication().authenticate(request)
+        return user
+
+    def test_same_token_is_cached(self):
+        user = self.authenticate(iat=1)
+        self.assertTrue(has_role(user, WELLS_VIEWER_ROLE))
+
+        # Only the user is loaded, to check they are still active.
+        with self.assertNumQueries(1):
+            cached_user = self.authenticate(iat=1)
+            self.assertTrue(has_role(cached_user, WELLS_VIEWER_ROLE))
+            self.assertFalse(has_role(cached_user, WELLS_EDIT_ROLE))
+        self.assertEqual(cached_user.id, user.id)
+
+    def test_deactivated_user_is_not_authenticated(self):
+        user = self.authenticate(iat=1)
+        user.is_active = False
+        user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(iat=1)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(iat=2)
+
+    def test_new_token_with_same_claims_only_loads_user(self):
+        user = self.authenticate(iat=1)
+
+        with self.assertNumQueries(1):
+            refreshed_user = self.authenticate(iat=2)
+            self.assertTrue(has_role(refreshed_user, WELLS_VIEWER_ROLE))
+        self.assertEqual(refreshed_user.id, user.id)
+        self.assertEqual(refreshed_user.profile.username, 'testuser')
+
+    def test_changed_roles_are_synced(self):
+        self.authenticate(iat=1)
+
+        user = self.authenticate(roles=(WELLS_EDIT_ROLE,), iat=2)
+
+        self.assertTrue(has_role(user, WELLS_EDIT_ROLE))
+        self.assertFalse(has_role(user, WELLS_VIEWER_ROLE))
+        self.assertEqual(set(user.groups.values_list('name', flat=True)), {WELLS_EDIT_ROLE})
@@ -0,0 +1,77 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+from django.contrib.auth.models import User, Group
+from django.contrib.gis.geos import MultiPolygon, Point, Polygon
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+
+from aquifers.models import Aquifer
+from gwells.models.bulk import BulkWellAquiferCorrelationHistory
+from gwells.roles import roles_to_groups, BULK_WELL_AQUIFER_CORRELATION_UPLOAD
+from wells.models import ActivitySubmission, FieldsProvided, Well, WellActivitySummary
+
+
+class TestBulkWellAquiferCorrelation(APITestCase):
+
+    def setUp(self):
+        Group.objects.create(name=BULK_WELL_AQUIFER_CORRELATION_UPLOAD)
+        user, _created = User.objects.get_or_create(username='test')
+        user.profile.username = user.username
+        user.save()
+        roles_to_groups(user, [BULK_WELL_AQUIFER_CORRELATION_UPLOAD])
+        self.client.force_authenticate(user)
+
+        area = Polygon.from_bbox((-124, 48, -123, 49))
+        area.srid = 4326
+        area_3005 = area.transform(3005, clone=True)
+        self.aquifer = Aquifer.objects.create(
+            create_user='Something', update_user='Something',
+            geom=MultiPolygon(area_3005, srid=3005), geom_simplified=MultiPolygon(area, srid=4326))
+        self.inside = Well.objects.create(
+            create_user='Something', update_user='Something', geom=Point(-123.36, 48.43, srid=4326))
+        self.outside = Well.objects.create(
+            create_user='Something', update_user='Something', geom=Point(-120, 50, srid=4326))
+        self.url = reverse('bulk-well-aquifer-correlation')
+
+    def test_wells_outside_aquifer(self):
+        response = self.client.post(self.url, [{
+            'aquiferId': self.aquifer.aquifer_id,
+            'wellTagNumbers': [self.inside.well_tag_number, self.outside.well_tag_number],
+        }], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(list(response.data['wellsNotInAquifer']), [self.outside.well_tag_number])
+        self.assertGreater(response.data['wellsNotInAquifer'][self.outside.well_tag_number]['distance'], 0)
+        self.assertEqual(len(response.data['changes']), 2)
+        self.assertFalse(ActivitySubmission.objects.exists())
+
+    def test_commit(self):
+        # Refreshed from the bulk created submissions
+        WellActivitySummary.objects.all().delete()
+
+        response = self.client.post(self.url + '?commit', [{
+            'aquiferId': self.aquifer.aquifer_id,
+            'wellTagNumbers': [self.inside.well_tag_number, self.inside.well_tag_number],
+        }], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.inside.refresh_from_db()
+        self.assertEqual(self.inside.aquifer_id, self.aquifer.aquifer_id)
+        self.assertEqual(BulkWellAquiferCorrelationHistory.objects.count(), 1)
+        submission = ActivitySubmission.objects.get(well=self.inside)
+        self.assertEqual(submission.aquifer_id, self.aquifer.aquifer_id)
+        self.assertEqual(submission.well_activity_type_id, 'STAFF_EDIT')
+        self.assertTrue(FieldsProvided.objects.filter(activity_submission=submission).exists())
+        self.assertTrue(WellActivitySummary.objects.filter(well=self.inside).exists())
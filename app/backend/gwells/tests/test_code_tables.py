@@ -0,0 +1,79 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+from datetime import timedelta
+from unittest.mock import Mock, patch
+
+from django.core.cache import cache
+from django.utils import timezone
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from gwells.code_tables import cached_options
+from gwells.models import ProvinceStateCode
+
+
+class CodeTableOptionsCacheTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('submissions-options', kwargs={'version': 'v1'})
+
+    def test_options_are_cached(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_code_table_change_refreshes_options(self):
+        etag = self.client.get(self.url)['ETag']
+
+        ProvinceStateCode.objects.create(
+            province_state_code='ZZ', description='Test province', display_order=100)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('ZZ', [code['province_state_code'] for code in response.json()['province_codes']])
+
+    def test_options_rebuilt_each_day(self):
+        # Codes are left out of the options once they expire, so options are only cached for the day.
+        build = Mock(return_value=[{'code': 'A'}])
+        cached_options('test', build)
+        cached_options('test', build)
+        self.assertEqual(build.call_count, 1)
+
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        with patch('gwells.code_tables.timezone.localdate', return_value=tomorrow):
+            cached_options('test', build)
+        self.assertEqual(build.call_count, 2)
+
+    def test_registries_options(self):
+        url = reverse('person-options', kwargs={'version': 'v1'})
+        etag = self.client.get(url)['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
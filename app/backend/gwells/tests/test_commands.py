@@ -12,6 +12,8 @@
     limitations under the License.
 """
 import os
+import shutil
+import tempfile
 
 from io import StringIO
 from unittest.mock import patch
@@ -19,22 +21,96 @@ from unittest.mock import patch
 from django.core.management import call_command
 from django.test import TestCase
 from logging import getLogger
+
+from gwells.management.commands import export_databc
 logger = getLogger("test")
 
 
 class DataBCTest(TestCase):
 
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
     # Minio and the file system are mocked out - so that we don't create any artifacts during this test.
     @patch('gwells.management.commands.export_databc.open')
-    @patch('gwells.management.commands.export_databc.Minio')
+    @patch('gwells.management.commands.export_databc.get_private_minio_client')
+    @patch('gwells.management.commands.export_databc.get_public_minio_client')
     @patch('gwells.management.commands.export_databc.os')
-    def test_export_no_exceptions(self, fake_os, fake_minio, fake_open):
+    def test_export_no_exceptions(self, fake_os, fake_minio, fake_private_minio, fake_open):
         # This is a very simple test, that just checks to see that the export can be run without any
         # exceptions. This should catch most of the situations that could cause an export to fail.
         out = StringIO()
         call_command('export_databc', stdout=out)
         self.assertIn('GeoJSON export complete.', out.getvalue())
 
+    @patch('gwells.management.commands.export_databc.open')
+    @patch('gwells.management.commands.export_databc.get_private_minio_client')
+    @patch('gwells.management.commands.export_databc.get_public_minio_client')
+    @patch('gwells.management.commands.export_databc.os')
+    def test_incremental_export_without_previous_export(self, fake_os, fake_minio, fake_private_minio, fake_open):
+        # Without a previously recorded state file, the incremental export falls back to a full rebuild.
+        fake_private_minio.return_value.fget_object.side_effect = Exception('Not found')
+        out = StringIO()
+        call_command('export_databc', incremental=1, stdout=out)
+        self.assertIn('GeoJSON export complete.', out.getvalue())
+
+        # The state is kept in the private bucket, not published with the GIS files.
+        state_uploads = [call.args[1] for call in fake_private_minio.return_value.fput_object.call_args_list]
+        self.assertEqual(state_uploads, ['export_databc/v1/export_databc_state.json',
+                                         'export_databc/v2/export_databc_state.json'])
+        public_uploads = [call.args[1] for call in fake_minio.return_value.fput_object.call_args_list]
+        self.assertFalse([name for name in public_uploads if 'state' in name])
+
+    def test_read_features(self):
+        previous_file = StringIO(
+            '{"type": "FeatureCollection","features": [\n'
+            '\n{"type": "Feature", "geometry": null, "properties": {"well_tag_number": 1}}\n'
+            '\n,{"type": "Feature", "geometry": null, "properties": {"well_tag_number": 2}}\n'
+            ']}\n')
+        features = list(export_databc.read_features(previous_file, 'well_tag_number'))
+        self.assertEqual([key for key, feature in features], [1, 2])
+        self.assertTrue(all(feature.startswith('{"type": "Feature",') for key, feature in features))
+
+    def test_deleted_features_dropped(self):
+        # Previous features that were changed or no longer exist are not copied into the new file.
+        previous = os.path.join(self.tmp_dir, 'previous.json')
+        target = os.path.join(self.tmp_dir, 'wells.json')
+        with open(previous, 'w') as f:
+            f.write(
+                '{"type": "FeatureCollection","features": [\n'
+                '\n{"type": "Feature", "geometry": null, "properties": {"well_tag_number": 1}}\n'
+                '\n,{"type": "Feature", "geometry": null, "properties": {"well_tag_number": 2}}\n'
+                '\n,{"type": "Feature", "geometry": null, "properties": {"well_tag_number": 3}}\n'
+                ']}\n')
+        writer = export_databc.GeoJSONWriter(target, key='well_tag_number', previous=previous,
+                                             changed={2}, existing={2, 3})
+        writer.open()
+        writer.close()
+        with open(target, 'r') as f:
+            features = list(export_databc.read_features(f, 'well_tag_number'))
+        self.assertEqual([key for key, feature in features], [3])
+
+    def test_versions_written_from_one_row(self):
+        # Each version picks its own geometry and properties out of the same row.
+        fields = ['geometry', 'aquifer_id', 'geometry_v1', 'retire_date', 'notes']
+        record = ({'type': 'MultiPolygon'}, 1, {'type': 'Polygon'}, None, 'note')
+        v1 = export_databc.GeoJSONWriter('v1.json', geometry='geometry_v1',
+                                         exclude=('geometry', 'retire_date'))
+        v2 = export_databc.GeoJSONWriter('v2.json', exclude=('geometry_v1', ))
+        v1.set_fields(fields)
+        v2.set_fields(fields)
+        self.assertEqual(
+            v1.format_record(record),
+            '{"type": "Feature", "geometry": {"type": "Polygon"}, '
+            '"properties": {"aquifer_id": 1, "notes": "note"}}')
+        self.assertEqual(
+            v2.format_record(record),
+            '{"type": "Feature", "geometry": {"type": "MultiPolygon"}, '
+            '"properties": {"aquifer_id": 1, "retire_date": null, "notes": "note"}}')
+
 
 class ImportLicencesTest(TestCase):
     """ tests functions used by `./manage.py import_licences` """
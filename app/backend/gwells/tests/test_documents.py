@@ -1,6 +1,8 @@
+from unittest.mock import Mock
+from django.core.cache import cache
 from django.test import TestCase
 from urllib.parse import quote
-from gwells.documents import MinioClient
+from gwells.documents import MinioClient, get_minio_client, invalidate_documents
 
 
 class MockObject():
@@ -45,3 +47,30 @@ class DocumentsTestCase(TestCase):
         test_url = minio_client.create_url(test_document, "example.com", test_document.bucket_name)
 
         self.assertEqual(test_url, "https://example.com/" + quote("test_bucket/test+key"))
+
+    def test_document_listing_is_cached(self):
+        """ test that a listing is reused until the documents are invalidated """
+        cache.clear()
+        minio_client = MinioClient(disable_private=True)
+        minio_client.public_client = Mock()
+        minio_client.public_client.list_objects.return_value = [MockObject("test_bucket", "000000/WTN 123_Well Record.pdf")]
+
+        first = minio_client.get_documents(123)
+        second = minio_client.get_documents(123)
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(first['public']), 1)
+        self.assertEqual(minio_client.public_client.list_objects.call_count, 1)
+
+        invalidate_documents(123)
+        minio_client.get_documents(123)
+        self.assertEqual(minio_client.public_client.list_objects.call_count, 2)
+
+    def test_minio_clients_are_shared(self):
+        """ test that clients (and their connection pools) are reused for the same host and account """
+        client = get_minio_client("example.com", access_key="key", secret_key="secret")
+
+        self.assertIs(get_minio_client("example.com", access_key="key", secret_key="secret"), client)
+        self.assertIsNot(get_minio_client("example.com", access_key="other", secret_key="secret"), client)
+        self.assertIs(MinioClient(disable_private=True).public_client,
+                      MinioClient(disable_private=True).public_client)
@@ -0,0 +1,96 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+import time
+from unittest.mock import Mock
+
+from django.test import TestCase
+
+from gwells.geocoder import Geocoder, RateLimiter
+from gwells.models import GeocodeResult
+
+
+class StubSession():
+    """ Answers geocoder requests without going to the network, counting them """
+
+    def __init__(self, nearest_status=200):
+        self.requests = []
+        self.nearest_status = nearest_status
+
+    def get(self, url, params=None, **kwargs):
+        self.requests.append((url, params))
+        if 'sites/nearest' in url:
+            return Mock(status_code=self.nearest_status, headers={'RateLimit-Remaining': '500'},
+                        json=lambda: {'properties': {'fullAddress': params['point']}})
+        if params['addressString'] == 'nowhere':
+            data = {'features': []}
+        else:
+            data = {'features': [{'geometry': {'coordinates': [-123.36, 48.43]}}]}
+        return Mock(status_code=200, headers={'RateLimit-Remaining': '500'}, json=lambda: data)
+
+
+class GeocoderTestCase(TestCase):
+
+    def test_results_are_cached(self):
+        session = StubSession()
+        addresses = [
+            {'addressString': '1 Main St', 'localityName': 'Victoria'},
+            {'addressString': ' 1  MAIN st', 'localityName': 'victoria'},
+            {'addressString': 'nowhere'},
+        ]
+
+        results = Geocoder(session=session).geocode_many(addresses)
+
+        self.assertEqual(results[0], results[1])
+        self.assertIsNone(results[2])
+        # The two spellings of the same address are only geocoded once.
+        self.assertEqual(len(session.requests), 2)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(Geocoder(session=session).geocode_many(addresses), results)
+        self.assertEqual(len(session.requests), 2)
+
+    def test_reverse_geocode_rounds_coordinates(self):
+        session = StubSession()
+        geocoder = Geocoder(session=session)
+
+        address = geocoder.reverse_geocode(-123.3600001, 48.43)
+
+        self.assertEqual(address, {'fullAddress': '-123.36000,48.43000', 'distance': 200})
+        self.assertEqual(geocoder.reverse_geocode(-123.36, 48.4300002), address)
+        self.assertEqual(len(session.requests), 1)
+
+    def test_reverse_geocode_expands_search(self):
+        session = StubSession(nearest_status=404)
+
+        self.assertIsNone(Geocoder(session=session).reverse_geocode(-123.36, 48.43, 200, 200, 1000))
+        self.assertEqual([params['maxDistance'] for url, params in session.requests], [200, 400, 600, 800, 1000])
+        self.assertTrue(GeocodeResult.objects.filter(result__isnull=True).exists())
+
+    def test_failed_requests_are_not_cached(self):
+        session = Mock()
+        session.get.side_effect = ConnectionError('Service unavailable')
+
+        self.assertEqual(Geocoder(session=session).reverse_geocode_many([(-123.36, 48.43)]), [None])
+        with self.assertRaises(ConnectionError):
+            Geocoder(session=session).reverse_geocode(-123.36, 48.43)
+        self.assertFalse(GeocodeResult.objects.exists())
+
+    def test_rate_limiter_pauses(self):
+        limiter = RateLimiter(reserve=30, pause=60)
+
+        limiter.update(Mock(status_code=200, headers={'RateLimit-Remaining': '100'}))
+        self.assertLessEqual(limiter.paused_until, time.monotonic())
+
+        limiter.update(Mock(status_code=200, headers={'RateLimit-Remaining': '10'}))
+        self.assertGreater(limiter.paused_until, time.monotonic() + 50)
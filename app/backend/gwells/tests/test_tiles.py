@@ -0,0 +1,82 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+from unittest.mock import patch
+
+from django.contrib.gis.geos import Point
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from gwells.tiles import (
+    WEB_MERCATOR_EXTENT, get_tile, invalidate_tiles, is_valid_tile, tile_range
+)
+from wells.models import LithologyDescription, Well
+
+
+class TileGridTestCase(TestCase):
+
+    def test_is_valid_tile(self):
+        self.assertTrue(is_valid_tile(0, 0, 0))
+        self.assertTrue(is_valid_tile(3, 7, 7))
+        self.assertFalse(is_valid_tile(3, 8, 0))
+        self.assertFalse(is_valid_tile(23, 0, 0))
+
+    def test_tile_range_whole_world(self):
+        extent = (-WEB_MERCATOR_EXTENT, -WEB_MERCATOR_EXTENT, WEB_MERCATOR_EXTENT, WEB_MERCATOR_EXTENT)
+        self.assertEqual(tile_range(extent, 0), (0, 0, 0, 0))
+        self.assertEqual(tile_range(extent, 2), (0, 0, 3, 3))
+
+    def test_tile_range_point(self):
+        # A point just north-west of the origin is in the top left quadrant of the origin at zoom 1.
+        self.assertEqual(tile_range((-1, 1, -1, 1), 1), (0, 0, 0, 0))
+        self.assertEqual(tile_range((1, -1, 1, -1), 1), (1, 1, 1, 1))
+
+
+class TileCacheTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    @patch('gwells.tiles.generate_tile', return_value=b'tile')
+    def test_tile_is_cached(self, generate_tile):
+        get_tile('wells', 1, 0, 0)
+        get_tile('wells', 1, 0, 0)
+        self.assertEqual(generate_tile.call_count, 1)
+
+    @patch('gwells.tiles.generate_tile', return_value=b'tile')
+    def test_invalidate_tiles_for_point(self, generate_tile):
+        # (-123, 49) is in the top left quadrant at zoom 1
+        get_tile('wells', 1, 0, 0)
+        get_tile('wells', 1, 1, 1)
+        invalidate_tiles(('wells',), [Point(-123, 49, srid=4326)])
+        get_tile('wells', 1, 0, 0)
+        get_tile('wells', 1, 1, 1)
+        self.assertEqual(generate_tile.call_count, 3)
+
+    @patch('gwells.tiles.generate_tile', return_value=b'tile')
+    def test_lithology_changes_invalidate_tiles(self, generate_tile):
+        well = Well.objects.create(create_user='Blah', update_user='Blah', geom=Point(-123, 49, srid=4326))
+        get_tile('lithology', 1, 0, 0)
+        LithologyDescription.objects.create(start=0, end=1, well=well, create_user='Blah', update_user='Blah')
+        get_tile('lithology', 1, 0, 0)
+        self.assertEqual(generate_tile.call_count, 2)
+
+    @patch('gwells.tiles.generate_tile', return_value=b'tile')
+    def test_unchanged_tile_is_not_sent_again(self, generate_tile):
+        url = reverse('vector-tile', kwargs={'version': 'v1', 'layer': 'wells', 'z': 1, 'x': 0, 'y': 0})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
@@ -22,7 +22,7 @@ from gwells.utils import geocode_bc_location
 
 class UtilsTestCase(TestCase):
 
-    @patch('gwells.utils.requests.get')
+    @patch('gwells.geocoder.requests.Session.get')
     def test_geocode_bc_location_success(self, mock_requests_get):
         """
         Confirm that 'geocode_bc_location(...)' returns a geometry object
@@ -68,7 +68,7 @@ class UtilsTestCase(TestCase):
         self.assertEqual(response.coords[1], mock_lat)
         
 
-    @patch('gwells.utils.requests.get')
+    @patch('gwells.geocoder.requests.Session.get')
     def test_geocode_bc_location_api_unavailable(self, mock_requests_get):
         """
         Confirm that 'geocode_bc_location(...)' raises an HTTPError when 
@@ -83,7 +83,7 @@ class UtilsTestCase(TestCase):
         # Confirm that a mock API call was used instead of a real API call
         mock_requests_get.assert_called_once()
         
-    @patch('gwells.utils.requests.get')
+    @patch('gwells.geocoder.requests.Session.get')
     def test_geocode_bc_location_api_invalid_response(self, mock_requests_get):
         """
         Confirm that 'geocode_bc_location(...)' raises an HTTPError if 
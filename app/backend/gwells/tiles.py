@@ -0,0 +1,209 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+import logging
+import math
+
+from django.core.cache import cache
+from django.db import connection
+
+from gwells.management.commands.export_databc import (
+    AQUIFERS_SQL_V2,
+    LITHOLOGY_SQL,
+    WELLS_SQL_V2,
+)
+
+"""
+Mapbox Vector Tiles (MVT) for the wells, lithology and aquifers layers.
+
+Tiles are built by PostGIS (ST_AsMVT / ST_AsMVTGeom) from the same column sets used for the DataBC
+GeoJSON exports, so a map only has to fetch the tiles it is displaying instead of downloading the
+full GeoJSON files.
+"""
+
+logger = logging.getLogger(__name__)
+
+WEB_MERCATOR_SRID = 3857
+# Half the width of the web mercator world, in metres.
+WEB_MERCATOR_EXTENT = 20037508.342789244
+
+MAX_ZOOM = 22
+MVT_EXTENT = 4096
+MVT_BUFFER = 256
+
+# Tiles are cached in each process' own cache, so a process only sees the invalidations made by the
+# edits it handled itself. Keep tiles for a few minutes, so other processes catch up with edits soon.
+TILE_CACHE_TIMEOUT = 60 * 5
+# When a changed geometry covers more tiles than this (e.g. a large aquifer at high zoom levels), the
+# whole layer is invalidated instead of deleting individual tiles.
+TILE_INVALIDATION_LIMIT = 1000
+
+TILE_ENVELOPE = 'ST_TileEnvelope(%(z)s, %(x)s, %(y)s)'
+
+
+class TileLayer():
+    """ A vector tile layer derived from one of the DataBC export queries. """
+
+    def __init__(self, name, sql, geojson_column, geom_column, srid, bounds_prefix):
+        self.name = name
+        self.geom_column = geom_column
+        self.srid = srid
+        self.sql = self.get_sql(sql, geojson_column, bounds_prefix)
+
+    def get_sql(self, sql, geojson_column, bounds_prefix):
+        """
+        Swap the GeoJSON geometry column of the export query for a tile geometry, filter on the
+        tile envelope, and aggregate the features into a single MVT blob.
+        """
+        mvt_column = 'ST_AsMVTGeom(ST_Transform({geom}, {mercator}), {envelope}, {extent}, {buffer})'.format(
+            geom=self.geom_column, mercator=WEB_MERCATOR_SRID, envelope=TILE_ENVELOPE,
+            extent=MVT_EXTENT, buffer=MVT_BUFFER)
+        if geojson_column not in sql:
+            raise ValueError('Geometry column not found in {} query'.format(self.name))
+        features_sql = sql.replace(geojson_column, mvt_column, 1)
+        bounds = '{prefix} {geom} && ST_Transform({envelope}, {srid})'.format(
+            prefix=bounds_prefix, geom=self.geom_column, envelope=TILE_ENVELOPE, srid=self.srid)
+        features_sql = features_sql.format(bounds=bounds)
+
+        return """
+            select ST_AsMVT(tile, %(layer)s, {extent}, 'geometry')
+            from ({features}) as tile
+            where tile.geometry is not null
+        """.format(extent=MVT_EXTENT, features=features_sql)
+
+
+LAYERS = {
+    'wells': TileLayer(
+        'wells', WELLS_SQL_V2,
+        geojson_column='ST_AsGeoJSON(ST_Transform(well.geom, 4326)) :: json',
+        geom_column='well.geom', srid=4326, bounds_prefix='and'),
+    'lithology': TileLayer(
+        'lithology', LITHOLOGY_SQL,
+        geojson_column='ST_AsGeoJSON(ST_Transform(well.geom, 4326)) :: json',
+        geom_column='well.geom', srid=4326, bounds_prefix='and'),
+    'aquifers': TileLayer(
+        'aquifers', AQUIFERS_SQL_V2,
+        geojson_column='ST_AsGeoJSON(ST_Transform(a.geom, 4326)) :: json',
+        geom_column='a.geom', srid=3005, bounds_prefix='AND'),
+}
+
+# Layers that need to be invalidated when a model's geometry changes.
+WELL_LAYERS = ('wells', 'lithology')
+AQUIFER_LAYERS = ('aquifers',)
+LITHOLOGY_LAYERS = ('lithology',)
+
+
+def is_valid_tile(z, x, y):
+    """ Check that tile coordinates fall inside the tile grid. """
+    if z < 0 or z > MAX_ZOOM:
+        return False
+    tile_count = 2 ** z
+    return 0 <= x < tile_count and 0 <= y < tile_count
+
+
+def _generation_key(layer):
+    return 'mvt:{}:generation'.format(layer)
+
+
+def _get_generation(layer):
+    return cache.get(_generation_key(layer), 0)
+
+
+def _tile_key(layer, generation, z, x, y):
+    return 'mvt:{}:{}:{}:{}:{}'.format(layer, generation, z, x, y)
+
+
+def get_tile(layer, z, x, y):
+    """
+    Return the MVT bytes for a tile, generating the tile in PostGIS if it isn't cached.
+    """
+    key = _tile_key(layer, _get_generation(layer), z, x, y)
+    tile = cache.get(key)
+    if tile is None:
+        tile = generate_tile(layer, z, x, y)
+        cache.set(key, tile, TILE_CACHE_TIMEOUT)
+    return tile
+
+
+def generate_tile(layer, z, x, y):
+    """ Build a single tile in PostGIS. """
+    params = {'layer': layer, 'z': z, 'x': x, 'y': y}
+    with connection.cursor() as cursor:
+        cursor.execute(LAYERS[layer].sql, params)
+        row = cursor.fetchone()
+    if not row or row[0] is None:
+        return b''
+    return bytes(row[0])
+
+
+def tile_range(extent, z):
+    """
+    Return the (min_x, min_y, max_x, max_y) range of tiles at zoom level z that cover a
+    web mercator extent of (xmin, ymin, xmax, ymax).
+    """
+    tile_count = 2 ** z
+    tile_size = (WEB_MERCATOR_EXTENT * 2) / tile_count
+    (xmin, ymin, xmax, ymax) = extent
+
+    def clamp(value):
+        return min(max(value, 0), tile_count - 1)
+
+    # Tile rows are counted from the top (north) of the map.
+    min_x = clamp(math.floor((xmin + WEB_MERCATOR_EXTENT) / tile_size))
+    max_x = clamp(math.floor((xmax + WEB_MERCATOR_EXTENT) / tile_size))
+    min_y = clamp(math.floor((WEB_MERCATOR_EXTENT - ymax) / tile_size))
+    max_y = clamp(math.floor((WEB_MERCATOR_EXTENT - ymin) / tile_size))
+    return (min_x, min_y, max_x, max_y)
+
+
+def invalidate_layer(layer):
+    """ Drop every cached tile for a layer by moving it to a new cache generation. """
+    key = _generation_key(layer)
+    cache.set(key, _get_generation(layer) + 1, None)
+
+
+def invalidate_tiles(layers, geometries):
+    """
+    Remove the cached tiles covering any of the given geometries from each layer.
+    Geometries may be None (e.g. a well without a location), in which case they are ignored.
+    """
+    extents = []
+    for geom in geometries:
+        if geom is None or geom.empty:
+            continue
+        try:
+            extents.append(geom.transform(WEB_MERCATOR_SRID, clone=True).extent)
+        except Exception as e:
+            logger.warning('Unable to transform geometry for tile invalidation: %s', e)
+            for layer in layers:
+                invalidate_layer(layer)
+            return
+
+    if not extents:
+        return
+
+    tiles = set()
+    for extent in extents:
+        for z in range(MAX_ZOOM + 1):
+            (min_x, min_y, max_x, max_y) = tile_range(extent, z)
+            if len(tiles) + (max_x - min_x + 1) * (max_y - min_y + 1) > TILE_INVALIDATION_LIMIT:
+                for layer in layers:
+                    invalidate_layer(layer)
+                return
+            for x in range(min_x, max_x + 1):
+                for y in range(min_y, max_y + 1):
+                    tiles.add((z, x, y))
+
+    for layer in layers:
+        generation = _get_generation(layer)
+        cache.delete_many([_tile_key(layer, generation, z, x, y) for (z, x, y) in tiles])
@@ -26,6 +26,7 @@ from django.views.decorators.cache import never_cache
 
 from gwells.views import SurveyListCreateView, SurveyUpdateDeleteView, HealthView, index, api
 from gwells.views.bulk import BulkWellAquiferCorrelation, BulkVerticalAquiferExtents
+from gwells.views.tiles import vector_tile
 from gwells.views.admin import *
 from gwells.settings.base import get_env_variable
 
@@ -86,6 +87,10 @@ urlpatterns = [
         api.GeneralConfig.as_view(), name='configuration'),
     re_path(r'^' + app_root_slash + api_path_prefix() + r'/gis/insidebc',
         api.InsideBC.as_view(), name='insidebc'),
+    # Mapbox Vector Tiles for the wells, lithology and aquifers layers
+    re_path(r'^' + app_root_slash + api_path_prefix() + r'/gis/(?P<layer>wells|lithology|aquifers)/'
+        r'(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)\.mvt$',
+        vector_tile, name='vector-tile'),
     re_path(r'^' + app_root_slash + api_path_prefix() + r'/geocoding/v\d/.+\.places/(?P<query>.+)\.json$',
         api.DataBCGeocoder.as_view(), name='insidebc'),
     re_path(r'^' + app_root_slash, include('registries.urls')),
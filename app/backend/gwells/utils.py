@@ -1,8 +1,8 @@
 from django.contrib.gis.geos import GEOSGeometry
+from gwells.geocoder import get_geocoder
 from gwells.models import Border
+import csv
 import json 
-import requests
-from requests.exceptions import HTTPError
 
 
 def isPointInsideBC(latitude, longitude):
@@ -29,39 +29,42 @@ def setup_parameters(options):
     }
     return {**default_options, **options}
 
-def perform_api_request(url, params):
-    try:
-        resp = requests.get(url, params=params, timeout=10)
-        resp.raise_for_status()
-        return resp
-    except requests.HTTPError as e:
-        raise e
-
-def process_response(response):
-    try:
-        features = response.json().get('features')
-        if not features:
-            raise ValueError("Unable to geocode address")
-        return features[0]
-    except AttributeError:
-        raise ValueError("Unable to geocode address")
-
 def geocode_bc_location(options={}):
     """
-    Performs an HTTP request to the BC Physical Address Geocoder API, 
-    returning a django.contrib.gis.geos.Point for the first result. Supports query 
+    Performs an HTTP request to the BC Physical Address Geocoder API (through gwells.geocoder,
+    which caches results), returning a django.contrib.gis.geos.Point for the first result. Supports query 
     string parameters via the 'options' argument. Raises HTTPError for 
     communication issues and ValueError if no matching coordinate is found.
     Example 'options': {"addressString": "101 main st.", "localityName": "Kelowna"}.
     """
     params = setup_parameters(options)
-    url = "https://geocoder.api.gov.bc.ca/addresses.json"
-    response = perform_api_request(url, params)
-    first_feature = process_response(response)
+    first_feature = get_geocoder().geocode(params)
+    if not first_feature:
+        raise ValueError("Unable to geocode address")
 
     try:
         point = GEOSGeometry(json.dumps(first_feature.get("geometry", {})))
     except TypeError:
         raise ValueError("Unable to geocode address")
     
-    return point
\ No newline at end of file
+    return point
+
+
+class Echo:
+    """
+    A file-like object that hands back whatever is written to it, so csv.writer can produce
+    lines for a streaming response.
+    """
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(header, rows):
+    """
+    Generates the lines of a CSV file, for use with a StreamingHttpResponse.
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
@@ -24,7 +24,7 @@ from rest_framework import exceptions
 from gwells.serializers import SurveySerializer
 from gwells.models import Survey
 from gwells.permissions import SurveysEditOrReadOnly
-from gwells.roles import SURVEYS_EDIT_ROLE
+from gwells.roles import SURVEYS_EDIT_ROLE, has_role
 
 from submissions.models import WellActivityCode
 
@@ -78,7 +78,7 @@ class SurveyListCreateView(ListCreateAPIView):
     permission_classes = (SurveysEditOrReadOnly,)
 
     def get_queryset(self):
-        user_is_staff = self.request.user.groups.filter(name=SURVEYS_EDIT_ROLE).exists()
+        user_is_staff = has_role(self.request.user, SURVEYS_EDIT_ROLE)
 
         if not user_is_staff:
             return self.queryset.filter(survey_enabled=True)
@@ -95,7 +95,7 @@ class SurveyUpdateDeleteView(RetrieveUpdateDestroyAPIView):
     lookup_field = "survey_guid"
 
     def get_queryset(self):
-        user_is_staff = self.request.user.groups.filter(name=SURVEYS_EDIT_ROLE).exists()
+        user_is_staff = has_role(self.request.user, SURVEYS_EDIT_ROLE)
 
         if not user_is_staff:
             return self.queryset.filter(survey_enabled=True)
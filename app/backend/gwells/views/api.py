@@ -1,4 +1,3 @@
-import requests
 import geojson
 from geojson import Feature, FeatureCollection, Point
 from drf_yasg.utils import swagger_auto_schema
@@ -8,6 +7,7 @@ from rest_framework.views import APIView
 from django.http import JsonResponse, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 
+from gwells.geocoder import GEOCODER_ADDRESSES_URL, get_geocoder
 from gwells.settings.base import get_env_variable
 from gwells.utils import isPointInsideBC
 
@@ -82,9 +82,7 @@ class DataBCGeocoder(APIView):
         #override default params with values from request
         params.update(request.query_params.dict())
 
-        search_url = "https://geocoder.api.gov.bc.ca/addresses.json"
-
-        resp = requests.get(search_url, params=params)
+        resp = get_geocoder().get(GEOCODER_ADDRESSES_URL, params=params)
         resp.raise_for_status()
 
         features = resp.json().get('features')
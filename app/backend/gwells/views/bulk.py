@@ -19,12 +19,14 @@ from rest_framework.views import APIView
 from rest_framework import status
 from rest_framework.response import Response
 from drf_yasg.utils import swagger_auto_schema
-from django.db import transaction
+from django.db import connection, transaction
+from django.db.models import BooleanField, ExpressionWrapper, Q
 from django.utils import timezone
 from django.contrib.gis.geos import Point
 from aquifers.constants import AQUIFER_ID_FOR_UNCORRELATED_WELLS
 from aquifers.models import Aquifer, VerticalAquiferExtent, VerticalAquiferExtentsHistory
 from wells.models import Well, ActivitySubmission, FieldsProvided
+from wells.activity_summary import refresh_activity_summaries
 from submissions.models import WellActivityCode
 from gwells.models.bulk import BulkWellAquiferCorrelationHistory
 from gwells.permissions import (
@@ -35,6 +37,31 @@ from gwells.permissions import (
 
 logger = logging.getLogger(__name__)
 
+# Rows written per INSERT/UPDATE when committing a bulk well aquifer correlation
+BULK_WRITE_BATCH_SIZE = 500
+
+# The wells that are outside (a ~1000m buffer of) the aquifer they are being correlated to, and their
+# distance from it, given arrays of well tag numbers and the aquifer ids they are being correlated to.
+WELLS_OUTSIDE_AQUIFERS_SQL = """
+with correlation as (
+    select well_tag_number, aquifer_id, position
+    from unnest(%s::integer[], %s::integer[]) with ordinality as c(well_tag_number, aquifer_id, position)
+),
+buffered_aquifer as materialized (
+    -- Expand simplified polygons by ~1000m in WGS-84 (srid 4326), once per aquifer
+    select aquifer_id, ST_Buffer(geom_simplified, 0.01) as geom
+    from aquifer
+    where aquifer_id in (select aquifer_id from correlation)
+)
+select correlation.well_tag_number, ST_Distance(aquifer.geom, ST_Transform(well.geom, 3005)) as distance
+from correlation
+join well on well.well_tag_number = correlation.well_tag_number
+join buffered_aquifer on buffered_aquifer.aquifer_id = correlation.aquifer_id
+join aquifer on aquifer.aquifer_id = correlation.aquifer_id
+where not ST_Contains(buffered_aquifer.geom, well.geom)
+order by correlation.position
+"""
+
 
 class BulkWellAquiferCorrelation(APIView):
     """
@@ -54,6 +81,7 @@ class BulkWellAquiferCorrelation(APIView):
         self.retired_aquifers = set()
         self.unpublished_aquifers = set()
         self.unpublished_wells = set()
+        self.staff_edit_activity_type = None
 
     @swagger_auto_schema(auto_schema=None)
     @transaction.atomic
@@ -61,6 +89,7 @@ class BulkWellAquiferCorrelation(APIView):
         aquifers = request.data
         changes = {}
         wells_to_update = []
+        correlations_to_check = []
 
         # check for a ?commit querystring parameter for this /bulk API
         # this flag will actually perform the bulk_update() on the DB
@@ -77,6 +106,8 @@ class BulkWellAquiferCorrelation(APIView):
         if self.has_errors():
             return self.return_errors({})
 
+        self.staff_edit_activity_type = WellActivityCode.types.staff_edit()
+
         for aquifer in aquifers:
             aquifer_id = int(aquifer['aquiferId'])
             well_tag_numbers = aquifer['wellTagNumbers']
@@ -84,7 +115,8 @@ class BulkWellAquiferCorrelation(APIView):
             # capture errors about any unknown aquifers
             aquifer = existing_aquifers[aquifer_id]
 
-            wells = [well for wtn, well in existing_wells.items() if wtn in well_tag_numbers]
+            # each of the aquifer's wells once, in the order given
+            wells = [existing_wells[wtn] for wtn in dict.fromkeys(well_tag_numbers)]
 
             # now figure out what has changed for each well
             for well in wells:
@@ -95,7 +127,8 @@ class BulkWellAquiferCorrelation(APIView):
                 # assigned to when they are not correlated at the time of interpretation.
                 if aquifer_id != AQUIFER_ID_FOR_UNCORRELATED_WELLS:
                     # If the correlation is changing — check if the well is inside the aquifer
-                    self.check_well_in_aquifer(well, aquifer)
+                    # (checked for every well at once, below)
+                    correlations_to_check.append((well, aquifer))
 
                 #NOTE: This represents the intended behavior but it is temporarilly blocking a fix
                 # if existing_aquifer_id == aquifer_id: # this well correlation is unchanged
@@ -131,7 +164,7 @@ class BulkWellAquiferCorrelation(APIView):
                         'aquiferId': aquifer_id
                     }
                     wells_to_update.append(well)
-                    self.append_to_change_log_activity_submission(well_tag_number, aquifer_id)
+                    self.append_to_change_log_activity_submission(well, aquifer)
                 else: 
                     self.append_to_change_log(well_tag_number, aquifer_id, existing_aquifer_id)
                     change = {
@@ -139,7 +172,7 @@ class BulkWellAquiferCorrelation(APIView):
                         'existingAquiferId': existing_aquifer_id,
                         'newAquiferId': aquifer_id
                     }
-                    self.append_to_change_log_activity_submission(well_tag_number, aquifer_id)
+                    self.append_to_change_log_activity_submission(well, aquifer)
                     wells_to_update.append(well)
                 #END: Temporary fix
 
@@ -151,6 +184,8 @@ class BulkWellAquiferCorrelation(APIView):
                 for well in wells:
                     well.aquifer = aquifer
 
+        self.check_wells_in_aquifers(correlations_to_check)
+
         if update_db: # no errors then updated the DB (if ?commit is passed in)
             self.update_wells(wells_to_update)
         elif self.has_warnings():
@@ -189,7 +224,12 @@ class BulkWellAquiferCorrelation(APIView):
         return keyed_wells
 
     def lookup_existing_aquifers(self, aquifer_ids):
-        aquifers = Aquifer.objects.filter(pk__in=aquifer_ids).defer('geom') # we are not using geom
+        # the geometries are only used in the database (see check_wells_in_aquifers)
+        aquifers = Aquifer.objects.filter(pk__in=aquifer_ids) \
+            .defer('geom', 'geom_simplified') \
+            .annotate(
+                has_geom=ExpressionWrapper(Q(geom__isnull=False), output_field=BooleanField()),
+                has_geom_simplified=ExpressionWrapper(Q(geom_simplified__isnull=False), output_field=BooleanField()))
         keyed_aquifers = {aquifer.aquifer_id: aquifer for aquifer in aquifers}
         known_aquifer_ids = set(keyed_aquifers.keys())
 
@@ -200,23 +240,32 @@ class BulkWellAquiferCorrelation(APIView):
 
         return keyed_aquifers
 
-    def check_well_in_aquifer(self, well, aquifer):
-        if aquifer.geom is None:
-            self.no_geom_aquifers.add(aquifer.aquifer_id)
-            return None
-
-        if aquifer.geom_simplified is None:
-            raise Exception(f"Aquifer {aquifer.aquifer_id} has no geom_simplified")
-
-        # Expand simplified polygon by ~1000m in WGS-84 (srid 4326)
-        aquifer_geom = aquifer.geom_simplified.buffer(0.01)
-        if not aquifer_geom.contains(well.geom):
-            well_3005_geom = well.geom.transform(3005, clone=True)
-            distance = aquifer.geom.distance(well_3005_geom)
-            # NOTE: 3005 projection's `.distance()` returns almost-meters
-            self.wells_outside_aquifer[well.well_tag_number] = {'distance': distance, 'units': 'meters'}
-            return False
-        return True
+    def check_wells_in_aquifers(self, correlations):
+        """
+        Records the wells that are outside the aquifers they are being correlated to, given a list of
+        (well, aquifer) pairs. The wells are located against all the aquifers in one query.
+        """
+        well_tag_numbers = []
+        aquifer_ids = []
+        for well, aquifer in correlations:
+            if not aquifer.has_geom:
+                self.no_geom_aquifers.add(aquifer.aquifer_id)
+                continue
+
+            if not aquifer.has_geom_simplified:
+                raise Exception(f"Aquifer {aquifer.aquifer_id} has no geom_simplified")
+
+            well_tag_numbers.append(well.well_tag_number)
+            aquifer_ids.append(aquifer.aquifer_id)
+
+        if not well_tag_numbers:
+            return
+
+        with connection.cursor() as cursor:
+            cursor.execute(WELLS_OUTSIDE_AQUIFERS_SQL, [well_tag_numbers, aquifer_ids])
+            for well_tag_number, distance in cursor.fetchall():
+                # NOTE: 3005 projection's distance is almost-meters
+                self.wells_outside_aquifer[well_tag_number] = {'distance': distance, 'units': 'meters'}
 
     def return_errors(self, changes):
         # roll back the transaction as the bulk_update could have run for one
@@ -239,19 +288,19 @@ class BulkWellAquiferCorrelation(APIView):
     def update_wells(self, wells):
         logger.info("Bulk updating %d wells", len(wells))
         # bulk update using efficient SQL for any well aquifer correlations that have changed
-        Well.objects.bulk_update(wells, ['aquifer'])
+        Well.objects.bulk_update(wells, ['aquifer'], batch_size=BULK_WRITE_BATCH_SIZE)
         # save the BulkWellAquiferCorrelation records
-        BulkWellAquiferCorrelationHistory.objects.bulk_create(self.change_log)
-        # create a new row in activity submission table for each item in the array
-        for item in self.change_log_activity_submission:
-            activity_submission_object = ActivitySubmission.objects.create(create_user=item.create_user,
-            update_user=item.update_user,
-            create_date=item.create_date,
-            update_date=item.update_date,
-            well=item.well,
-            aquifer = item.aquifer,
-            well_activity_type=item.well_activity_type);
-            FieldsProvided.objects.create(activity_submission=activity_submission_object)
+        BulkWellAquiferCorrelationHistory.objects.bulk_create(self.change_log, batch_size=BULK_WRITE_BATCH_SIZE)
+        # create a new row in activity submission table for each item in the array, and its (empty)
+        # fields provided
+        activity_submissions = ActivitySubmission.objects.bulk_create(
+            self.change_log_activity_submission, batch_size=BULK_WRITE_BATCH_SIZE)
+        FieldsProvided.objects.bulk_create(
+            [FieldsProvided(activity_submission=activity_submission)
+             for activity_submission in activity_submissions],
+            batch_size=BULK_WRITE_BATCH_SIZE)
+        # bulk_create() doesn't send post_save, so refresh the wells' activity summaries here
+        refresh_activity_summaries(Well.objects.filter(pk__in=[well.pk for well in wells]))
 
     def append_to_change_log(self, well_tag_number, to_aquifer_id, from_aquifer_id):
         bulk_history_item = BulkWellAquiferCorrelationHistory(
@@ -264,18 +313,15 @@ class BulkWellAquiferCorrelation(APIView):
         self.change_log.append(bulk_history_item)
         
     # add activity submission objects to the array
-    def append_to_change_log_activity_submission(self, well_tag_number, to_aquifer_id):
-        well_instance = Well.objects.get(pk=well_tag_number)
-        aquifer_instance = Aquifer.objects.get(pk=to_aquifer_id)
-        well_activity_code_instance = WellActivityCode.objects.get(pk=WellActivityCode.types.staff_edit().code)
+    def append_to_change_log_activity_submission(self, well, to_aquifer):
         activity_submission_item = ActivitySubmission(
             create_user=self.request.user.profile.username,
             update_user=self.request.user.profile.username,
             create_date=self.create_date,
             update_date=self.create_date,
-            well=well_instance,
-            aquifer = aquifer_instance,
-            well_activity_type=well_activity_code_instance
+            well=well,
+            aquifer=to_aquifer,
+            well_activity_type=self.staff_edit_activity_type
         )
         self.change_log_activity_submission.append(activity_submission_item)
         
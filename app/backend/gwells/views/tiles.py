@@ -0,0 +1,45 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+import hashlib
+
+from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response, quote_etag
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework.decorators import api_view
+
+from gwells.tiles import LAYERS, TILE_CACHE_TIMEOUT, get_tile, is_valid_tile
+
+
+MVT_CONTENT_TYPE = 'application/vnd.mapbox-vector-tile'
+
+
+@swagger_auto_schema(method='GET', auto_schema=None)
+@api_view(['GET'])
+def vector_tile(request, layer, z, x, y, **kwargs):
+    """
+    Serves a Mapbox Vector Tile for the wells, lithology or aquifers layer.
+    """
+    (z, x, y) = (int(z), int(x), int(y))
+    if layer not in LAYERS or not is_valid_tile(z, x, y):
+        raise Http404('Tile not found')
+
+    tile = get_tile(layer, z, x, y)
+    # Let clients revalidate a tile they already have once it expires, instead of downloading it again.
+    etag = quote_etag(hashlib.md5(tile).hexdigest())
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(tile, content_type=MVT_CONTENT_TYPE)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'public, max-age={}'.format(TILE_CACHE_TIMEOUT)
+    return response
@@ -5,7 +5,7 @@ Registries view permission classes
 from django.db.models import Q
 from rest_framework.permissions import BasePermission, IsAdminUser, SAFE_METHODS, BasePermission
 
-from gwells.roles import REGISTRIES_EDIT_ROLE, REGISTRIES_VIEWER_ROLE
+from gwells.roles import REGISTRIES_EDIT_ROLE, REGISTRIES_VIEWER_ROLE, has_role
 
 
 class RegistriesEditOrReadOnly(BasePermission):
@@ -15,8 +15,7 @@ class RegistriesEditOrReadOnly(BasePermission):
     """
 
     def has_permission(self, request, view):
-        has_edit = request.user and request.user.is_authenticated and request.user.groups.filter(
-            name=REGISTRIES_EDIT_ROLE).exists()
+        has_edit = request.user and request.user.is_authenticated and has_role(request.user, REGISTRIES_EDIT_ROLE)
         result = has_edit or request.method in SAFE_METHODS
         return result
 
@@ -29,8 +28,6 @@ class RegistriesEditPermissions(BasePermission):
         - Allows users with view rights to access safe methods.
         - Allows users with edit rights to access all other methods.
         """
-        has_edit = request.user and request.user.is_authenticated and request.user.groups.filter(
-            name=REGISTRIES_EDIT_ROLE).exists()
-        has_view = request.user and request.user.is_authenticated and request.user.groups.filter(
-            name=REGISTRIES_VIEWER_ROLE).exists()
+        has_edit = request.user and request.user.is_authenticated and has_role(request.user, REGISTRIES_EDIT_ROLE)
+        has_view = request.user and request.user.is_authenticated and has_role(request.user, REGISTRIES_VIEWER_ROLE)
         return has_edit or (has_view and request.method in SAFE_METHODS)
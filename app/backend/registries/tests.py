@@ -37,7 +37,7 @@ from registries.models import (
     ActivityCode,
     SubactivityCode,
     ProofOfAgeCode)
-from registries.views import PersonListView, PersonDetailView
+from registries.views import PersonListView, PersonDetailView, driller_document_id
 from gwells.roles import (roles_to_groups, REGISTRIES_VIEWER_ROLE, REGISTRIES_EDIT_ROLE)
 
 # Note: see postman/newman for more API tests.
@@ -1101,6 +1101,35 @@ class APIFilteringPaginationTests(APITestCase):
         self.assertNotContains(response, self.unregistered_driller.person_guid)
         self.assertNotContains(response, self.partially_approved_driller.person_guid)
 
+    def test_city_filter_excludes_people_without_registrations_in_city(self):
+        organization = Organization.objects.create(
+            name='Atlin Drilling',
+            city='Atlin',
+            province_state=self.province)
+        self.registration.organization = organization
+        self.registration.save()
+
+        url = reverse('person-list', kwargs={'version': 'v1'}) + '?city=Atlin'
+        response = self.client.get(url, format='json')
+        self.assertEqual(response.data['count'], 1)
+        self.assertContains(response, 'Wendy')
+        self.assertNotContains(response, 'Debbie')
+
+    def test_cursor_pagination_matches_offset_pagination(self):
+        url = reverse('person-list', kwargs={'version': 'v1'})
+        response = self.client.get(url, format='json')
+        expected = [person['person_guid'] for person in response.data['results']]
+
+        person_guids = []
+        next_url = url + '?pagination=cursor&limit=1'
+        while next_url:
+            response = self.client.get(next_url, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data['results']), 1)
+            person_guids += [person['person_guid'] for person in response.data['results']]
+            next_url = response.data['next']
+        self.assertEqual(person_guids, expected)
+
     def test_user_cannot_retrieve_unregistered_person(self):
         """ unauthorized request to person detail view. Note: now always returns 401 if not staff. """
 
@@ -1430,3 +1459,26 @@ class TestAuthenticatedSearch(AuthenticatedAPITestCase):
         response = self.client.get(url, format='json')
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_csv_export_streams_every_application(self):
+        url = reverse('drillers-list-csv') + '?activity=DRILL'
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertTrue(lines[0].startswith('person_name,registration_number'))
+        # One row per application, and one for the registration without any.
+        self.assertEqual(
+            sum(1 for line in lines[1:] if 'ApprovedAndRemoved' in line), 2)
+        self.assertEqual(
+            sum(1 for line in lines[1:] if 'NoApplication' in line), 1)
+
+
+class DrillerDocumentIdTest(TestCase):
+
+    def test_guid_normalised(self):
+        # Listings are cached under the same id whichever way the GUID was written.
+        person_guid = uuid.uuid4()
+        self.assertEqual(driller_document_id(str(person_guid).upper()), str(person_guid))
+        self.assertEqual(driller_document_id(person_guid), str(person_guid))
@@ -76,6 +76,10 @@ urlpatterns = [
     re_path(api_path_prefix() + r'/drillers/(?P<person_guid>[-\w]+)/presigned_put_url$',
         never_cache(views.PreSignedDocumentKey.as_view()), name='drillers-pre-signed-url'),
 
+    # Document uploaded (driller records)
+    re_path(api_path_prefix() + r'/drillers/(?P<person_guid>[-\w]+)/document_uploaded$',
+        never_cache(views.DrillerDocumentUploaded.as_view()), name='driller-document-uploaded'),
+
     # Document Deleting (driller records)
     re_path(api_path_prefix() + r'/drillers/(?P<person_guid>[-\w]+)/delete_document$',
         never_cache(views.DeleteDrillerDocument.as_view()), name='driller-delete-document'),
@@ -14,8 +14,9 @@
 
 import reversion
 import re, json
+import uuid
 from collections import OrderedDict
-from django.db.models import Q, Prefetch, Count
+from django.db.models import Q, Prefetch, Count, Exists, OuterRef
 from django.http import HttpResponse, Http404, JsonResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
@@ -32,11 +33,12 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from drf_multiple_model.views import ObjectMultipleModelAPIView
 
-from gwells.documents import MinioClient
+from gwells.code_tables import cached_options_response
+from gwells.documents import MinioClient, invalidate_documents
 from gwells.roles import REGISTRIES_VIEWER_ROLE
 from gwells.models import ProvinceStateCode
-from gwells.pagination import APILimitOffsetPagination
-from gwells.roles import REGISTRIES_EDIT_ROLE, REGISTRIES_VIEWER_ROLE
+from gwells.pagination import APILimitOffsetPagination, APICursorPagination
+from gwells.roles import REGISTRIES_EDIT_ROLE, REGISTRIES_VIEWER_ROLE, has_role
 from gwells.settings.base import get_env_variable
 from reversion.models import Version
 from registries.models import (
@@ -178,6 +180,9 @@ class PersonOptionsView(APIView):
         
     @swagger_auto_schema(auto_schema=None)
     def get(self, request, format=None, **kwargs):
+        return cached_options_response(request, 'registries', self.get_options)
+
+    def get_options(self):
         result = {}
         for activity in ActivityCode.objects.all():
             # Well class query
@@ -222,8 +227,8 @@ class PersonOptionsView(APIView):
             list(map(lambda item: RegionalAreaSerializer(item).data,
                      RegionalArea.objects.all().order_by('name')))
         self.filterRegionalAreas(result['regional_areas'])
-        
-        return Response(result)
+
+        return result
 
 
 
@@ -295,7 +300,7 @@ def person_search_qs(request):
 
     activity = query.get('activity', None)
     status = query.get('status', None)
-    user_is_staff = request.user.groups.filter(name=REGISTRIES_VIEWER_ROLE).exists()
+    user_is_staff = has_role(request.user, REGISTRIES_VIEWER_ROLE)
 
     if activity:
         if (status == 'P' or not status) and user_is_staff:
@@ -391,6 +396,10 @@ def person_search_qs(request):
     registrations_qs = registrations_qs.filter(reg_filters)
     applications_qs = applications_qs.filter(appl_filters)
 
+    if requires_registrations(request):
+        # Only return people that have at least one of the filtered registrations.
+        qs = qs.filter(Exists(registrations_qs.filter(person=OuterRef('pk'))))
+
 
     # generate applications queryset
     applications_qs = applications_qs \
@@ -424,30 +433,35 @@ def person_search_qs(request):
 
     return qs.distinct()
 
-def exclude_persons_without_registrations(request, filtered_queryset, statuses_that_disallow_empty_registrations=['A']):
+def requires_registrations(request, statuses_that_disallow_empty_registrations=['A']):
     """
-    In the following cases perform additional filtering on the 'filtered_queryset'
-    to remove persons that have no registrations:
+    People without any (filtered) registrations are left out of a search:
     1. when the request asked for status of *Registered* ('A')
     2. when the request asked to filter by bounding box (geographic area)
     3. when the request asked to filter by city
-    Implementation note: Ideally we would rely on the queryset for this
-    filtering, but the queryset is very complex, and it relies on
-    multiple 'prefetches' (extra database queries).  It is most efficient to handle 
-    this filtering post database query.    
-    Returns an updated filtered_queryset
     """
     status_disallows_people_with_no_registrations = \
-        request.GET.get('status') in statuses_that_disallow_empty_registrations 
+        request.GET.get('status') in statuses_that_disallow_empty_registrations
     is_filtered_by_bbox = request.GET.get('sw_long') != None \
         and request.GET.get('sw_lat') != None \
         and request.GET.get('ne_long') != None\
         and request.GET.get('ne_lat') != None
     is_filtered_by_city = request.GET.get('city', "") != ""
-    if is_filtered_by_bbox or is_filtered_by_city or \
-        status_disallows_people_with_no_registrations:
-        filtered_queryset = [f for f in filtered_queryset if len(f.registrations.all()) > 0]
-    return filtered_queryset
+    return is_filtered_by_bbox or is_filtered_by_city or status_disallows_people_with_no_registrations
+
+
+class PersonCursorPagination(APICursorPagination):
+    """
+    Keyset pagination of people by surname. Ties are broken by person_guid so the order is stable.
+    """
+    ordering = ('surname', 'person_guid')
+
+    def get_ordering(self, request, queryset, view):
+        # The cursor is positioned on the first ordering field, so only surname ordering is supported.
+        if request.query_params.get('ordering') == '-surname':
+            return ('-surname', '-person_guid')
+        return self.ordering
+
 
 class PersonListView(RevisionMixin, AuditCreateMixin, ListCreateAPIView):
     """
@@ -481,6 +495,19 @@ class PersonListView(RevisionMixin, AuditCreateMixin, ListCreateAPIView):
     # fetch related companies and registration applications (prevent duplicate database trips)
     queryset = Person.objects.all()
 
+    @property
+    def paginator(self):
+        """
+        ?pagination=cursor switches to keyset pagination (following the next/previous links), which costs the
+        same for every page. Limit/offset pagination is used otherwise.
+        """
+        if not hasattr(self, '_paginator'):
+            if self.request is not None and self.request.query_params.get('pagination') == 'cursor':
+                self._paginator = PersonCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
     def get_queryset(self):
         """ Returns Person queryset, removing non-active and unregistered drillers for anonymous users """
 
@@ -495,7 +522,6 @@ class PersonListView(RevisionMixin, AuditCreateMixin, ListCreateAPIView):
         """ List response using serializer with reduced number of fields """
         queryset = self.get_queryset()
         filtered_queryset = self.filter_queryset(queryset)
-        filtered_queryset = exclude_persons_without_registrations(request, filtered_queryset) 
 
         page = self.paginate_queryset(filtered_queryset)
         if page is not None:
@@ -549,7 +575,7 @@ class PersonDetailView(RevisionMixin, AuditUpdateMixin, RetrieveUpdateDestroyAPI
         Returns only registered people (i.e. drillers with active registration) to anonymous users
         """
         qs = self.queryset.filter(expiry_date__gt=timezone.now())
-        if not self.request.user.groups.filter(name=REGISTRIES_VIEWER_ROLE).exists():
+        if not has_role(self.request.user, REGISTRIES_VIEWER_ROLE):
             qs = qs.filter(Q(applications__current_status__code='A'),
                            Q(applications__removal_date__isnull=True))
         return qs
@@ -593,7 +619,7 @@ class CitiesListView(ListAPIView):
         will filter for that activity
         """
         qs = self.queryset
-        if not self.request.user.groups.filter(name=REGISTRIES_VIEWER_ROLE).exists():
+        if not has_role(self.request.user, REGISTRIES_VIEWER_ROLE):
             qs = qs.filter(
                 Q(applications__current_status__code='A'),
                 Q(applications__removal_date__isnull=True))
@@ -773,8 +799,8 @@ def canDelete(self, author):
     """Checks if user has permission to change Notes.
         Notes can only be edited by Admins and the note's creator
     """
-    return self.request.user.groups.filter(name="gwells_admin").exists() or \
-        self.request.user.groups.filter(name="admin").exists() or \
+    return has_role(self.request.user, "gwells_admin") or \
+        has_role(self.request.user, "admin") or \
         author == self.request.user
 
 def get_persons_note(self, person_guid, note_guid):
@@ -860,8 +886,8 @@ class OrganizationNoteDetailView(AuditUpdateMixin, RetrieveUpdateDestroyAPIView)
         """Checks if user has permission to change Notes.
            Notes can only be edited by Admins and the note's creator
         """
-        return self.request.user.groups.filter(name="gwells_admin").exists() or \
-            self.request.user.groups.filter(name="admin").exists() or \
+        return has_role(self.request.user, "gwells_admin") or \
+            has_role(self.request.user, "admin") or \
             author == self.request.user
     
     def get_organization_note(self, org_guid, note_guid):
@@ -998,6 +1024,17 @@ class PersonNameSearch(ListAPIView):
         """
         return Person.objects.filter(expiry_date__gt=timezone.now())
 
+def driller_document_id(person_guid):
+    """
+    The GUID a driller's documents are stored and cached under, written the way str(person.person_guid)
+    writes it, so a GUID from the URL finds the same listing that uploads and deletes clear.
+    """
+    try:
+        return str(uuid.UUID(str(person_guid)))
+    except ValueError:
+        return str(person_guid)
+
+
 class ListFiles(APIView):
     """
     List documents associated with a person in the Registry.
@@ -1008,14 +1045,14 @@ class ListFiles(APIView):
 
 
     def get(self, request, person_guid, **kwargs):
-        user_is_staff = self.request.user.groups.filter(
-            Q(name=REGISTRIES_EDIT_ROLE) | Q(name=REGISTRIES_VIEWER_ROLE)).exists()
+        user_is_staff = has_role(self.request.user, REGISTRIES_EDIT_ROLE) or \
+            has_role(self.request.user, REGISTRIES_VIEWER_ROLE)
 
         client = MinioClient(
             request=request, disable_private=(not user_is_staff))
 
         documents = client.get_documents(
-            person_guid, resource="driller", include_private=user_is_staff)
+            driller_document_id(person_guid), resource="driller", include_private=user_is_staff)
 
         return Response(documents)
 
@@ -1047,6 +1084,25 @@ class PreSignedDocumentKey(APIView):
         return JsonResponse({"object_name": object_name, "url": url})
 
 
+class DrillerDocumentUploaded(APIView):
+    """
+    Called once a document has been uploaded with a pre-signed key
+
+    post:
+    Clear the driller's cached document listing, so the new document is listed.
+    """
+
+    queryset = Person.objects.all()
+    permission_classes = (RegistriesEditPermissions,)
+
+    @swagger_auto_schema(auto_schema=None)
+    def post(self, request, person_guid, **kwargs):
+        person = get_object_or_404(self.queryset, pk=person_guid)
+        invalidate_documents(driller_document_id(person.person_guid), "driller")
+
+        return HttpResponse(status=204)
+
+
 class DeleteDrillerDocument(APIView):
     """
     Delete a document from a S3 compatible store.
@@ -1072,5 +1128,6 @@ class DeleteDrillerDocument(APIView):
 
         object_name = request.GET.get("filename")
         client.delete_document(object_name, bucket_name=bucket_name, private=is_private)
+        invalidate_documents(driller_document_id(person.person_guid), "driller")
 
         return HttpResponse(status=204)
@@ -11,22 +11,22 @@
     See the License for the specific language governing permissions and
     limitations under the License.
 """
-import csv
+import tempfile
 import openpyxl
 from openpyxl.utils import get_column_letter
-from openpyxl.writer.excel import save_virtual_workbook
 
 from django_filters import rest_framework as restfilters
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import FileResponse, HttpResponseRedirect, StreamingHttpResponse
 from django.core.exceptions import PermissionDenied
 from rest_framework import filters
 from rest_framework.generics import ListAPIView
 from rest_framework.decorators import api_view
 
+from gwells.utils import csv_lines
 from registries.permissions import RegistriesEditPermissions
 from registries.models import Person
 
-from .views import (person_search_qs, exclude_persons_without_registrations)
+from .views import person_search_qs
 
 REGISTRY_EXPORT_HEADER_COLUMNS = [
     'person_name',
@@ -50,6 +50,10 @@ REGISTRY_EXPORT_HEADER_COLUMNS = [
     'org_guid',
 ]
 
+# People are read from the database (with their registrations and applications) this many at a time.
+EXPORT_CHUNK_SIZE = 500
+
+
 def build_record(person, registration=None, organization=None, application=None):
     # NOTE: must be kept in sync with REGISTRY_EXPORT_HEADER_COLUMNS above
     record = {
@@ -127,17 +131,12 @@ class CSVExportV2(ListAPIView):
     def list(self, request, **kwargs):
         queryset = self.get_queryset()
         filtered_queryset = self.filter_queryset(queryset)
-        filtered_queryset = exclude_persons_without_registrations(request, filtered_queryset) 
 
-        # Create the HttpResponse object with the appropriate CSV header.
-        response = HttpResponse(content_type='text/csv')
+        # Stream the rows, so the registry doesn't have to be held in memory.
+        response = StreamingHttpResponse(
+            csv_lines(REGISTRY_EXPORT_HEADER_COLUMNS, build_row(filtered_queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE))),
+            content_type='text/csv')
         response['Content-Disposition'] = 'attachment; filename="registry.csv"'
-        writer = csv.writer(response)
-        writer.writerow(REGISTRY_EXPORT_HEADER_COLUMNS)
-
-        for row in build_row(filtered_queryset):
-            writer.writerow(row)
-
         return response
 
 
@@ -175,18 +174,21 @@ class XLSXExportV2(ListAPIView):
     def list(self, request, **kwargs):
         queryset = self.get_queryset()
         filtered_queryset = self.filter_queryset(queryset)
-        filtered_queryset = exclude_persons_without_registrations(request, filtered_queryset) 
 
         mime_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
 
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.append(REGISTRY_EXPORT_HEADER_COLUMNS)
+        # A write only workbook keeps rows on disk as they're added, rather than building the whole
+        # sheet in memory. openpyxl can't write to a stream, so the workbook is saved to a temporary file.
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet()
         for i, column_name in enumerate(REGISTRY_EXPORT_HEADER_COLUMNS):
             col_letter = get_column_letter(i + 1)
             ws.column_dimensions[col_letter].width = len(column_name)
-        for row in build_row(filtered_queryset):
+        ws.append(REGISTRY_EXPORT_HEADER_COLUMNS)
+        for row in build_row(filtered_queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE)):
             ws.append([str(col) if col else '' for col in row])
-        response = HttpResponse(content=save_virtual_workbook(wb), content_type=mime_type)
+        outfile = tempfile.NamedTemporaryFile(delete=True)
+        wb.save(outfile.name)
+        response = FileResponse(outfile, content_type=mime_type)
         response['Content-Disposition'] = 'attachment; filename="registry.xlsx"'
         return response
@@ -12,19 +12,19 @@
     limitations under the License.
 """
 from django.urls import re_path
-from django.views.decorators.cache import never_cache
+from django.views.decorators.cache import cache_control, never_cache
 
 from submissions.views import (SubmissionsOptions, SubmissionListAPIView, SubmissionConstructionAPIView,
                                SubmissionAlterationAPIView, SubmissionDecommissionAPIView,
                                SubmissionGetAPIView, SubmissionStaffEditAPIView,
-                               PreSignedDocumentKey, EmailNotification)
+                               PreSignedDocumentKey, SubmissionDocumentUploaded, EmailNotification)
 from gwells.urls import api_path_prefix
 
 urlpatterns = [
 
-    # Submissions form options
+    # Submissions form options (the browser keeps a copy, revalidated with its ETag)
     re_path(api_path_prefix() + r'/submissions/options$',
-        never_cache(SubmissionsOptions.as_view()), name='submissions-options'),
+        cache_control(private=True, no_cache=True)(SubmissionsOptions.as_view()), name='submissions-options'),
 
     # Submissions list
     re_path(api_path_prefix() + r'/submissions$',
@@ -47,6 +47,9 @@ urlpatterns = [
     # Document Uploading (submission records)
     re_path(api_path_prefix() + r'/submissions/(?P<submission_id>[0-9]+)/presigned_put_url$',
         never_cache(PreSignedDocumentKey.as_view()), name='submissions-pre-signed-url'),
+    # Document uploaded (submission records)
+    re_path(api_path_prefix() + r'/submissions/(?P<submission_id>[0-9]+)/document_uploaded$',
+        never_cache(SubmissionDocumentUploaded.as_view()), name='submissions-document-uploaded'),
     # Send email notification when Coordinates are changed on drinking well
      re_path(api_path_prefix() + r'/submissions/editwater$',
         never_cache(EmailNotification.as_view()), name='send_email')
@@ -15,7 +15,7 @@ from django.core.mail import send_mail
 import logging
 import sys
 from posixpath import join as urljoin
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404
 from django.views.generic import TemplateView
 from django.utils import timezone
@@ -25,7 +25,8 @@ from rest_framework.reverse import reverse
 from rest_framework.response import Response
 from rest_framework.generics import ListAPIView, ListCreateAPIView, RetrieveAPIView
 from rest_framework.views import APIView
-from gwells.documents import MinioClient
+from gwells.code_tables import cached_options_response
+from gwells.documents import MinioClient, invalidate_documents
 from gwells.urls import app_root
 from gwells.pagination import APILimitOffsetPagination
 from wells.permissions import (
@@ -394,6 +395,9 @@ class SubmissionsOptions(APIView):
     """Options required for submitting activity report forms."""
 
     def get(self, request, **kwargs):
+        return cached_options_response(request, 'submissions', self.get_options)
+
+    def get_options(self):
         options = {}
         now = timezone.now()
 
@@ -536,7 +540,7 @@ class SubmissionsOptions(APIView):
         options["observation_well_status"] = observation_well_status.data
         options["licenced_status_codes"] = licenced_status_codes.data
 
-        return Response(options)
+        return options
 
 
 class PreSignedDocumentKey(RetrieveAPIView):
@@ -571,6 +575,24 @@ class PreSignedDocumentKey(RetrieveAPIView):
         return JsonResponse({"object_name": object_name, "url": url})
 
 
+class SubmissionDocumentUploaded(APIView):
+    """
+    Called once a document has been uploaded with a pre-signed key
+
+    post:
+    Clear the cached document listing of the submission's well, so the new document is listed.
+    """
+
+    queryset = ActivitySubmission.objects.all()
+    permission_classes = (WellsSubmissionPermissions,)
+
+    def post(self, request, submission_id, **kwargs):
+        submission = get_object_or_404(self.queryset, pk=submission_id)
+        invalidate_documents(int(submission.well.well_tag_number), "well")
+
+        return HttpResponse(status=204)
+
+
 
 class EmailNotification(APIView):
     """
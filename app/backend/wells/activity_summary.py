@@ -0,0 +1,141 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+import logging
+
+from django.db.models import Case, DateField, F, OuterRef, Subquery, When
+from django.db.models.functions import Coalesce
+
+from wells.constants import (
+    WELL_ACTIVITY_CODE_STAFF_EDIT,
+    WELL_ACTIVITY_CODE_CONSTRUCTION,
+    WELL_ACTIVITY_CODE_DECOMMISSION,
+    WELL_ACTIVITY_CODE_ALTERATION,
+)
+from wells.models import ActivitySubmission, Casing, LithologyDescription, Well, WellActivitySummary
+
+"""
+Maintains WellActivitySummary, the latest activity on each well as used by the QA/QC dashboard filters
+and orderings (wells.filters.WellQaQcFilterBackend).
+"""
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_FIELDS = (
+    'latest_well_activity_type_code',
+    'last_work_start_date',
+    'last_work_end_date',
+    'last_activity_start_date',
+    'last_activity_end_date',
+    'last_casing_diameter',
+    'last_lithology_raw_data',
+)
+
+REFRESH_BATCH_SIZE = 5000
+
+
+def _work_date(kind):
+    """
+    The start or end date of a submission's work, taken from the date for its activity type if there
+    is one.
+    """
+    return Case(
+        When(
+            well_activity_type__code=WELL_ACTIVITY_CODE_CONSTRUCTION,
+            **{'construction_{}_date__isnull'.format(kind): False},
+            then=F('construction_{}_date'.format(kind))
+        ),
+        When(
+            well_activity_type__code=WELL_ACTIVITY_CODE_ALTERATION,
+            **{'alteration_{}_date__isnull'.format(kind): False},
+            then=F('alteration_{}_date'.format(kind))
+        ),
+        When(
+            well_activity_type__code=WELL_ACTIVITY_CODE_DECOMMISSION,
+            **{'decommission_{}_date__isnull'.format(kind): False},
+            then=F('decommission_{}_date'.format(kind))
+        ),
+        default=Coalesce(
+            'work_{}_date'.format(kind),
+            'construction_{}_date'.format(kind),
+            'alteration_{}_date'.format(kind),
+            'decommission_{}_date'.format(kind),
+            output_field=DateField()
+        ),
+        output_field=DateField()
+    )
+
+
+def summary_annotations():
+    """
+    Annotations that work out the summary of each well in a Well queryset.
+    """
+    latest_activity = ActivitySubmission.objects.filter(
+        well=OuterRef('pk')
+    ).exclude(
+        well_activity_type__code=WELL_ACTIVITY_CODE_STAFF_EDIT
+    ).order_by('-work_end_date')
+    activities = ActivitySubmission.objects.filter(well=OuterRef('pk'))
+
+    return {
+        'latest_well_activity_type_code': Subquery(
+            latest_activity.values('well_activity_type__code')[:1]),
+        'last_work_start_date': Subquery(
+            latest_activity.annotate(date=_work_date('start')).values('date')[:1], output_field=DateField()),
+        'last_work_end_date': Subquery(
+            latest_activity.annotate(date=_work_date('end')).values('date')[:1], output_field=DateField()),
+        'last_activity_start_date': Subquery(
+            activities.order_by('-work_start_date').values('work_start_date')[:1]),
+        'last_activity_end_date': Subquery(
+            activities.order_by('-work_end_date').values('work_end_date')[:1]),
+        'last_casing_diameter': Subquery(
+            Casing.objects.filter(well=OuterRef('pk')).order_by('-end').values('diameter')[:1]),
+        'last_lithology_raw_data': Subquery(
+            LithologyDescription.objects.filter(
+                well=OuterRef('pk')).order_by('-end').values('lithology_raw_data')[:1]),
+    }
+
+
+def refresh_activity_summaries(wells=None, batch_size=REFRESH_BATCH_SIZE):
+    """
+    Work out the summaries of a queryset of wells (all wells by default) and write them, in batches.
+
+    :return: the number of summaries written
+    """
+    if wells is None:
+        wells = Well.objects.all()
+    rows = wells.order_by().annotate(**summary_annotations()) \
+        .values_list('well_tag_number', *SUMMARY_FIELDS) \
+        .iterator(chunk_size=batch_size)
+
+    count = 0
+    batch = []
+    for row in rows:
+        batch.append(WellActivitySummary(well_id=row[0], **dict(zip(SUMMARY_FIELDS, row[1:]))))
+        if len(batch) >= batch_size:
+            count += _write_summaries(batch)
+            batch = []
+    count += _write_summaries(batch)
+    return count
+
+
+def refresh_activity_summary(well_tag_number):
+    """ Refresh the summary of a single well. """
+    return refresh_activity_summaries(Well.objects.filter(well_tag_number=well_tag_number))
+
+
+def _write_summaries(summaries):
+    if summaries:
+        WellActivitySummary.objects.bulk_create(
+            summaries, update_conflicts=True, unique_fields=['well'], update_fields=SUMMARY_FIELDS)
+    return len(summaries)
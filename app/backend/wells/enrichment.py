@@ -0,0 +1,165 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from gwells.geocoder import GEOCODER_WORKERS, Geocoder
+from wells.models import NaturalResourceRegion, Parcel, Well, WellEnrichmentJob
+from wells.utils import calculate_geocode_distance, calculate_pid_distance_for_well, \
+    calculate_score_address, calculate_score_city, calculate_natural_resource_region_for_well, \
+    reverse_geocode
+
+"""
+Queue of wells whose location scores need calculating (WellEnrichmentJob).
+
+Working out the scores takes several requests to the BC geocoder, so instead of making them while a
+well is saved, the well is queued (in the same transaction as the save) and the enrich_wells management
+command works through the queue, geocoding a batch of wells at a time.
+"""
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HTTP_BACKEND = 'gwells.geocoder.get_session'
+
+# How long a worker has a job for before another worker may pick it up again.
+JOB_LEASE = timedelta(minutes=10)
+MAX_RETRY_DELAY = timedelta(hours=6)
+
+
+def queue_enrichment(well_tag_number):
+    """ Queue a well to have its location scores calculated, or requeue it if it is already queued """
+    now = timezone.now()
+    WellEnrichmentJob.objects.update_or_create(
+        well_id=well_tag_number,
+        defaults={
+            'status': WellEnrichmentJob.PENDING,
+            'requested_date': now,
+            'run_after': now,
+            'attempts': 0,
+            'last_error': None,
+        })
+
+
+def enrichment_geocoder(workers=GEOCODER_WORKERS):
+    """
+    The geocoder used to score wells. settings.WELL_ENRICHMENT_HTTP_BACKEND can name another callable
+    returning an object with requests.Session's get() (e.g. a local stub for tests).
+    """
+    session = import_string(getattr(settings, 'WELL_ENRICHMENT_HTTP_BACKEND', DEFAULT_HTTP_BACKEND))()
+    return Geocoder(session=session, workers=workers)
+
+
+def well_attributes(well, geocoder):
+    """
+    The location scores for a well, based on its location, address, city and PID. The distance to PID
+    and natural resource region are left out while their layers haven't been imported (see the
+    import_location_layers command), rather than clearing them.
+
+    Parameters:
+    well (Well instance): The well being scored. Must have a location.
+    geocoder (gwells.geocoder.Geocoder): Makes the geocoder requests (see enrichment_geocoder).
+    """
+    # Geocode point to address. Failed geocoder requests are raised, so the job is retried rather than
+    # storing empty scores.
+    geocoded_address = reverse_geocode(well.longitude, well.latitude, geocoder=geocoder, raise_errors=True)
+
+    attributes = {
+        # Calculate distance scores
+        'geocode_distance': calculate_geocode_distance(well, geocoder=geocoder, raise_errors=True),
+        # Calculate address scores
+        'score_address': calculate_score_address(well, geocoded_address),
+        'score_city': calculate_score_city(well, geocoded_address),
+    }
+    if Parcel.objects.exists():
+        attributes['distance_to_pid'] = calculate_pid_distance_for_well(well)
+    # Calculate natural resource region of well
+    if NaturalResourceRegion.objects.exists():
+        attributes['natural_resource_region'] = calculate_natural_resource_region_for_well(well)
+    return attributes
+
+
+def prefetch_geocodes(wells, geocoder):
+    """
+    Geocodes the addresses and locations of a batch of wells at once (concurrently), so scoring each
+    well finds its geocoder results in the cache.
+    """
+    located = [well for well in wells if well.geom]
+    geocoder.reverse_geocode_many([(well.longitude, well.latitude) for well in located])
+    geocoder.geocode_many([
+        {"addressString": well.street_address or '', "localityName": well.city or ''}
+        for well in located if (well.street_address or '').strip() or (well.city or '').strip()
+    ])
+
+
+def claim_jobs(batch_size):
+    """
+    Takes up to batch_size jobs that are due off the queue, holding them for JOB_LEASE so other workers
+    skip them. Returns the claimed jobs.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            WellEnrichmentJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=WellEnrichmentJob.PENDING, run_after__lte=now)
+            .order_by('run_after')[:batch_size])
+        for job in jobs:
+            job.attempts += 1
+            job.run_after = now + JOB_LEASE
+        WellEnrichmentJob.objects.bulk_update(jobs, ['attempts', 'run_after'])
+    return jobs
+
+
+def run_job(job, well, geocoder, max_attempts):
+    """
+    Calculates and stores the location scores for a claimed job's well. Returns True if it succeeded.
+
+    A job that fails is retried later (with an increasing delay), until it has been tried max_attempts
+    times. If the well was queued again while the job ran, the job stays queued to pick up the change.
+    """
+    # Only this run's job: the well may have been queued again since it was claimed.
+    claimed = WellEnrichmentJob.objects.filter(well_id=job.well_id, requested_date=job.requested_date)
+    try:
+        if well is not None and well.geom:
+            attributes = well_attributes(well, geocoder)
+            # update() rather than save(), so the well isn't queued again by the save signals.
+            Well.objects.filter(pk=well.pk).update(**attributes)
+    except Exception as e:
+        logger.warning('Could not calculate location scores for well %s (attempt %s)',
+                       job.well_id, job.attempts, exc_info=e)
+        failed = job.attempts >= max_attempts
+        claimed.update(
+            status=WellEnrichmentJob.FAILED if failed else WellEnrichmentJob.PENDING,
+            run_after=timezone.now() + min(timedelta(minutes=2 ** job.attempts), MAX_RETRY_DELAY),
+            last_error=str(e))
+        return False
+
+    claimed.delete()
+    return True
+
+
+def run_jobs(jobs, geocoder, max_attempts):
+    """ Runs claimed jobs, geocoding their wells as a batch first. Returns the number that succeeded. """
+    wells = Well.objects.in_bulk([job.well_id for job in jobs])
+    try:
+        prefetch_geocodes(wells.values(), geocoder)
+    except Exception as e:
+        # Each well is geocoded again (and fails on its own) while it is scored.
+        logger.warning('Could not geocode wells', exc_info=e)
+    return sum(run_job(job, wells.get(job.well_id), geocoder, max_attempts) for job in jobs)
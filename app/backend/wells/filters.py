@@ -25,16 +25,14 @@ from django.contrib.gis.geos import GEOSException, Polygon, GEOSGeometry, Point
 from django.contrib.gis.gdal import GDALException
 from django.contrib.gis.db.models.functions import Transform
 from django.contrib.gis.measure import D
-from django.db.models import Max, Min, Q, QuerySet, Subquery, OuterRef, \
-  Case, F, DateField, When
+from django.db.models import Max, Min, Q, QuerySet
 from django_filters import rest_framework as filters
 from django_filters.widgets import BooleanWidget
 from rest_framework.exceptions import ValidationError
 from rest_framework.filters import BaseFilterBackend, OrderingFilter
 from rest_framework.request import clone_request
-from django.db.models.functions import Coalesce
 
-from gwells.roles import WELLS_VIEWER_ROLE
+from gwells.roles import WELLS_VIEWER_ROLE, has_role
 from wells.models import (
     LicencedStatusCode,
     DevelopmentMethodCode,
@@ -46,16 +44,9 @@ from wells.models import (
     PumpingTestDescriptionCode,
     BoundaryEffectCode,
     AnalysisMethodCode,
-    LithologyDescription,
-    Casing,
-    ActivitySubmission
 )
 from wells.constants import (
   WELL_TAGS,
-  WELL_ACTIVITY_CODE_STAFF_EDIT,
-  WELL_ACTIVITY_CODE_CONSTRUCTION,
-  WELL_ACTIVITY_CODE_DECOMMISSION,
-  WELL_ACTIVITY_CODE_ALTERATION,
 )
 
 logger = logging.getLogger('wells_filters')
@@ -723,7 +714,7 @@ class WellListFilterBackend(filters.DjangoFilterBackend):
         filterset_kwargs = super().get_filterset_kwargs(request, queryset, view)
 
         if (request.user and request.user.is_authenticated and
-                request.user.groups.filter(name=WELLS_VIEWER_ROLE).exists()):
+                has_role(request.user, WELLS_VIEWER_ROLE)):
             filterset_class = WellListAdminFilter
 
         return filterset_class(**filterset_kwargs)
@@ -955,137 +946,34 @@ class WellQaQcFilterBackend(filters.DjangoFilterBackend):
                     elif field == 'well_subclass' and value == '00000000-0000-0000-0000-000000000000':
                         q_objects &= Q(well_subclass__well_subclass_guid__isnull=True)
 
+                    # The latest activity, casing and lithology of each well are read from the well's
+                    # activity summary (see wells.activity_summary).
+
                     # Check for null or empty 'aquifer_lithology'
                     elif field == 'aquifer_lithology' and value == 'null':
-                        # Subquery to get the last lithology description's raw data for each well
-                        last_lithology_raw_data = Subquery(
-                            LithologyDescription.objects.filter(
-                                well=OuterRef('pk')
-                            ).order_by('-end').values('lithology_raw_data')[:1]
-                        )
-                        queryset = queryset.annotate(
-                            last_lithology_raw_data=last_lithology_raw_data
-                        )
                         q_objects &= (
-                            Q(last_lithology_raw_data__isnull=True) |
-                            Q(last_lithology_raw_data='') |
-                            Q(last_lithology_raw_data=' ')
+                            Q(activity_summary__last_lithology_raw_data__isnull=True) |
+                            Q(activity_summary__last_lithology_raw_data='') |
+                            Q(activity_summary__last_lithology_raw_data=' ')
                         )
 
-                    # Check for null or empty 'casing_diameter' using the subquery
+                    # Check for null or empty 'casing_diameter'
                     elif field == 'diameter' and value == 'null':
-                        # Subquery to get the last casing's diameter for each well
-                        last_casing_diameter = Subquery(
-                            Casing.objects.filter(
-                                well=OuterRef('pk')
-                            ).order_by('-end').values('diameter')[:1]
-                        )
-                        queryset = queryset.annotate(
-                            last_casing_diameter=last_casing_diameter
-                        )
-                        q_objects &= Q(last_casing_diameter__isnull=True)
+                        q_objects &= Q(activity_summary__last_casing_diameter__isnull=True)
 
+                    # The well_activity_type__code of the latest ActivitySubmission
+                    # for each well, excluding 'STAFF_EDIT'
                     elif field == 'well_activity_type':
-                        # Subquery to get the well_activity_type__code of the latest ActivitySubmission
-                        # for each well, excluding 'STAFF_EDIT'
-                        latest_well_activity_type_code = Subquery(
-                            ActivitySubmission.objects.filter(
-                                well=OuterRef('pk')  # Reference the outer Well's primary key
-                            ).exclude(
-                                well_activity_type__code="STAFF_EDIT"
-                            ).order_by(
-                                '-work_end_date'  # Ensure the latest activity comes first
-                            ).values(
-                                'well_activity_type__code'  # Select the well_activity_type__code field
-                            )[:1]  # Limit to the first (latest) entry
-                        )
-                        # Annotate the queryset with the result of the subquery
-                        queryset = queryset.annotate(
-                            latest_well_activity_type_code=latest_well_activity_type_code
-                        )
-                        # Apply filters based on the annotated 'latest_well_activity_type_code'
                         if value == 'null':
-                            q_objects &= Q(latest_well_activity_type_code__isnull=True)
+                            q_objects &= Q(activity_summary__latest_well_activity_type_code__isnull=True)
                         else:
-                            q_objects &= Q(latest_well_activity_type_code=value)
+                            q_objects &= Q(activity_summary__latest_well_activity_type_code=value)
 
                     elif field == 'work_start_date' and value == 'null':
-                        queryset = queryset.annotate(
-                            last_work_start_date=Subquery(
-                                ActivitySubmission.objects.filter(
-                                    well=OuterRef('pk')
-                                ).exclude(
-                                    well_activity_type__code=WELL_ACTIVITY_CODE_STAFF_EDIT
-                                ).order_by('-work_end_date').annotate(
-                                    correct_start_date=Case(
-                                        When(
-                                            well_activity_type__code=WELL_ACTIVITY_CODE_CONSTRUCTION,
-                                            construction_start_date__isnull=False,
-                                            then=F('construction_start_date')
-                                        ),
-                                        When(
-                                            well_activity_type__code=WELL_ACTIVITY_CODE_ALTERATION,
-                                            alteration_start_date__isnull=False,
-                                            then=F('alteration_start_date')
-                                        ),
-                                        When(
-                                            well_activity_type__code=WELL_ACTIVITY_CODE_DECOMMISSION,
-                                            decommission_start_date__isnull=False,
-                                            then=F('decommission_start_date')
-                                        ),
-                                        default=Coalesce(
-                                            'work_start_date',
-                                            'construction_start_date',
-                                            'alteration_start_date',
-                                            'decommission_start_date',
-                                            output_field=DateField()
-                                        ),
-                                        output_field=DateField()
-                                    )
-                                ).values('correct_start_date')[:1],
-                                output_field=DateField()
-                            )
-                        )
-                        q_objects &= Q(last_work_start_date__isnull=True)
+                        q_objects &= Q(activity_summary__last_work_start_date__isnull=True)
 
                     elif field == 'work_end_date' and value == 'null':
-                        queryset = queryset.annotate(
-                            last_work_end_date=Subquery(
-                                ActivitySubmission.objects.filter(
-                                    well=OuterRef('pk')
-                                ).exclude(
-                                    well_activity_type__code=WELL_ACTIVITY_CODE_STAFF_EDIT
-                                ).order_by('-work_end_date').annotate(
-                                    correct_end_date=Case(
-                                        When(
-                                            well_activity_type__code=WELL_ACTIVITY_CODE_CONSTRUCTION,
-                                            construction_end_date__isnull=False,
-                                            then=F('construction_end_date')
-                                        ),
-                                        When(
-                                            well_activity_type__code=WELL_ACTIVITY_CODE_ALTERATION,
-                                            alteration_end_date__isnull=False,
-                                            then=F('alteration_end_date')
-                                        ),
-                                        When(
-                                            well_activity_type__code=WELL_ACTIVITY_CODE_DECOMMISSION,
-                                            decommission_end_date__isnull=False,
-                                            then=F('decommission_end_date')
-                                        ),
-                                        default=Coalesce(
-                                            'work_end_date',
-                                            'construction_end_date',
-                                            'alteration_end_date',
-                                            'decommission_end_date',
-                                            output_field=DateField()
-                                        ),
-                                        output_field=DateField()
-                                    )
-                                ).values('correct_end_date')[:1],
-                                output_field=DateField()
-                            )
-                        )
-                        q_objects &= Q(last_work_end_date__isnull=True)
+                        q_objects &= Q(activity_summary__last_work_end_date__isnull=True)
 
                     # This acts as a catch all for all null field checks
                     elif value == 'null':
@@ -1140,72 +1028,21 @@ class WellQaQcFilterBackend(filters.DjangoFilterBackend):
                                'work_start_date', 'work_end_date']:
             return queryset
 
-        # Mapping of fields to their related order fields
+        # Mapping of fields to their activity summary fields
         related_order_mapping = {
-            'aquifer_lithology': 'last_lithology_raw_data',
-            'diameter': 'last_casing_diameter',
-            'well_activity_type': 'latest_well_activity_type_code',
-            'work_start_date': 'last_activity_start_date',
-            'work_end_date': 'last_activity_end_date'
+            'aquifer_lithology': 'activity_summary__last_lithology_raw_data',
+            'diameter': 'activity_summary__last_casing_diameter',
+            'well_activity_type': 'activity_summary__latest_well_activity_type_code',
+            'work_start_date': 'activity_summary__last_activity_start_date',
+            'work_end_date': 'activity_summary__last_activity_end_date'
         }
 
-        # Get mapped annoation name
+        # Get mapped summary field
         related_order = related_order_mapping.get(order_field, '')
 
         # if we're descending, then add the negative sign prefix
         if order_value.startswith('-'):
             related_order = f'-{related_order}'
 
-        # print(f"ORDER VALUES: {order_value}, Descending: {order_value.startswith('-')}, Field: {order_field}")
-        
-        # Apply sorting field annotations
-        queryset = self.annotate_custom_fields(queryset, order_field)
-
         # Return ordered queryset
         return queryset.order_by(related_order)
-    
-
-    def annotate_custom_fields(self, queryset, field_name):
-        # Apply annotations for calculated fields if they are not already annotated
-        if field_name == 'aquifer_lithology' and not queryset.query.annotations.get('last_lithology_raw_data'):
-            queryset = queryset.annotate(last_lithology_raw_data=Subquery(
-                LithologyDescription.objects.filter(
-                    well=OuterRef('pk')
-                ).order_by('-end').values('lithology_raw_data')[:1]
-            ))
-
-        if field_name == 'diameter' and not queryset.query.annotations.get('last_casing_diameter'):
-            queryset = queryset.annotate(last_casing_diameter=Subquery(
-                Casing.objects.filter(
-                    well=OuterRef('pk')
-                ).order_by('-end').values('diameter')[:1]
-            ))
-
-        if field_name == 'well_activity_type' and not queryset.query.annotations.get('latest_well_activity_type_code'):
-            queryset = queryset.annotate(latest_well_activity_type_code=Subquery(
-                ActivitySubmission.objects.filter(
-                    well=OuterRef('pk')
-                ).exclude(
-                    well_activity_type__code="STAFF_EDIT"
-                ).order_by(
-                    '-work_end_date'
-                ).values(
-                    'well_activity_type__code'
-                )[:1]
-            ))
-
-        if field_name == 'work_start_date' and not queryset.query.annotations.get('last_activity_start_date'):
-            queryset = queryset.annotate(last_activity_start_date=Subquery(
-                ActivitySubmission.objects.filter(
-                    well=OuterRef('pk')
-                ).order_by('-work_start_date').values('work_start_date')[:1]
-            ))
-        
-        if field_name == 'work_end_date' and not queryset.query.annotations.get('last_activity_end_date'):
-            queryset = queryset.annotate(last_activity_end_date=Subquery(
-                ActivitySubmission.objects.filter(
-                    well=OuterRef('pk')
-                ).order_by('-work_end_date').values('work_end_date')[:1]
-            ))
-
-        return queryset
@@ -0,0 +1,151 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+import logging
+
+from django.contrib.gis import geos
+from django.contrib.gis.geos import GEOSGeometry, MultiPolygon, WKTWriter
+from django.db import connection, transaction
+
+from wells.models import NaturalResourceRegion, Parcel
+
+"""
+Local copies of the DataBC layers used to score well locations (natural resource regions and parcels),
+so a well's region and distance to its parcel are indexed PostGIS queries instead of WFS requests.
+"""
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = 5000
+
+# Shapefiles truncate attribute names to 10 characters.
+REGION_NAME_FIELDS = ('REGION_NAME', 'REGION_NAM')
+ORG_UNIT_NAME_FIELDS = ('ORG_UNIT_NAME', 'ORG_UNIT_N')
+PID_FIELDS = ('PID_NUMBER', 'PID_NUMBE', 'PID')
+
+STORAGE_SRID = 3005
+
+REFRESH_LOCATION_ATTRIBUTES_SQL = """
+update well
+set natural_resource_region = located.natural_resource_region,
+    distance_to_pid = located.distance_to_pid
+from (
+    select
+        w.well_tag_number,
+        (select region.org_unit_name
+            from natural_resource_region region
+            where ST_Contains(region.geom, ST_Transform(w.geom, 3005))
+            order by region.id
+            limit 1) as natural_resource_region,
+        (select round(min(ST_Distance(parcel.geom, ST_Transform(w.geom, 3005)))::numeric)
+            from parcel
+            where parcel.pid = w.legal_pid) as distance_to_pid
+    from well w
+    where w.geom is not null {filters}
+) located
+where well.well_tag_number = located.well_tag_number
+    and (well.natural_resource_region is distinct from located.natural_resource_region
+         or well.distance_to_pid is distinct from located.distance_to_pid)
+"""
+
+
+def feature_value(feature, names):
+    """ The value of the first of names that the feature has """
+    for name in names:
+        if name in feature.fields:
+            return feature.get(name)
+    raise KeyError('Feature has none of the fields {}'.format(', '.join(names)))
+
+
+def feature_multipolygon(feature):
+    """
+    A feature's geometry as a 2d MultiPolygon in NAD83 / BC Albers, or None if it isn't a polygon.
+    """
+    geom = feature.geom
+    # Eliminate any 3d geometry so it fits in PostGIS' 2d geometry schema.
+    wkt = WKTWriter(dim=2).write(GEOSGeometry(geom.wkt, srid=geom.srid)).decode()
+    geos_geom = GEOSGeometry(wkt, srid=geom.srid)
+    if geos_geom.srid != STORAGE_SRID:
+        geos_geom.transform(STORAGE_SRID)
+
+    if isinstance(geos_geom, geos.MultiPolygon):
+        return geos_geom
+    if isinstance(geos_geom, geos.Polygon):
+        return MultiPolygon(geos_geom, srid=STORAGE_SRID)
+    return None
+
+
+def _replace_layer(model, objects, batch_size):
+    """ Replaces every row of model with objects, in one transaction. Returns the number written. """
+    count = 0
+    with transaction.atomic():
+        model.objects.all().delete()
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= batch_size:
+                model.objects.bulk_create(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            model.objects.bulk_create(batch)
+            count += len(batch)
+    return count
+
+
+def import_regions(layer, batch_size=IMPORT_BATCH_SIZE):
+    """ Replaces the natural resource regions with the features of a GDAL layer """
+    def regions():
+        for feature in layer:
+            geom = feature_multipolygon(feature)
+            if geom is None:
+                logger.warning('Skipping region feature %s: not a polygon', feature.fid)
+                continue
+            yield NaturalResourceRegion(
+                region_name=feature_value(feature, REGION_NAME_FIELDS),
+                org_unit_name=feature_value(feature, ORG_UNIT_NAME_FIELDS),
+                geom=geom)
+    return _replace_layer(NaturalResourceRegion, regions(), batch_size)
+
+
+def import_parcels(layer, batch_size=IMPORT_BATCH_SIZE):
+    """ Replaces the parcels with the features of a GDAL layer, skipping parcels without a PID """
+    def parcels():
+        for feature in layer:
+            pid = feature_value(feature, PID_FIELDS)
+            if not pid:
+                continue
+            geom = feature_multipolygon(feature)
+            if geom is None:
+                continue
+            yield Parcel(pid=int(pid), geom=geom)
+    return _replace_layer(Parcel, parcels(), batch_size)
+
+
+def refresh_location_attributes(start=None, end=None):
+    """
+    Sets the natural resource region and distance to PID of every well with a location (or the wells
+    from start to end), in one statement. Returns the number of wells that changed.
+    """
+    filters = []
+    params = []
+    if start is not None:
+        filters.append('and w.well_tag_number >= %s')
+        params.append(start)
+    if end is not None:
+        filters.append('and w.well_tag_number <= %s')
+        params.append(end)
+
+    with connection.cursor() as cursor:
+        cursor.execute(REFRESH_LOCATION_ATTRIBUTES_SQL.format(filters=' '.join(filters)), params)
+        return cursor.rowcount
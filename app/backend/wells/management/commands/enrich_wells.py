@@ -0,0 +1,64 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from gwells.geocoder import GEOCODER_WORKERS
+from wells.enrichment import claim_jobs, enrichment_geocoder, run_jobs
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Works through the queue of wells waiting for their location scores (geocode distance, distance to
+    PID, address and city scores and natural resource region) to be calculated.
+
+    Run from command line:
+    python manage.py enrich_wells
+    python manage.py enrich_wells --workers 8 --loop 1
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, nargs='?', help='Geocoder requests made at the same time',
+                            default=GEOCODER_WORKERS)
+        parser.add_argument('--batch-size', type=int, nargs='?', help='Jobs taken off the queue at a time',
+                            default=100)
+        parser.add_argument('--max-attempts', type=int, nargs='?', help='Tries before a job is marked failed',
+                            default=5)
+        parser.add_argument('--loop', type=int, nargs='?',
+                            help='Keep waiting for new jobs once the queue is empty', default=0)
+        parser.add_argument('--poll-interval', type=int, nargs='?',
+                            help='Seconds to wait before checking an empty queue again', default=30)
+
+    def handle(self, *args, **options):
+        geocoder = enrichment_geocoder(workers=max(options['workers'], 1))
+        succeeded = failed = 0
+        while True:
+            jobs = claim_jobs(options['batch_size'])
+            if not jobs:
+                if not options['loop']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+
+            done = run_jobs(jobs, geocoder, options['max_attempts'])
+            succeeded += done
+            failed += len(jobs) - done
+            logger.info('Scored %s wells, %s failed', done, len(jobs) - done)
+
+        self.stdout.write(self.style.SUCCESS(
+            'Scored {} wells, {} failed'.format(succeeded, failed)))
@@ -12,20 +12,28 @@
     limitations under the License.
 """
 import csv
+import datetime
+import io
 import zipfile
 import os
 import logging
+import multiprocessing
+import pickle
+import shutil
 import string
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
 
 from django.core.management.base import BaseCommand
-from django.db import connection
+from django.db import connection, connections
 
-from minio import Minio
 from openpyxl import Workbook
 from openpyxl.utils import get_column_letter
 from openpyxl.styles import Font
 from openpyxl.worksheet.write_only import WriteOnlyCell
 
+from gwells.documents import get_public_minio_client, upload_file
 from gwells.settings.base import get_env_variable
 from gwells.management.commands import ResultIter
 
@@ -34,6 +42,13 @@ from gwells.management.commands import ResultIter
 #
 # For development/debugging, it's useful to skip upload and cleanup
 # python manage.py export --cleanup=0 --upload=0
+#
+# To query and write each sheet in its own worker process, then write the v1 and v2 spreadsheets at the
+# same time (0 uses every core)
+# python manage.py export --workers=0
+#
+# To read the sheets with PostgreSQL COPY instead of fetching Python rows
+# python manage.py export --copy=1
 
 logger = logging.getLogger(__name__)
 
@@ -126,6 +141,295 @@ AQUIFER_PARAMETERS_SQL_V1 = ("""
 """)
 AQUIFER_PARAMETERS_SQL_V2 = AQUIFER_PARAMETERS_SQL_V1
 
+WORKSHEET_STYLES = [{'worksheet_name': 'stats', 'column_name': 'disclaimer_txt', 'column_width': 240}]
+
+# Number of rows pickled together when a sheet worker spools its rows for the spreadsheet.
+ROW_SPOOL_CHUNK_SIZE = 1000
+
+# Database connections inherited from the parent process by a forked sheet worker.
+_inherited_connections = []
+
+
+# Only the characters in string.printable are kept in the export. Non ASCII characters are dropped by
+# encoding to ASCII, and this table drops the remaining ASCII control characters.
+NON_PRINTABLE_ASCII = str.maketrans('', '', ''.join(
+    chr(c) for c in range(128) if chr(c) not in string.printable))
+
+
+def sanitise_value(value):
+    """
+    Clean up a string value before it's written to the export.
+    Equivalent to ''.join([s for s in value if s in string.printable]), but done in C rather than
+    one character at a time in Python.
+    """
+    if not value.isascii():
+        value = value.encode('ascii', 'ignore').decode('ascii')
+    # Printable ASCII is a subset of string.printable, so most values don't need translating.
+    if not value.isprintable():
+        value = value.translate(NON_PRINTABLE_ASCII)
+    # We can't have something starting with an = sign,
+    # it would be interpreted as a formula in excel.
+    if value.startswith('='):
+        value = '\'{}'.format(value)
+    return value
+
+
+def sanitise_record(record):
+    """
+    Clean up the values of a record before they are written to the export.
+
+    :param record: a row from the cursor
+    :return: the cleaned values, and the number of values that aren't empty
+    """
+    # There are lots of non-printable characters in the source data that can cause
+    # issues in the export, so we have to clear them out.
+    values = [sanitise_value(value) if type(value) is str else value for value in record]
+    num_values = len(record) - record.count(None) - record.count('')
+    return values, num_values
+
+
+# PostgreSQL type OIDs of the columns that need special handling in the COPY export.
+BOOL_OID = 16
+TEXT_OIDS = (18, 19, 25, 1042, 1043)
+TIMESTAMP_OID = 1114
+TIMESTAMPTZ_OID = 1184
+
+# Converters from the text written by COPY back to the values the spreadsheet would have been given by
+# the cursor. Columns of any other type are written as text.
+SPREADSHEET_CONVERTERS = {
+    BOOL_OID: lambda value: value == 'True',
+    20: int,
+    21: int,
+    23: int,
+    700: float,
+    701: float,
+    1700: Decimal,
+    1082: datetime.date.fromisoformat,
+    TIMESTAMP_OID: datetime.datetime.fromisoformat,
+    TIMESTAMPTZ_OID: datetime.datetime.fromisoformat,
+}
+
+# Same as sanitise_value, in SQL: keep the characters in string.printable (tab to carriage return, and
+# space to tilde), and prefix values starting with = so they aren't interpreted as formulas.
+SANITISE_SQL = ("""nullif(
+    regexp_replace(
+        regexp_replace({column}, '[^\\x09-\\x0d\\x20-\\x7e]', '', 'g'),
+        '^=', '''='),
+    '')""")
+
+# Timestamps are formatted the way Python's str() formats a datetime, like the csv module does.
+TIMESTAMP_SQL = ("""to_char({column}, 'YYYY-MM-DD HH24:MI:SS') ||
+    case when date_part('microseconds', {column})::int % 1000000 <> 0
+        then to_char({column}, '.US') else '' end""")
+
+
+def sheet_rows(cursor, sql):
+    """
+    Runs the sql for a sheet.
+
+    :param cursor: a cursor from django database wrapper
+    :param sql: the sql for the sheet
+    :return: the column names, and an iterator of the values of each row to export, used for both the csv
+    file and the spreadsheet
+    """
+    cursor.execute(sql)
+    columns = [field[0] for field in cursor.description]
+    return columns, cursor_sheet_rows(cursor)
+
+
+def cursor_sheet_rows(cursor):
+    for record in ResultIter(cursor):
+        values, num_values = sanitise_record(record)
+        # We always have a well_tag_number, but if that's all we have, then just skip this record
+        if num_values > 1:
+            yield values
+
+
+def copy_sheet_sql(sql, description):
+    """
+    Wraps the sql for a sheet in a COPY statement that sanitises the values, formats them the way the
+    csv module would, and skips the rows that only have a well_tag_number.
+
+    :param sql: the sql for the sheet
+    :param description: (column name, type oid) of each column of the sheet
+    """
+    columns = []
+    not_empty = []
+    for name, type_code in description:
+        column = 'sheet.{}'.format(connection.ops.quote_name(name))
+        not_empty.append("nullif({}::text, '')".format(column))
+        if type_code in TEXT_OIDS:
+            expression = SANITISE_SQL.format(column=column)
+        elif type_code == BOOL_OID:
+            expression = "case when {0} then 'True' when not {0} then 'False' end".format(column)
+        elif type_code == TIMESTAMP_OID:
+            expression = TIMESTAMP_SQL.format(column=column)
+        elif type_code == TIMESTAMPTZ_OID:
+            expression = TIMESTAMP_SQL.format(column="({} at time zone 'UTC')".format(column)) + " || '+00:00'"
+        else:
+            expression = column
+        columns.append('{} as {}'.format(expression, connection.ops.quote_name(name)))
+    return 'copy (select {} from ({}) as sheet where num_nonnulls({}) > 1) to stdout with csv header'.format(
+        ', '.join(columns), sql, ', '.join(not_empty))
+
+
+def copy_sheet(cursor, sql, csv_file):
+    """
+    Writes a sheet to a csv file with COPY. The values are sanitised and formatted by the query, so no
+    Python objects are created for the rows.
+
+    :param cursor: a cursor from django database wrapper
+    :param sql: the sql for the sheet
+    :param csv_file: a binary file object to write the csv to
+    :return: the column names, and the type oid of each column (see read_copy_rows)
+    """
+    cursor.execute('select * from ({}) as sheet limit 0'.format(sql))
+    description = [(field[0], field[1]) for field in cursor.description]
+    cursor.copy_expert(copy_sheet_sql(sql, description), csv_file)
+    return [name for name, type_code in description], [type_code for name, type_code in description]
+
+
+def read_copy_rows(csv_file, type_codes):
+    """
+    Reads the rows of a csv file written by copy_sheet back into the values the spreadsheet would have
+    been given by the cursor.
+
+    :param csv_file: a text file object, opened with newline=''
+    :param type_codes: the type oid of each column, as returned by copy_sheet
+    """
+    converters = [SPREADSHEET_CONVERTERS.get(type_code, str) for type_code in type_codes]
+    reader = csv.reader(csv_file)
+    # Skip the header
+    next(reader, None)
+    for values in reader:
+        yield [convert(value) if value != '' else None for convert, value in zip(converters, values)]
+
+
+def init_sheet_worker():
+    """
+    Forked workers must not use the database connections inherited from the parent process, and must not
+    close them either (that would close them for the parent too). Keep a reference to them so they're never
+    cleaned up, and let each worker open its own connection.
+    """
+    for conn in connections.all():
+        _inherited_connections.append(conn.connection)
+        conn.connection = None
+
+
+def export_sheet_worker(version, worksheet_name, sql, directory, use_copy=False):
+    """
+    Runs in a worker process. Queries a single sheet, writes the csv file and spools the rows for
+    the spreadsheet to a file. With COPY, the csv file is written by the database and the spreadsheet
+    rows are read back from it.
+
+    :return: a dictionary describing the files written for the sheet
+    """
+    logger.info('exporting {} {}'.format(version, worksheet_name))
+    sheet_directory = os.path.join(directory, version or 'v1', worksheet_name)
+    os.makedirs(sheet_directory)
+    csv_file = os.path.join(sheet_directory, '{}.csv'.format(worksheet_name))
+    result = {'csv_file': csv_file}
+    with connection.cursor() as cursor:
+        if use_copy:
+            # The spreadsheet rows are read back from the csv file (see read_sheet_rows)
+            with open(csv_file, 'wb') as csvfile:
+                result['columns'], result['type_codes'] = copy_sheet(cursor, sql, csvfile)
+        else:
+            result['columns'], rows = sheet_rows(cursor, sql)
+            result['rows_file'] = os.path.join(sheet_directory, 'rows.pickle')
+            with open(csv_file, 'w') as csvfile, open(result['rows_file'], 'wb') as rowsfile:
+                csvwriter = csv.writer(csvfile, dialect='excel')
+                csvwriter.writerow(result['columns'])
+                chunk = []
+                for values in rows:
+                    csvwriter.writerow(values)
+                    chunk.append(values)
+                    if len(chunk) >= ROW_SPOOL_CHUNK_SIZE:
+                        pickle.dump(chunk, rowsfile)
+                        chunk = []
+                if chunk:
+                    pickle.dump(chunk, rowsfile)
+    connection.close()
+    return result
+
+
+def read_sheet_rows(result):
+    """ The spreadsheet rows of a sheet produced by export_sheet_worker """
+    if 'type_codes' in result:
+        with open(result['csv_file'], newline='') as csvfile:
+            yield from read_copy_rows(csvfile, result['type_codes'])
+    else:
+        yield from read_spooled_rows(result['rows_file'])
+
+
+def write_worksheet_header(worksheet, worksheet_name, values):
+    """
+    Writes the bold column headings of a worksheet, and sizes the columns.
+
+    :param worksheet: openpyxl write only worksheet
+    :param worksheet_name: the name of the worksheet in the workbook
+    :param values: the column names
+    """
+    cells = []
+    for field_name in values:
+        cell = WriteOnlyCell(worksheet, value=field_name)
+        cell.font = Font(bold=True)
+        cells.append(cell)
+
+    for index, value in enumerate(values):
+        # style modifications can be applied to outputs (haven't been able to get wrap_text working), feels
+        #   like it's being overwritten by the value output section below (Write the values).
+        # For now this is a decent solution, we can apply style modifications to a given column
+        #   based on our provided configuration
+        style_applied = False
+        for worksheet_style in WORKSHEET_STYLES:
+            if worksheet_name == worksheet_style['worksheet_name'] and value == worksheet_style['column_name']:
+                worksheet.column_dimensions[get_column_letter(index + 1)].width = worksheet_style['column_width']
+                style_applied = True
+                break
+        if not style_applied:
+            worksheet.column_dimensions[get_column_letter(index + 1)].width = len(value) + 2
+
+    worksheet.append(cells)
+
+
+def write_spreadsheet_worker(spreadsheet_filename, sheet_results):
+    """
+    Runs in a worker process. Writes a version's spreadsheet from the files produced by export_sheet_worker.
+
+    openpyxl writes a workbook from a single process, so the sheets of a spreadsheet are still written
+    one after the other; only the spreadsheets of the different versions are written at the same time.
+
+    :param spreadsheet_filename: the file to write the spreadsheet to
+    :param sheet_results: (sheet name, result of export_sheet_worker) for each sheet, in order
+    :return: spreadsheet_filename
+    """
+    os.makedirs(os.path.dirname(spreadsheet_filename), exist_ok=True)
+    workbook = Workbook(write_only=True)
+    for sheet, result in sheet_results:
+        logger.info('writing {} to {}'.format(sheet, spreadsheet_filename))
+        worksheet = workbook.create_sheet(sheet)
+        write_worksheet_header(worksheet, sheet, result['columns'])
+        row_count = 0
+        for values in read_sheet_rows(result):
+            row_count += 1
+            worksheet.append(values)
+        worksheet.auto_filter.ref = 'A1:{}{}'.format(get_column_letter(len(result['columns'])), row_count + 1)
+    workbook.save(filename=spreadsheet_filename)
+    return spreadsheet_filename
+
+
+def read_spooled_rows(rows_file):
+    """ Read back the rows spooled by export_sheet_worker. """
+    with open(rows_file, 'rb') as rowsfile:
+        while True:
+            try:
+                chunk = pickle.load(rowsfile)
+            except EOFError:
+                break
+            for values in chunk:
+                yield values
+
 
 class Command(BaseCommand):
 
@@ -140,6 +444,7 @@ class Command(BaseCommand):
         super().__init__()
         self.version1 = ''
         self.version2 = 'v2'
+        self.use_copy = False
 
         # Create a dictionary to map sql statements to spreadsheet worksheets.
         self.versioning_descriptor = [
@@ -173,8 +478,6 @@ class Command(BaseCommand):
             }
         ]
 
-        self.worksheet_styles = [{'worksheet_name': 'stats', 'column_name': 'disclaimer_txt', 'column_width': 240}]
-
     def add_arguments(self, parser):
         """
         Arguments added for debugging purposes.
@@ -186,6 +489,12 @@ class Command(BaseCommand):
         """
         parser.add_argument('--cleanup', type=int, nargs='?', help='If 1, remove file when done', default=1)
         parser.add_argument('--upload', type=int, nargs='?', help='If 1, upload the file', default=1)
+        parser.add_argument('--workers', type=int, nargs='?',
+                            help=('Number of worker processes producing sheets in parallel, 0 to use every core. '
+                                  'If 1, sheets are produced one after the other'),
+                            default=1)
+        parser.add_argument('--copy', type=int, nargs='?',
+                            help='If 1, read the sheets with PostgreSQL COPY', default=0)
 
     def handle(self, *args, **options):
         """
@@ -200,10 +509,22 @@ class Command(BaseCommand):
         logger.info('starting export')
         zip_filename = '/tmp/gwells.zip'
         spreadsheet_filename = 'gwells.xlsx'
+        workers = options['workers'] or os.cpu_count()
+        self.use_copy = options['copy'] == 1
+        sheet_results = None
+        spreadsheets = None
+        directory = None
+        if workers > 1:
+            directory = tempfile.mkdtemp(prefix='gwells_export_')
+            sheet_results, spreadsheets = self.run_sheet_workers(workers, directory)
         for version_desc in self.versioning_descriptor:
             version = version_desc['version']
             sheets = version_desc['sheets_sql']
-            self.generate_files(zip_filename, spreadsheet_filename, sheets)
+            if sheet_results is None:
+                self.generate_files(zip_filename, spreadsheet_filename, sheets)
+            else:
+                self.merge_files(zip_filename, sheets, sheet_results[version])
+                shutil.move(spreadsheets[version], spreadsheet_filename)
             if options['upload'] == 1:
                 self.upload_files(zip_filename, spreadsheet_filename, version)
             if options['cleanup'] == 1:
@@ -211,6 +532,8 @@ class Command(BaseCommand):
                 for filename in (zip_filename, spreadsheet_filename):
                     if os.path.exists(filename):
                         os.remove(filename)
+        if directory:
+            shutil.rmtree(directory, ignore_errors=True)
 
         logger.info('export complete')
         self.stdout.write(self.style.SUCCESS('export complete'))
@@ -223,22 +546,13 @@ class Command(BaseCommand):
         :param spreadsheet_filename: the filename of the spreadsheet
         :param version: the version to use
         """
-        is_secure = get_env_variable('S3_USE_SECURE', '1', warn=False) == '1'
-        minio_client = Minio(get_env_variable('S3_HOST'),
-                             access_key=get_env_variable('S3_PUBLIC_ACCESS_KEY'),
-                             secret_key=get_env_variable('S3_PUBLIC_SECRET_KEY'),
-                             secure=is_secure)
+        minio_client = get_public_minio_client()
         for filename in (zip_filename, spreadsheet_filename):
             logger.info('uploading {}'.format(filename))
-            with open(filename, 'rb') as file_data:
-                file_stat = os.stat(filename)
-                # our target supports versioned location writing, if the version is blank, continue
-                #   outputting just as we have in the past, otherwise output to export/versionNumberHere/fileNameHere
-                target = f'export/{filename}' if version == '' else f'export/{version}/{filename}'
-                minio_client.put_object(get_env_variable('S3_WELL_EXPORT_BUCKET'),
-                                        target,
-                                        file_data,
-                                        file_stat.st_size)
+            # our target supports versioned location writing, if the version is blank, continue
+            #   outputting just as we have in the past, otherwise output to export/versionNumberHere/fileNameHere
+            target = f'export/{filename}' if version == '' else f'export/{version}/{filename}'
+            upload_file(minio_client, get_env_variable('S3_WELL_EXPORT_BUCKET'), target, filename)
 
     def export(self, workbook, gwells_zip, worksheet_name, cursor):
         """
@@ -259,58 +573,17 @@ class Command(BaseCommand):
         with open(csv_file, 'w') as csvfile:
             csvwriter = csv.writer(csvfile, dialect='excel')
 
-            values = []
-            cells = []
-            # Write the headings
-            for index, field in enumerate(cursor.description):
-                field_name = field[0]
-                values.append(field_name)
-                cell = WriteOnlyCell(worksheet, value=field_name)
-                cell.font = Font(bold=True)
-                cells.append(cell)
+            values = [field[0] for field in cursor.description]
             columns = len(values)
-
-            for index, value in enumerate(values):
-                # style modifications can be applied to outputs (haven't been able to get wrap_text working), feels
-                #   like it's being overwritten by the value output section below (Write the values).
-                # For now this is a decent solution, we can apply style modifications to a given column
-                #   based on our provided configuration
-                style_applied = False
-                for worksheet_style in self.worksheet_styles:
-                    if worksheet_name == worksheet_style['worksheet_name'] and value == worksheet_style['column_name']:
-                        worksheet.column_dimensions[get_column_letter(index + 1)].width = worksheet_style['column_width']
-                        style_applied = True
-                        break
-                if not style_applied:
-                    worksheet.column_dimensions[get_column_letter(index + 1)].width = len(value) + 2
-
-            worksheet.append(cells)
+            write_worksheet_header(worksheet, worksheet_name, values)
             csvwriter.writerow(values)
 
             # Write the values
             row_index = 0
-            for row, record in enumerate(ResultIter(cursor)):
-                values = []
-                num_values = 0
-                for col, value in enumerate(record):
-                    if not (value == "" or value is None):
-                        num_values += 1
-                    if type(value) is str:
-                        # There are lots of non-printable characters in the source data that can cause
-                        # issues in the export, so we have to clear them out.
-                        v = ''.join([s for s in value if s in string.printable])
-                        # We can't have something starting with an = sign,
-                        # it would be interpreted as a formula in excel.
-                        if v.startswith('='):
-                            v = '\'{}'.format(v)
-                        values.append(v)
-                    else:
-                        values.append(value)
-                if num_values > 1:
-                    # We always have a well_tag_number, but if that's all we have, then just skip this record
-                    row_index += 1
-                    csvwriter.writerow(values)
-                    worksheet.append(values)
+            for values in cursor_sheet_rows(cursor):
+                row_index += 1
+                csvwriter.writerow(values)
+                worksheet.append(values)
 
             filter_reference = 'A1:{}{}'.format(get_column_letter(columns), row_index + 1)
             worksheet.auto_filter.ref = filter_reference
@@ -320,6 +593,34 @@ class Command(BaseCommand):
             # After adding the csv file to the zip, delete it.
             os.remove(csv_file)
 
+    def export_copy(self, workbook, gwells_zip, worksheet_name, cursor, sql):
+        """
+        Generates the csv/zip file content by reading the sheet with COPY, copying the csv written by
+            the database straight into the zip, then reading it back for the worksheet.
+
+        :param workbook: openpyxl.workbook.workbook instance
+        :param gwells_zip: file handle to zip
+        :param worksheet_name: the name of the worksheet in the workbook
+        :param cursor: a cursor from django database wrapper
+        :param sql: the sql for the sheet
+        """
+        logger.info('exporting {} with copy'.format(worksheet_name))
+        worksheet = workbook.create_sheet(worksheet_name)
+        with tempfile.TemporaryFile() as spool:
+            columns, type_codes = copy_sheet(cursor, sql, spool)
+            spool.seek(0)
+            with gwells_zip.open('{}.csv'.format(worksheet_name), 'w', force_zip64=True) as zip_entry:
+                shutil.copyfileobj(spool, zip_entry)
+            spool.seek(0)
+            write_worksheet_header(worksheet, worksheet_name, columns)
+            row_index = 0
+            csvfile = io.TextIOWrapper(spool, newline='')
+            for values in read_copy_rows(csvfile, type_codes):
+                row_index += 1
+                worksheet.append(values)
+            csvfile.detach()
+        worksheet.auto_filter.ref = 'A1:{}{}'.format(get_column_letter(len(columns)), row_index + 1)
+
     def generate_files(self, zip_filename, spreadsheet_filename, sheets: dict):
         """
         Runs sql statements passing the cursor to the self.export method.
@@ -340,10 +641,69 @@ class Command(BaseCommand):
             for sheet, sql in sheets.items():
                 logger.info('creating {} cursor'.format(sheet))
                 with connection.cursor() as cursor:
-                    cursor.execute(sql)
-                    self.export(workbook, gwells_zip, sheet, cursor)
+                    if self.use_copy:
+                        self.export_copy(workbook, gwells_zip, sheet, cursor, sql)
+                    else:
+                        cursor.execute(sql)
+                        self.export(workbook, gwells_zip, sheet, cursor)
             workbook.save(filename=spreadsheet_filename)
             # Add a readme to the zipfile.
             arcname = 'README.md'
             readme = os.path.join(os.path.dirname(__file__), arcname)
             gwells_zip.write(readme, arcname)
+
+    def run_sheet_workers(self, workers, directory):
+        """
+        Produces every sheet of every version in a pool of worker processes, each with its own
+        database connection, then writes each version's spreadsheet in the same pool.
+        Sheets with the same sql in both versions are only queried once.
+
+        :param workers: the number of worker processes
+        :param directory: the directory the workers write their files to
+        :return: {version: {sheet: result of export_sheet_worker}}, and {version: spreadsheet filename}
+        """
+        logger.info('exporting sheets with {} workers'.format(workers))
+        queries = {}
+        futures = {}
+        # Workers are forked so that they share the configured database settings.
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'),
+                                 initializer=init_sheet_worker) as executor:
+            for version_desc in self.versioning_descriptor:
+                version = version_desc['version']
+                for sheet, sql in version_desc['sheets_sql'].items():
+                    if sql not in queries:
+                        queries[sql] = executor.submit(
+                            export_sheet_worker, version, sheet, sql, directory, self.use_copy)
+                    futures[(version, sheet)] = queries[sql]
+            results = {}
+            for (version, sheet), future in futures.items():
+                results.setdefault(version, {})[sheet] = future.result()
+
+            spreadsheet_futures = {}
+            for version_desc in self.versioning_descriptor:
+                version = version_desc['version']
+                spreadsheet_filename = os.path.join(directory, version or 'v1', 'gwells.xlsx')
+                spreadsheet_futures[version] = executor.submit(
+                    write_spreadsheet_worker, spreadsheet_filename,
+                    [(sheet, results[version][sheet]) for sheet in version_desc['sheets_sql']])
+            spreadsheets = {version: future.result() for version, future in spreadsheet_futures.items()}
+        return results, spreadsheets
+
+    def merge_files(self, zip_filename, sheets: dict, sheet_results: dict):
+        """
+        Creates the zip file output from the csv files produced by the sheet workers.
+
+        :param zip_filename: a string filename to use
+        :param sheets: the sheet/sql map
+        :param sheet_results: the results of export_sheet_worker for each sheet
+        """
+        if os.path.exists(zip_filename):
+            os.remove(zip_filename)
+        with zipfile.ZipFile(zip_filename, 'w', compression=zipfile.ZIP_DEFLATED) as gwells_zip:
+            for sheet in sheets:
+                logger.info('merging {}'.format(sheet))
+                gwells_zip.write(sheet_results[sheet]['csv_file'], '{}.csv'.format(sheet))
+            # Add a readme to the zipfile.
+            arcname = 'README.md'
+            readme = os.path.join(os.path.dirname(__file__), arcname)
+            gwells_zip.write(readme, arcname)
@@ -17,8 +17,8 @@ from collections import defaultdict
 import urllib.parse
 
 from django.core.management.base import BaseCommand
-from minio import Minio
 
+from gwells.documents import get_public_minio_client, upload_file
 from gwells.settings.base import get_env_variable
 
 
@@ -109,9 +109,7 @@ class Command(BaseCommand):
             os.remove(filename)
 
         # recursively walk the minio bucket
-        client = Minio(get_env_variable('S3_HOST'),
-                       access_key=get_env_variable('S3_PUBLIC_ACCESS_KEY'),
-                       secret_key=get_env_variable('S3_PUBLIC_SECRET_KEY'))
+        client = get_public_minio_client()
         objects = client.list_objects(get_env_variable('S3_WELL_BUCKET'), recursive=True)
         wells = []
         unique_well_dict = defaultdict(list)
@@ -147,19 +145,11 @@ class Command(BaseCommand):
         """
         upload our file to S3_HOST, secure, S3_WELL_BUCKET export/filename
         """
-        client = Minio(get_env_variable('S3_HOST'),
-                       access_key=get_env_variable('S3_PUBLIC_ACCESS_KEY'),
-                       secret_key=get_env_variable('S3_PUBLIC_SECRET_KEY'),
-                       secure='1')
+        client = get_public_minio_client()
         logger.info('uploading {}'.format(filename))
 
         # write our file to minio
-        with open(filename, 'rb') as file_data:
-            file_stat = os.stat(filename)
-            target = f'export/{filename}'
-            client.put_object(get_env_variable('S3_WELL_BUCKET'),
-                              target,
-                              file_data,
-                              file_stat.st_size)
+        target = f'export/{filename}'
+        upload_file(client, get_env_variable('S3_WELL_BUCKET'), target, filename)
 
         self.stdout.write(self.style.SUCCESS(f'uploaded file to: {get_env_variable("S3_HOST")}/{get_env_variable("S3_WELL_BUCKET")}/{target}'))
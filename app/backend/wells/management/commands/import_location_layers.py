@@ -0,0 +1,58 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+import logging
+
+from django.contrib.gis.gdal import DataSource
+from django.core.management.base import BaseCommand
+
+from wells.locations import IMPORT_BATCH_SIZE, import_parcels, import_regions, refresh_location_attributes
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Load the natural resource regions (WHSE_ADMIN_BOUNDARIES.ADM_NR_REGIONS_SPG) and parcels
+    (WHSE_CADASTRE.PMBC_PARCEL_FABRIC_POLY_SVW) used to score well locations, from any file GDAL can
+    read (shapefile, GeoJSON, GeoPackage, ...), and optionally update every well from them.
+
+    Run from command line:
+    python manage.py import_location_layers --regions ADM_NR_REGIONS_SPG.geojson --parcels pmbc_parcels.gpkg
+    python manage.py import_location_layers --refresh-wells 1 --start 1 --end 100000
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--regions', type=str, nargs='?', help='Natural resource regions file', default=None)
+        parser.add_argument('--parcels', type=str, nargs='?', help='Parcel fabric file', default=None)
+        parser.add_argument('--batch-size', type=int, nargs='?', help='Features written per query',
+                            default=IMPORT_BATCH_SIZE)
+        parser.add_argument('--refresh-wells', type=int, nargs='?',
+                            help='Update the region and distance to PID of wells afterwards', default=0)
+        parser.add_argument('--start', type=int, nargs='?', help='Well to start refreshing at', default=None)
+        parser.add_argument('--end', type=int, nargs='?', help='Well to end refreshing at', default=None)
+
+    def handle(self, *args, **options):
+        if options['regions']:
+            count = import_regions(DataSource(options['regions'])[0], options['batch_size'])
+            self.stdout.write('Imported {} natural resource regions'.format(count))
+
+        if options['parcels']:
+            count = import_parcels(DataSource(options['parcels'])[0], options['batch_size'])
+            self.stdout.write('Imported {} parcels'.format(count))
+
+        if options['refresh_wells']:
+            count = refresh_location_attributes(options['start'], options['end'])
+            self.stdout.write('Updated {} wells'.format(count))
+
+        self.stdout.write(self.style.SUCCESS('Location layers import complete'))
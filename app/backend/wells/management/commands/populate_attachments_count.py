@@ -1,138 +1,139 @@
 from django.core.management.base import BaseCommand
 from wells.models import WellAttachment, Well
-from django.db.models import Count
 from wells.constants import WELL_TAGS
 from gwells.documents import MinioClient
-from collections import defaultdict
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import unquote_plus
 import logging
+import re
 
-class Command(BaseCommand):
-    help = 'Iterate through well tags and appropriately update file counts'
-    # Class Constants
-    BATCH_SIZE = 100
-    CLIENT = MinioClient(disable_private=False)
-
-    def __init__(self):
-        self.formatted_well_tags = self.format_well_tags()
-        self.logger = logging.getLogger(__name__)
-        super().__init__()
-    
-    def populate_wells_with_attachment_table(self):
-        """Summary:
-            Iterates existing well objects and creates entry in Attachments table if one doesn't already exist
-        """
-        # Batch processing: Set a limit for fetching wells without attachments
-        batch_size = 100
-        offset = 0
+logger = logging.getLogger(__name__)
+
+# Well documents are stored as "{folder}/WTN {well tag number}_{document type}_{timestamp}.{ext}"
+WELL_DOCUMENT_RE = re.compile(r'^WTN (\d+)_')
 
-        while True:
-            well_tag_numbers_without_attachment = (
-                Well.objects
-                .annotate(attachment_count=Count('wellattachment'))
-                .filter(attachment_count=0)
-                .values_list('well_tag_number', flat=True)[offset:offset + batch_size]
-            )
+# WellAttachment fields, one per document type
+ATTACHMENT_FIELDS = [tag['value'].replace(" ", "_").lower() for tag in WELL_TAGS]
 
-            if not well_tag_numbers_without_attachment:
-                break
 
-            well_attachments_to_create = []
+def document_type(name):
+    """Summary:
+        Works out the document type (WellAttachment field) from a document's file name
+    """
+    split_file = name.split("_")
+    if len(split_file) <= 3:
+        value = split_file[1].replace(" ", "_").lower()
+        if "." in value:
+            value = value.split(".")[0]
+    else:
+        value = split_file[1].lower() + "_" + split_file[2].lower()
+    if "well_record" in value:
+        return 'well_construction'
+    return value
 
-            # Iterate through each tag number and create WellAttachment instances
-            for tag_number in well_tag_numbers_without_attachment:
-                well_instance = Well.objects.get(well_tag_number=tag_number)
-                well_attachment_instance = WellAttachment(well_tag_number=well_instance)
-                well_attachments_to_create.append(well_attachment_instance)
 
-            # Bulk create for the current batch
-            WellAttachment.objects.bulk_create(well_attachments_to_create)
+def list_folders(client, bucket):
+    """Summary:
+        Lists the top level folders in a bucket (wells are grouped into folders of 10,000)
+    """
+    return [obj.object_name for obj in client.list_objects(bucket) if obj.is_dir]
 
-            # Move to the next batch
-            offset += batch_size
 
-            
-    def format_well_tags(self):
+def count_folder(client, bucket, folder):
+    """Summary:
+        Counts the documents of each type for each well in one folder of a bucket
+    Returns:
+        dict: {well tag number: Counter({document type: count})}
+    """
+    counts = defaultdict(Counter)
+    for obj in client.list_objects(bucket, prefix=folder, recursive=True):
+        name = obj.object_name.rsplit('/', 1)[-1]
+        match = WELL_DOCUMENT_RE.match(name)
+        if match:
+            counts[int(match.group(1))][document_type(unquote_plus(name))] += 1
+    return counts
+
+
+class Command(BaseCommand):
+    help = 'Count the documents for every well and update the file counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, nargs='?', help='Folders listed at the same time', default=8)
+        parser.add_argument('--batch-size', type=int, nargs='?', help='Rows written per query', default=1000)
+
+    def count_documents(self, buckets, workers):
         """Summary:
-            Formats well tags at the start to reduce runtime of functions
-        Returns:
-            Array: formatted WELL_TAGS
+            Lists every folder of each bucket (concurrently) and adds up the documents of each type for each well
         """
-        return [tag['value'].replace(" ", "_").lower() for tag in WELL_TAGS]
+        counts = defaultdict(Counter)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(count_folder, client, bucket, folder)
+                for client, bucket in buckets
+                for folder in list_folders(client, bucket)
+            ]
+            for future in as_completed(futures):
+                for well_tag_number, well_counts in future.result().items():
+                    counts[well_tag_number].update(well_counts)
+        return counts
 
-            
-    def get_well_tags(self, offset):
+    def create_missing_entries(self, batch_size):
         """Summary:
-        Gets and returns up to 100 well tag numbers to reduce memory load of function
-
-        Args:
-            offset (Number): Offset to reduce memory consumption in call
-
-        Returns:
-            Array: well tag numbers of batch
+            Creates a WellAttachment entry for every well that doesn't have one
         """
-        return (
-            Well.objects
-            .values('well_tag_number')[offset: offset + self.BATCH_SIZE]
-            .values_list('well_tag_number', flat=True)
-        )
-
-    
-    def get_or_create_entry(self, well_tag_number):
-        if WellAttachment.objects.filter(well_tag_number=well_tag_number).exists():
-            return WellAttachment.objects.get(well_tag_number=well_tag_number)
-        else:
-            well = Well.objects.get(well_tag_number=well_tag_number)
-            return WellAttachment.objects.create(well_tag_number=well)
-                   
-    def process_well_tag(self, well_tag_number):
+        well_tag_numbers = list(
+            Well.objects.filter(wellattachment__isnull=True).values_list('well_tag_number', flat=True))
+        WellAttachment.objects.bulk_create(
+            [WellAttachment(well_tag_number_id=well_tag_number) for well_tag_number in well_tag_numbers],
+            batch_size=batch_size)
+        return len(well_tag_numbers)
+
+    def update_counts(self, counts, batch_size):
         """Summary:
-            Queries for files related to a well tag and updates the counted values in the WellAttachments table
+            Sets the counts on every WellAttachment entry, writing only the entries that changed
         """
-        response = self.CLIENT.get_documents(int(well_tag_number), resource="well", include_private=True)
-        hash_map = defaultdict(int)
-        for doc in response['public']:
-            split_file = doc["name"].split("_")
-            if len(split_file) <= 3:
-                value = split_file[1].replace(" ", "_").lower()
-                if "." in value:
-                    value = value.split(".")[0]
-            else:
-                value = split_file[1].lower() + "_" + split_file[2].lower()
-            hash_map[value] = (hash_map[value] or 0) + 1
-        for doc in response['private']:
-            split_file = doc["name"].split("_")
-            if len(split_file) <= 3:
-                value = split_file[1].replace(" ", "_").lower()
-            else:
-                value = split_file[1].lower() + "_" + split_file[2].lower()
-            hash_map[value] = (hash_map[value] or 0) + 1
-        
-        if hash_map:
-            try:
-                well_attachment_entry = self.get_or_create_entry(well_tag_number)
-                for key, value in hash_map.items():
-                    if "well_record" in key:
-                        setattr(well_attachment_entry, 'well_construction', value)
-                    elif key in self.formatted_well_tags:
-                        setattr(well_attachment_entry, key, value)
-                    else:
-                        self.logger.info("Invalid file type for well %s: %s", well_tag_number, key)
-                well_attachment_entry.save()
-            except Exception as e:
-                self.logger.error(e)
-        
-        
+        invalid_types = Counter()
+        for well_counts in counts.values():
+            for key, count in well_counts.items():
+                if key not in ATTACHMENT_FIELDS:
+                    invalid_types[key] += count
+        for key, count in invalid_types.items():
+            logger.info("Invalid file type %s: %s files", key, count)
+
+        updated = 0
+        changed = []
+        for entry in WellAttachment.objects.order_by('pk').iterator(chunk_size=batch_size):
+            well_counts = counts.get(entry.well_tag_number_id, {})
+            entry_changed = False
+            for field in ATTACHMENT_FIELDS:
+                count = well_counts.get(field, 0)
+                if getattr(entry, field) != count:
+                    setattr(entry, field, count)
+                    entry_changed = True
+            if entry_changed:
+                changed.append(entry)
+            if len(changed) >= batch_size:
+                WellAttachment.objects.bulk_update(changed, ATTACHMENT_FIELDS)
+                updated += len(changed)
+                changed = []
+        if changed:
+            WellAttachment.objects.bulk_update(changed, ATTACHMENT_FIELDS)
+            updated += len(changed)
+        return updated
+
     def handle(self, *args, **options):
-        """Summary:  
-            Function to iterate through Minio buckets in order to get the sum of all files relating to a well,
-            updates WellAttachment entry corresponding to well tag number
+        """Summary:
+            Lists the public and private well document buckets once each, counts the files relating to each
+            well, and updates the WellAttachment entry for each well
         """
-        offset = 0
-        self.populate_wells_with_attachment_table()
-        while True:
-            well_tag_numbers = self.get_well_tags(offset)
-            if not well_tag_numbers: # No tags left to iterate
-                break
-            for well_tag_number in well_tag_numbers:
-                self.process_well_tag(well_tag_number)    
-            offset += self.BATCH_SIZE
+        client = MinioClient(disable_private=False)
+        buckets = [
+            (client.public_client, client.public_bucket),
+            (client.private_client, client.private_bucket),
+        ]
+        counts = self.count_documents(buckets, options['workers'])
+        created = self.create_missing_entries(options['batch_size'])
+        updated = self.update_counts(counts, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            'Counted documents for {} wells: {} entries created, {} updated'.format(len(counts), created, updated)))
@@ -0,0 +1,50 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+import logging
+from timeit import default_timer as timer
+
+from django.core.management.base import BaseCommand
+
+from wells.activity_summary import REFRESH_BATCH_SIZE, refresh_activity_summaries
+from wells.models import Well
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Backfill (or rebuild) the well activity summaries used by the QA/QC dashboard.
+
+    Run from command line:
+    python manage.py refresh_activity_summary
+    python manage.py refresh_activity_summary --start 1 --end 50000
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=int, nargs='?', help='Well to start at', default=None)
+        parser.add_argument('--end', type=int, nargs='?', help='Well to end at', default=None)
+        parser.add_argument('--batch-size', type=int, nargs='?', help='Wells written per query',
+                            default=REFRESH_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        wells = Well.objects.all()
+        if options['start'] is not None:
+            wells = wells.filter(well_tag_number__gte=options['start'])
+        if options['end'] is not None:
+            wells = wells.filter(well_tag_number__lte=options['end'])
+
+        start = timer()
+        count = refresh_activity_summaries(wells, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            'Refreshed {} well activity summaries in {:.2f}s'.format(count, timer() - start)))
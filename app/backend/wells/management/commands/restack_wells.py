@@ -0,0 +1,271 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+import json
+import logging
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from timeit import default_timer as timer
+
+import reversion
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Q
+
+from wells.activity_summary import refresh_activity_summaries
+from wells.models import Well, ActivitySubmission, Casing, Screen, LinerPerforation, DecommissionDescription, \
+    LithologyDescription, AquiferParameters
+from wells.serializers import WellStackerSerializer
+from wells.stack import StackWells
+
+logger = logging.getLogger(__name__)
+
+# The sets on a well that are replaced every time a well is stacked (see WellStackerSerializer.update).
+WELL_SET_MODELS = {
+    'casing_set': Casing,
+    'aquifer_parameters_set': AquiferParameters,
+    'screen_set': Screen,
+    'linerperforation_set': LinerPerforation,
+    'decommission_description_set': DecommissionDescription,
+    'lithologydescription_set': LithologyDescription,
+}
+
+# Changes to these fields have to go through Well.save(), so the pre_save and post_save receivers
+# (utm coordinates, geocoding, cross references and vector tiles) see them.
+SAVE_SIGNAL_FIELDS = ('geom', 'street_address', 'city', 'legal_pid', 'comments')
+
+# Database connections inherited from the parent process by a forked stacking worker.
+_inherited_connections = []
+
+
+def init_stack_worker():
+    """
+    Forked workers must not use (or close) the database connections inherited from the parent
+    process. Keep a reference to them, and let each worker open its own connection.
+    """
+    for conn in connections.all():
+        _inherited_connections.append(conn.connection)
+        conn.connection = None
+
+
+def stack_worker(well_tag_numbers):
+    """
+    Runs in a worker process. Reads the submissions for a batch of wells and stacks them.
+
+    :return: {well_tag_number: composite}
+    """
+    return StackWells().stack_composites(well_tag_numbers)
+
+
+def stacked_batches(executor, batches, queued):
+    """
+    Yield (batch, composites) for each batch, in order. Only a limited number of batches are queued
+    ahead of the one being consumed, so stacked wells don't pile up in memory while batches are written.
+    """
+    pending = deque()
+    for batch in batches:
+        pending.append((batch, executor.submit(stack_worker, batch)))
+        if len(pending) > queued:
+            batch, future = pending.popleft()
+            yield batch, future.result()
+    while pending:
+        batch, future = pending.popleft()
+        yield batch, future.result()
+
+
+def parse_wells(values):
+    """
+    Turn the wells argument (well tag numbers, ranges like 100-200, or "all") into a filter on the
+    well tag number of a submission. Returns None for all wells.
+    """
+    if not values or 'all' in values:
+        return None
+    query = Q()
+    for value in values:
+        try:
+            if '-' in value:
+                start, end = value.split('-', 1)
+                query |= Q(well__gte=int(start), well__lte=int(end))
+            else:
+                query |= Q(well=int(value))
+        except ValueError:
+            raise CommandError('Invalid well tag number or range: {}'.format(value))
+    return query
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the composite view of wells from their activity submissions, e.g. after code table or
+    stacking changes.
+
+    Run from command line:
+    python manage.py restack_wells all
+    python manage.py restack_wells 123 200-300 --batch-size 500 --workers 4
+    python manage.py restack_wells all --resume
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('wells', nargs='*', help='Well tag numbers, ranges (e.g. 100-200) or "all"')
+        parser.add_argument('--batch-size', type=int, nargs='?', help='Wells per batch', default=500)
+        parser.add_argument('--workers', type=int, nargs='?',
+                            help='Number of worker processes stacking wells (0 to use every core)', default=0)
+        parser.add_argument('--state-file', type=str, nargs='?',
+                            help='File recording the last batch written, for --resume',
+                            default='restack_wells_state.json')
+        parser.add_argument('--resume', action='store_true',
+                            help='Continue after the last batch recorded in the state file')
+
+    def handle(self, *args, **options):
+        if not options['wells']:
+            raise CommandError('Specify well tag numbers, ranges, or "all"')
+        batch_size = options['batch_size']
+        workers = options['workers'] or os.cpu_count()
+        self.state_file = options['state_file']
+
+        well_tag_numbers = ActivitySubmission.objects.filter(well__isnull=False)
+        query = parse_wells(options['wells'])
+        if query is not None:
+            well_tag_numbers = well_tag_numbers.filter(query)
+        if options['resume']:
+            last = self.load_state(options['wells'])
+            if last is not None:
+                self.stdout.write('Resuming after well tag number {}'.format(last))
+                well_tag_numbers = well_tag_numbers.filter(well__gt=last)
+        well_tag_numbers = list(
+            well_tag_numbers.order_by('well').values_list('well', flat=True).distinct())
+
+        total = len(well_tag_numbers)
+        if total == 0:
+            self.stdout.write(self.style.ERROR('No wells with submissions found'))
+            return
+        batches = [well_tag_numbers[i:i + batch_size] for i in range(0, total, batch_size)]
+        self.stdout.write('Re-stacking {} wells in {} batches with {} workers'.format(
+            total, len(batches), workers))
+
+        done = 0
+        restacked = 0
+        skipped = 0
+        failures = []
+        start = timer()
+        # Workers are forked so that they share the configured database settings. Batches are stacked
+        # in parallel, but written one at a time, in order, so the state file always marks the point
+        # everything before has been written.
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'),
+                                 initializer=init_stack_worker) as executor:
+            for batch, composites in stacked_batches(executor, batches, workers * 2):
+                written, failed = self.write_batch(composites)
+                restacked += written
+                failures += failed
+                skipped += len(batch) - len(composites)
+                done += len(batch)
+                self.save_state(options['wells'], batch[-1])
+                elapsed = timer() - start
+                self.stdout.write('{}/{} wells ({:.0f} wells/s), up to well tag number {}'.format(
+                    done, total, done / elapsed, batch[-1]))
+
+        self.stdout.write(self.style.SUCCESS('Re-stacked {} wells in {:.2f}s'.format(restacked, timer() - start)))
+        if skipped:
+            self.stdout.write('Skipped {} wells that are not stacked from their submissions alone'.format(skipped))
+        if failures:
+            self.stdout.write(self.style.ERROR('Failed to re-stack {} wells: {}'.format(
+                len(failures), ', '.join(map(str, failures)))))
+
+    @transaction.atomic
+    def write_batch(self, composites):
+        """
+        Validate the composites of a batch of wells and write them, as a single reversion revision.
+
+        :return: (number of wells written, list of well tag numbers that failed validation)
+        """
+        wells = Well.objects.in_bulk(list(composites.keys()))
+        failures = []
+        validated = {}
+        with reversion.create_revision():
+            reversion.set_comment('Re-stacked from activity submissions')
+            for well_tag_number, composite in composites.items():
+                well = wells[well_tag_number]
+                serializer = WellStackerSerializer(well, data=composite, partial=True)
+                if not serializer.is_valid():
+                    logger.error('Unable to re-stack well {}: {}'.format(well_tag_number, serializer.errors))
+                    failures.append(well_tag_number)
+                elif any(field in serializer.validated_data and
+                         serializer.validated_data[field] != getattr(well, field)
+                         for field in SAVE_SIGNAL_FIELDS):
+                    # Saved individually, so the save receivers run (and add it to the revision).
+                    serializer.save()
+                else:
+                    validated[well] = serializer.validated_data
+            self.bulk_update_wells(validated)
+            for well in validated:
+                reversion.add_to_revision(well)
+        # The save receivers don't run for bulk updates.
+        refresh_activity_summaries(Well.objects.filter(well_tag_number__in=[well.pk for well in validated]))
+        return len(composites) - len(failures), failures
+
+    def bulk_update_wells(self, validated):
+        """
+        The equivalent of WellStackerSerializer.save() for many wells, using a fixed number of queries.
+
+        :param validated: {well: validated data}
+        """
+        if not validated:
+            return
+        wells = list(validated.keys())
+
+        # Depth interval sets are always replaced.
+        for key, model in WELL_SET_MODELS.items():
+            model.objects.filter(well__in=wells).delete()
+            records = []
+            for well, data in validated.items():
+                for record_data in data.pop(key, None) or []:
+                    record_data.pop('well', None)
+                    records.append(model(well=well, **record_data))
+            model.objects.bulk_create(records)
+
+        # Many to many sets are replaced if they're part of the composite.
+        many_to_many = [field for field in Well._meta.many_to_many
+                        if any(field.name in data for data in validated.values())]
+        for field in many_to_many:
+            through = field.remote_field.through
+            source = field.m2m_field_name()
+            target = field.m2m_reverse_field_name()
+            replaced = [well for well, data in validated.items() if field.name in data]
+            through.objects.filter(**{'{}__in'.format(source): replaced}).delete()
+            through.objects.bulk_create([
+                through(**{source: well, target: item})
+                for well in replaced for item in validated[well].pop(field.name)])
+
+        fields = set()
+        for well, data in validated.items():
+            for attr, value in data.items():
+                setattr(well, attr, value)
+                fields.add(attr)
+        if fields:
+            Well.objects.bulk_update(wells, sorted(fields))
+
+    def load_state(self, wells):
+        """ Return the last well tag number written by a previous run with the same wells argument. """
+        if not os.path.exists(self.state_file):
+            return None
+        with open(self.state_file) as state_file:
+            state = json.load(state_file)
+        if state.get('wells') != wells:
+            raise CommandError('{} is for a different set of wells ({}), not resuming'.format(
+                self.state_file, ' '.join(state.get('wells', []))))
+        return state.get('last_well_tag_number')
+
+    def save_state(self, wells, last_well_tag_number):
+        with open(self.state_file, 'w') as state_file:
+            json.dump({'wells': wells, 'last_well_tag_number': last_well_tag_number}, state_file)
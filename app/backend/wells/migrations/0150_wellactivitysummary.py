@@ -0,0 +1,31 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    """
+    Adds well_activity_summary, the latest activity on each well used by the QA/QC dashboard filters
+    and orderings. Run the refresh_activity_summary management command to fill it in for existing wells.
+    """
+    dependencies = [
+        ('wells', '0149_add_well_status_to_view'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WellActivitySummary',
+            fields=[
+                ('well', models.OneToOneField(db_column='well_tag_number', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='activity_summary', serialize=False, to='wells.well')),
+                ('latest_well_activity_type_code', models.CharField(blank=True, db_index=True, max_length=10, null=True)),
+                ('last_work_start_date', models.DateField(blank=True, db_index=True, null=True)),
+                ('last_work_end_date', models.DateField(blank=True, db_index=True, null=True)),
+                ('last_activity_start_date', models.DateField(blank=True, db_index=True, null=True)),
+                ('last_activity_end_date', models.DateField(blank=True, db_index=True, null=True)),
+                ('last_casing_diameter', models.DecimalField(blank=True, db_index=True, decimal_places=3, max_digits=8, null=True)),
+                ('last_lithology_raw_data', models.CharField(blank=True, db_index=True, max_length=250, null=True)),
+            ],
+            options={
+                'db_table': 'well_activity_summary',
+            },
+        ),
+    ]
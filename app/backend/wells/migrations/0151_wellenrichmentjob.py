@@ -0,0 +1,31 @@
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    """
+    Adds well_enrichment_job, the queue of wells whose location scores are calculated by the
+    enrich_wells management command instead of while the well is saved.
+    """
+    dependencies = [
+        ('wells', '0150_wellactivitysummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WellEnrichmentJob',
+            fields=[
+                ('well', models.OneToOneField(db_column='well_tag_number', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='enrichment_job', serialize=False, to='wells.well')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('FAILED', 'Failed')], default='PENDING', max_length=10)),
+                ('requested_date', models.DateTimeField(default=django.utils.timezone.now)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'well_enrichment_job',
+                'indexes': [models.Index(fields=['status', 'run_after'], name='well_enrichment_status_idx')],
+            },
+        ),
+    ]
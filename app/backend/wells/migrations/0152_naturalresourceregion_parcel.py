@@ -0,0 +1,39 @@
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Adds natural_resource_region and parcel, local copies of the DataBC layers used to find a well's
+    natural resource region and distance to its parcel. Both geometry columns get GiST indexes.
+    Load them with the import_location_layers management command.
+    """
+    dependencies = [
+        ('wells', '0151_wellenrichmentjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NaturalResourceRegion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('region_name', models.CharField(max_length=250)),
+                ('org_unit_name', models.CharField(max_length=250)),
+                ('geom', django.contrib.gis.db.models.fields.MultiPolygonField(srid=3005)),
+            ],
+            options={
+                'db_table': 'natural_resource_region',
+            },
+        ),
+        migrations.CreateModel(
+            name='Parcel',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pid', models.PositiveIntegerField(db_index=True)),
+                ('geom', django.contrib.gis.db.models.fields.MultiPolygonField(srid=3005)),
+            ],
+            options={
+                'db_table': 'parcel',
+            },
+        ),
+    ]
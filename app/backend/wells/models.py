@@ -26,6 +26,7 @@ from gwells.models import AuditModel, ProvinceStateCode, ScreenIntakeMethodCode,
     ScreenOpeningCode, ScreenBottomCode, ScreenTypeCode, ScreenAssemblyTypeCode, CodeTableModel,\
     BasicCodeTableModel
 from gwells.models.common import AuditModelStructure
+from gwells.db_comments.model_mixins import DBComments
 from gwells.models.lithology import (
     LithologyDescriptionCode, LithologyColourCode, LithologyHardnessCode,
     LithologyMaterialCode, BedrockMaterialCode, BedrockMaterialDescriptorCode, LithologyStructureCode,
@@ -2060,6 +2061,94 @@ class FieldsProvided(models.Model):
         db_table = 'fields_provided'
 
 
+class WellActivitySummary(models.Model, DBComments):
+    """
+    The latest activity on a well, as used by the QA/QC dashboard to filter and sort wells.
+    Kept up to date from the well's submissions, casings and lithology by wells.activity_summary, so
+    these don't have to be worked out with correlated subqueries on every request.
+    """
+    well = models.OneToOneField(Well, on_delete=models.CASCADE, primary_key=True, db_column='well_tag_number',
+                                related_name='activity_summary')
+    # From the latest (by work end date) submission that isn't a staff edit.
+    latest_well_activity_type_code = models.CharField(max_length=10, blank=True, null=True, db_index=True)
+    last_work_start_date = models.DateField(blank=True, null=True, db_index=True)
+    last_work_end_date = models.DateField(blank=True, null=True, db_index=True)
+    # The latest work start and end dates of any submission.
+    last_activity_start_date = models.DateField(blank=True, null=True, db_index=True)
+    last_activity_end_date = models.DateField(blank=True, null=True, db_index=True)
+    # From the deepest casing and lithology description.
+    last_casing_diameter = models.DecimalField(max_digits=8, decimal_places=3, blank=True, null=True,
+                                               db_index=True)
+    last_lithology_raw_data = models.CharField(max_length=250, blank=True, null=True, db_index=True)
+
+    class Meta:
+        db_table = 'well_activity_summary'
+
+    db_table_comment = ('The latest activity, casing diameter and lithology of each well, derived from its '
+                        'activity submissions, casings and lithology descriptions.')
+
+
+class WellEnrichmentJob(models.Model, DBComments):
+    """
+    A well whose location scores (geocode distance, distance to PID, address and city scores and
+    natural resource region) need to be worked out again, because its location, address or PID changed.
+    Jobs are queued when a well is saved and run by the enrich_wells management command, so saving a
+    well doesn't wait on the geocoder and WFS services. Jobs are deleted once they succeed.
+    """
+    PENDING = 'PENDING'
+    FAILED = 'FAILED'
+    STATUS_CHOICES = ((PENDING, 'Pending'), (FAILED, 'Failed'))
+
+    well = models.OneToOneField(Well, on_delete=models.CASCADE, primary_key=True, db_column='well_tag_number',
+                                related_name='enrichment_job')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    # When the job was last queued. A job queued again while it is running is kept for another run.
+    requested_date = models.DateTimeField(default=timezone.now)
+    # Not run before this time: jobs are held while a worker has them, and between retries.
+    run_after = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'well_enrichment_job'
+        indexes = [models.Index(fields=['status', 'run_after'], name='well_enrichment_status_idx')]
+
+    db_table_comment = ('Wells waiting for their location scores and natural resource region to be '
+                        'calculated, after a change to their location, address or PID.')
+
+
+class NaturalResourceRegion(models.Model, DBComments):
+    """
+    A local copy of the Natural Resource Regions (WHSE_ADMIN_BOUNDARIES.ADM_NR_REGIONS_SPG), used to find
+    the region a well is in. Loaded with the import_location_layers management command.
+    """
+    region_name = models.CharField(max_length=250)
+    org_unit_name = models.CharField(max_length=250)
+    geom = models.MultiPolygonField(srid=3005)
+
+    class Meta:
+        db_table = 'natural_resource_region'
+
+    db_table_comment = ('Natural Resource Region boundaries, copied from DataBC, used to find the region '
+                        'each well is within.')
+
+
+class Parcel(models.Model, DBComments):
+    """
+    A local copy of the ParcelMap BC parcels (WHSE_CADASTRE.PMBC_PARCEL_FABRIC_POLY_SVW) that have a PID,
+    used to work out how far a well is from the parcel on its record. Loaded with the
+    import_location_layers management command.
+    """
+    pid = models.PositiveIntegerField(db_index=True)
+    geom = models.MultiPolygonField(srid=3005)
+
+    class Meta:
+        db_table = 'parcel'
+
+    db_table_comment = ('Parcel boundaries by PID, copied from ParcelMap BC, used to work out the distance '
+                        'from each well to the parcel given on its record.')
+
+
 class LithologyDescription(AuditModel):
     """
     Lithology information details
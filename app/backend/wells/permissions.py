@@ -12,7 +12,7 @@
     limitations under the License.
 """
 from rest_framework.permissions import BasePermission, SAFE_METHODS
-from gwells.roles import WELLS_VIEWER_ROLE, WELLS_EDIT_ROLE, WELLS_SUBMISSION_ROLE, WELLS_SUBMISSION_VIEWER_ROLE, IDIR_ROLE
+from gwells.roles import WELLS_VIEWER_ROLE, WELLS_EDIT_ROLE, WELLS_SUBMISSION_ROLE, WELLS_SUBMISSION_VIEWER_ROLE, IDIR_ROLE, has_role
 
 
 class WellsEditOrReadOnly(BasePermission):
@@ -21,8 +21,7 @@ class WellsEditOrReadOnly(BasePermission):
     edit rights.
     """
     def has_permission(self, request, view):
-        has_edit = request.user and request.user.is_authenticated and request.user.groups.filter(
-            name=WELLS_EDIT_ROLE).exists()
+        has_edit = request.user and request.user.is_authenticated and has_role(request.user, WELLS_EDIT_ROLE)
         result = has_edit or request.method in SAFE_METHODS
         return result
 
@@ -31,10 +30,8 @@ class WellsIDIREditOrReadOnly(BasePermission):
     Allows read access to all IDIR users and write access to those with edit rights.
     """
     def has_permission(self, request, view):
-        has_edit = request.user and request.user.is_authenticated and request.user.groups.filter(
-            name=WELLS_EDIT_ROLE).exists()
-        result = (has_edit or request.method in SAFE_METHODS) and request.user.groups.filter(
-            name=IDIR_ROLE).exists()
+        has_edit = request.user and request.user.is_authenticated and has_role(request.user, WELLS_EDIT_ROLE)
+        result = (has_edit or request.method in SAFE_METHODS) and has_role(request.user, IDIR_ROLE)
         return result
 
 
@@ -45,7 +42,7 @@ class WellsDocumentViewPermissions(BasePermission):
 
     def has_permission(self, request, view):
         return request.user and request.user.is_authenticated and\
-            request.user.groups.filter(name=WELLS_VIEWER_ROLE).exists()
+            has_role(request.user, WELLS_VIEWER_ROLE)
 
 
 class WellsEditPermissions(BasePermission):
@@ -60,7 +57,7 @@ class WellsEditPermissions(BasePermission):
         in a group that has 'add_well' permission)
         """
         return request.user and request.user.is_authenticated and\
-            request.user.groups.filter(name=WELLS_EDIT_ROLE).exists()
+            has_role(request.user, WELLS_EDIT_ROLE)
 
 
 class WellsSubmissionPermissions(BasePermission):
@@ -75,7 +72,7 @@ class WellsSubmissionPermissions(BasePermission):
         in a group that has 'wells_submission' permission)
         """
         return request.user and request.user.is_authenticated and\
-            request.user.groups.filter(name=WELLS_SUBMISSION_ROLE).exists()
+            has_role(request.user, WELLS_SUBMISSION_ROLE)
 
 
 class WellsSubmissionViewerPermissions(BasePermission):
@@ -90,4 +87,4 @@ class WellsSubmissionViewerPermissions(BasePermission):
         in a group that has 'wells_submission_viewer' permission)
         """
         return request.user and request.user.is_authenticated and\
-            request.user.groups.filter(name=WELLS_SUBMISSION_VIEWER_ROLE).exists()
+            has_role(request.user, WELLS_SUBMISSION_VIEWER_ROLE)
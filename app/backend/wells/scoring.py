@@ -0,0 +1,91 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+import re
+
+from rapidfuzz import fuzz, process, utils
+
+"""
+Fuzzy address scores for well locations, comparing a well's address and city with the reverse geocoded
+address.
+
+Used both when a well is scored (wells.utils) and by the province wide location QA script
+(scripts/qaqc/gwells_locationqa.py), so the two give the same scores. This module must not import Django.
+"""
+
+# Abbreviate road types in well addresses to match the geocoder's.
+STREET_ABBREVIATIONS = {
+    'road': 'rd',
+    'drive': 'dr',
+    'avenue': 'ave',
+    'highway': 'hwy',
+    'street': 'st',
+    'boulevard': 'blvd',
+    'crescent': 'cres',
+    'frontage': 'frtg',
+    'place': 'pl',
+    'court': 'crt',
+    'terrace': 'terr',
+    'lookout': 'lkout',
+    'heights': 'hts',
+}
+STREET_ABBREVIATIONS_RE = re.compile(r'\b(?:{})\b'.format('|'.join(STREET_ABBREVIATIONS)))
+
+# The geocoder address fields making up a street address, e.g. "101 Main St W".
+STREET_ADDRESS_FIELDS = ('civicNumber', 'streetName', 'streetType', 'streetDirection')
+
+
+def abbreviate_street_type(match):
+    """ Replacement for a STREET_ABBREVIATIONS_RE match """
+    return STREET_ABBREVIATIONS[match.group(0)]
+
+
+def normalise_street_address(street_address):
+    """ A well's street address, lowercased and with road types abbreviated like the geocoder's """
+    return STREET_ABBREVIATIONS_RE.sub(abbreviate_street_type, (street_address or '').lower())
+
+
+def street_address_slug(geocoded_address):
+    """ The number, name, type and direction of a geocoded address, e.g. "101 Main St W" """
+    return ' '.join(
+        str(geocoded_address[field]) for field in STREET_ADDRESS_FIELDS
+        if geocoded_address.get(field) not in (None, ''))
+
+
+def token_set_score(left, right):
+    """ The token set ratio (0 to 100) of two strings, ignoring case and punctuation """
+    return int(round(fuzz.token_set_ratio(left or '', right or '', processor=utils.default_process)))
+
+
+def token_set_scores(left, right, workers=-1):
+    """
+    token_set_score() for each pair of the equal length sequences left and right, computed in one batch
+    (on all cores with the default workers=-1). Returns a list of ints.
+    """
+    scores = process.cpdist(
+        left, right, scorer=fuzz.token_set_ratio, processor=utils.default_process, workers=workers)
+    return [int(round(score)) for score in scores]
+
+
+def score_address(street_address, geocoded_address):
+    """ The similarity of a well's street address and its geocoded address, or None without one """
+    if not geocoded_address:
+        return None
+    return token_set_score(normalise_street_address(street_address), street_address_slug(geocoded_address))
+
+
+def score_city(city, geocoded_address):
+    """ The similarity of a well's city and the locality of its geocoded address, or None without one """
+    if not geocoded_address:
+        return None
+    return token_set_score(city, geocoded_address.get('localityName'))
@@ -1,13 +1,13 @@
 import math
 from django.utils import timezone
 from django.dispatch import receiver
-from django.db.models.signals import pre_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.contrib.gis.gdal import SpatialReference, CoordTransform
-from wells.models import Well
+from wells.activity_summary import refresh_activity_summary
+from wells.enrichment import queue_enrichment
+from wells.models import Well, ActivitySubmission, LithologyDescription
 from gwells.settings import TESTING
-from wells.utils import calculate_geocode_distance, calculate_pid_distance_for_well, \
-  calculate_score_address, calculate_score_city, calculate_natural_resource_region_for_well, \
-  reverse_geocode
+from gwells.tiles import LITHOLOGY_LAYERS, WELL_LAYERS, invalidate_tiles
 
 def _get_utm_zone(geom):
     if not geom:
@@ -58,14 +58,60 @@ def update_utm(sender, instance, **kwargs):
     instance.utm_easting = round(utm_point.GetX())
     instance.utm_northing = round(utm_point.GetY())
 
+@receiver(pre_save, sender=Well)
+def remember_tile_geom(sender, instance, **kwargs):
+    """
+    Keep the stored location of a well so the vector tiles it was drawn on can be invalidated
+    once the save completes.
+    """
+    instance._tile_geom = None
+    if instance.pk and not instance._state.adding:
+        instance._tile_geom = sender.objects.filter(pk=instance.pk).values_list('geom', flat=True).first()
+
+
+@receiver(post_save, sender=Well)
+def invalidate_well_tiles(sender, instance, **kwargs):
+    invalidate_tiles(WELL_LAYERS, [getattr(instance, '_tile_geom', None), instance.geom])
+
+
+@receiver(post_delete, sender=Well)
+def invalidate_deleted_well_tiles(sender, instance, **kwargs):
+    invalidate_tiles(WELL_LAYERS, [instance.geom])
+
+
+@receiver(post_save, sender=LithologyDescription)
+@receiver(post_delete, sender=LithologyDescription)
+def invalidate_lithology_tiles(sender, instance, raw=False, **kwargs):
+    # Lithology is drawn at its well's location. Lithology from a submission that isn't on a well yet
+    # isn't drawn.
+    if not raw and instance.well_id:
+        geom = Well.objects.filter(pk=instance.well_id).values_list('geom', flat=True).first()
+        invalidate_tiles(LITHOLOGY_LAYERS, [geom])
+
+
+@receiver(post_save, sender=Well)
+def refresh_well_activity_summary(sender, instance, raw=False, **kwargs):
+    # Stacking saves the well after replacing its casings and lithology.
+    if not raw:
+        refresh_activity_summary(instance.well_tag_number)
+
+
+@receiver(post_save, sender=ActivitySubmission)
+@receiver(post_delete, sender=ActivitySubmission)
+def refresh_submission_activity_summary(sender, instance, raw=False, **kwargs):
+    if not raw and instance.well_id:
+        refresh_activity_summary(instance.well_id)
+
+
 if not TESTING:
     @receiver(pre_save, sender=Well)
     def update_well(sender, instance, **kwargs):
         """
         Signal receiver that triggers before a Well instance is saved.
 
-        For new Well instances, it calculates and sets various geographical and scoring fields.
-        For existing Well instances, it recalculates these fields if the geographical location (geom) has changed.
+        New Well instances with a location, and existing Well instances whose location, address, city or
+        PID changed, are queued to have their geographical and scoring fields calculated once the save is
+        committed (see wells.enrichment).
 
         Parameters:
         sender (Model Class): The model class that sent the signal. Should always be the Well model.
@@ -89,11 +135,12 @@ if not TESTING:
             comments_lower = comments.lower() if comments is not None else ''
             return any(term in comments_lower for term in search_terms)
 
+        instance._needs_enrichment = False
         try:
             if instance._state.adding and not instance.pk:
                 # Handling new instance creation
                 if is_valid_geom(instance.geom):
-                    set_well_attributes(instance)
+                    instance._needs_enrichment = True
             else:
                 # Handling updates to existing instances
                 original_instance = sender.objects.get(pk=instance.pk)
@@ -103,7 +150,7 @@ if not TESTING:
                 pid_changed = original_instance.legal_pid != instance.legal_pid
 
                 if (geom_changed or address_changed or city_changed or pid_changed) and is_valid_geom(instance.geom):
-                    set_well_attributes(instance)
+                    instance._needs_enrichment = True
 
             # If comments indicate a cross-reference, set cross-reference attributes
             if instance.comments and contains_cross_reference_comment(instance.comments):
@@ -112,6 +159,15 @@ if not TESTING:
         except Exception as e:
             print(f"Error in update_well for Well ID {instance.pk}: {str(e)}")
 
+    @receiver(post_save, sender=Well)
+    def queue_well_enrichment(sender, instance, raw=False, **kwargs):
+        """
+        Queues a well flagged by update_well. The job is written in the same transaction as the well,
+        so the enrich_wells worker only sees it once the save is committed.
+        """
+        if not raw and getattr(instance, '_needs_enrichment', False):
+            queue_enrichment(instance.well_tag_number)
+
 
 def set_cross_reference_attributes(instance):
     """
@@ -124,24 +180,3 @@ def set_cross_reference_attributes(instance):
         instance.cross_referenced_date = timezone.now()
         instance.cross_referenced_by = instance.update_user
 
-
-def set_well_attributes(instance):
-    """
-    Set attributes for a Well instance based on its geographical location.
-
-    Parameters:
-    instance (Well instance): The instance of Well being processed.
-    """
-    # Calculate distance scores
-    instance.geocode_distance = calculate_geocode_distance(instance)
-    instance.distance_to_pid = calculate_pid_distance_for_well(instance)
-
-    # Geocode point to address
-    geocoded_address = reverse_geocode(instance.longitude, instance.latitude)
-
-    # Calculate address scores
-    instance.score_address = calculate_score_address(instance, geocoded_address)
-    instance.score_city = calculate_score_city(instance, geocoded_address)
-
-    # Calculate natural resource region of well
-    instance.natural_resource_region = calculate_natural_resource_region_for_well(instance)
\ No newline at end of file
@@ -11,6 +11,8 @@
     See the License for the specific language governing permissions and
     limitations under the License.
 """
+import bisect
+import itertools
 import logging
 import threading
 
@@ -19,12 +21,12 @@ from rest_framework.exceptions import ValidationError, APIException
 from rest_framework import serializers
 
 from gwells.models import ProvinceStateCode, DATALOAD_USER
-from submissions.models import WellActivityCode, WELL_ACTIVITY_CODE_ALTERATION,\
+from submissions.models import WELL_ACTIVITY_CODE_ALTERATION,\
     WELL_ACTIVITY_CODE_CONSTRUCTION, WELL_ACTIVITY_CODE_DECOMMISSION, WELL_ACTIVITY_CODE_LEGACY,\
     WELL_ACTIVITY_CODE_STAFF_EDIT
 import submissions.serializers
 from wells.models import Well, ActivitySubmission, ActivitySubmissionLinerPerforation, FieldsProvided, WellAttachment, \
-    WellStatusCode, WELL_STATUS_CODE_CONSTRUCTION,\
+    WELL_STATUS_CODE_CONSTRUCTION,\
     WELL_STATUS_CODE_DECOMMISSION, WELL_STATUS_CODE_ALTERATION, WELL_STATUS_CODE_OTHER, LithologyDescription,\
     Casing, Screen, LinerPerforation, DecommissionDescription, LithologyDescription, AquiferParameters
 
@@ -39,6 +41,7 @@ logger = logging.getLogger(__name__)
 # Not sure if a lock is really needed, playing safe.
 target_keys_lock = threading.Lock()
 target_keys = None
+key_value_attnames = None
 
 # There isn't always a like to like mapping of values, sometimes the source key will differ from
 # the target key:
@@ -134,6 +137,11 @@ KEY_VALUE_LOOKUP = {
 }
 
 
+# Related sets that are loaded up front for every submission being stacked, so that reading them
+# doesn't cost a query per submission.
+SUBMISSION_PREFETCH = tuple(FOREIGN_KEY_MODEL_LOOKUP.keys()) + tuple(MANY_TO_MANY_LOOKUP.keys())
+
+
 def is_staff_edit(submission):
     return submission.well_activity_type.code == WELL_ACTIVITY_CODE_STAFF_EDIT
 
@@ -151,25 +159,39 @@ def overlap(a, b):
     records_overlap = (a[0] == b[0]) or (a[1] == b[1])
     return records_intersect or records_overlap
 
-def series_overlaps(record, record_set):
-    """
-    Return True if a record overlaps with a list of records
-    """
-    record_start = record.get('start')
-    record_end = record.get('end')
-    for other_record in record_set:
-        other_record_start = other_record.get('start')
-        other_record_end = other_record.get('end')
-        if overlap((record_start, record_end), (other_record_start, other_record_end)):
-            return True
-    return False
-
 def merge_series(prev_series, next_series):
     """
-    Merges two start / end series if there are overlaps
+    Merges two start / end series if there are overlaps: previous records that overlap() any of the
+    new records are dropped in favour of the new records.
+
+    Rather than comparing every previous record with every new record, the new records are sorted by
+    start, so that checking whether a position falls inside one of them is a binary search.
     """
+    # overlap() is never True when a start or end is missing.
+    intervals = sorted(
+        (record.get('start'), record.get('end')) for record in next_series
+        if record.get('start') is not None and record.get('end') is not None)
+    starts = [start for (start, end) in intervals]
+    # The furthest end of the new records, up to and including each position in starts.
+    furthest_ends = list(itertools.accumulate((end for (start, end) in intervals), max))
+    start_positions = set(starts)
+    end_positions = set(end for (start, end) in intervals)
+
+    def within_next_series(position):
+        # Is the position strictly between the start and end of any of the new records?
+        count = bisect.bisect_left(starts, position)
+        return count > 0 and furthest_ends[count - 1] > position
+
+    def overlaps_next_series(record):
+        start = record.get('start')
+        end = record.get('end')
+        if start is None or end is None:
+            return False
+        return (start in start_positions or end in end_positions or
+                within_next_series(start) or within_next_series(end))
+
     # Remove old records that overlap with new records
-    prev_series = [record for record in prev_series if not series_overlaps(record, next_series)]
+    prev_series = [record for record in prev_series if not overlaps_next_series(record)]
     # Join the old with the new
     new = prev_series + next_series
     new.sort(key=lambda record: (record.get('start'), record.get('end')))
@@ -189,10 +211,37 @@ class StackWells():
             target_keys_lock.release()
         return target_keys
 
+    def _get_key_value_attnames(self):
+        # Most of the KEY_VALUE_LOOKUP values are just the primary key of the related code table, which
+        # is already on the submission (e.g. well_class_id). Reading that avoids fetching the related row.
+        global key_value_attnames
+        try:
+            target_keys_lock.acquire()
+            if key_value_attnames is None:
+                key_value_attnames = {
+                    field.name: field.attname for field in ActivitySubmission._meta.concrete_fields
+                    if field.many_to_one and
+                    KEY_VALUE_LOOKUP.get(field.name) == field.target_field.attname}
+        finally:
+            target_keys_lock.release()
+        return key_value_attnames
+
+    def _load_submissions(self, records):
+        """
+        Load submissions along with everything read while stacking them, using a fixed number of
+        queries regardless of how many submissions there are.
+        """
+        return records \
+            .select_related('well_activity_type', 'fields_provided') \
+            .prefetch_related(*SUBMISSION_PREFETCH)
+
     def _getattr(self, submission, key):
         if key in FOREIGN_KEY_MODEL_LOOKUP:
-            model = FOREIGN_KEY_MODEL_LOOKUP[key]
-            return model.objects.filter(activity_submission=submission)
+            # Served from the prefetch cache (see _load_submissions).
+            return getattr(submission, key).all()
+        key_value_attnames = self._get_key_value_attnames()
+        if key in key_value_attnames:
+            return getattr(submission, key_value_attnames[key])
         return getattr(submission, key)
 
     @transaction.atomic
@@ -293,12 +342,50 @@ class StackWells():
             for item in value.all():
                 new_value.append(getattr(item, MANY_TO_MANY_LOOKUP[source_key]))
             value = new_value
-        elif source_key in KEY_VALUE_LOOKUP:
+        elif source_key in KEY_VALUE_LOOKUP and source_key not in self._get_key_value_attnames():
             value = getattr(value, KEY_VALUE_LOOKUP[source_key])
         return value
 
     @transaction.atomic
     def _stack(self, records, well: Well) -> Well:
+        records = self._load_submissions(records.order_by('create_date'))
+        composite = self._build_composite(records)
+        # Update the well view.
+        well = self._update_well_view(well, composite)
+        return well
+
+    def stack_composites(self, well_tag_numbers) -> dict:
+        """
+        Build the composite view of each of a batch of wells from their submissions, without saving
+        anything. The submissions for the whole batch are loaded at once.
+
+        Wells that process() wouldn't stack from their submissions alone are left out: wells with only
+        a legacy submission, and wells without a legacy or construction submission (those need a legacy
+        submission created from the current well record first).
+
+        :return: {well_tag_number: composite}
+        """
+        records = self._load_submissions(
+            ActivitySubmission.objects.filter(well__in=well_tag_numbers).order_by('create_date'))
+        wells = {}
+        for record in records:
+            wells.setdefault(record.well_id, []).append(record)
+
+        composites = {}
+        for well_tag_number, submissions in wells.items():
+            codes = [submission.well_activity_type.code for submission in submissions]
+            if codes == [WELL_ACTIVITY_CODE_LEGACY]:
+                continue
+            if WELL_ACTIVITY_CODE_LEGACY not in codes and WELL_ACTIVITY_CODE_CONSTRUCTION not in codes:
+                continue
+            composites[well_tag_number] = self._build_composite(submissions)
+        return composites
+
+    def _build_composite(self, records) -> dict:
+        """
+        Apply a well's submissions (loaded by _load_submissions) in order, returning the composite
+        view of the well as serializer data.
+        """
         # It's helpful for debugging, to limit the fields we consider only to target keys, for example
         # there are some values that don't actually map from the submission to the well (e.g. create_date,
         # filing number, well_activity_code etc.)
@@ -321,10 +408,9 @@ class StackWells():
         #           be captured 1st. We do however not have control over the order in which records are
         #           captured. WE CURRENTLY DO NOT HANDLE THIS EXCEPTION. It is important that and EDIT be
         #           processed ONLY based on it's create_date, not it's work_start_date.
-        records = records.order_by('create_date')
         records = sorted(records, key=lambda record:
-                         (record.well_activity_type.code != WellActivityCode.types.legacy().code,
-                          record.well_activity_type.code != WellActivityCode.types.construction().code,
+                         (record.well_activity_type.code != WELL_ACTIVITY_CODE_LEGACY,
+                          record.well_activity_type.code != WELL_ACTIVITY_CODE_CONSTRUCTION,
                           record.create_date))
 
         # these are depth-specific sets that have a "start" and "end" value
@@ -348,7 +434,7 @@ class StackWells():
             # a staff edit could still override this with a different value.
             if submission.well_activity_type.code != 'STAFF_EDIT':
                 composite['well_status'] = WELL_STATUS_MAP.get(
-                    submission.well_activity_type.code, WellStatusCode.types.other().well_status_code)
+                    submission.well_activity_type.code, WELL_STATUS_CODE_OTHER)
             source_target_map = ACTIVITY_TYPE_MAP.get(submission.well_activity_type.code, {})
             for field in ActivitySubmission._meta.get_fields():
 
@@ -361,6 +447,10 @@ class StackWells():
                 # We only consider items with values, and keys that are in our target
                 # an exception is STAFF_EDIT submissions (we need to be able to accept empty values)
                 source_key = field.name
+                target_key = source_target_map.get(source_key, source_key)
+                if target_key not in target_keys:
+                    # Nothing to do, so don't bother reading the value (it may be a related record).
+                    continue
                 value = self._getattr(submission, source_key)
 
                 # ManyToMany values need to be checked using the transform_value method.
@@ -387,7 +477,6 @@ class StackWells():
                             getattr(submission.fields_provided, source_key, None)
                         )):
 
-                    target_key = source_target_map.get(source_key, source_key)
                     if target_key in target_keys:
                         # The composite dict is built up by applying the set of submissions/edits in order.
                         #
@@ -433,10 +522,7 @@ class StackWells():
         composite['create_date'] = create_date
         # The update date, has to match whatever the late update_date was
         composite['update_Date'] = update_date
-
-        # Update the well view.
-        well = self._update_well_view(well, composite)
-        return well
+        return composite
 
     def _update_well_view(self, well, composite):
         well_serializer = WellStackerSerializer(well, data=composite, partial=True)
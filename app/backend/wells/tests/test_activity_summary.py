@@ -0,0 +1,100 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+from datetime import date
+from decimal import Decimal
+import json
+
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from gwells.models import ProvinceStateCode
+from registries.models import Person
+from submissions.models import WellActivityCode
+from wells.activity_summary import SUMMARY_FIELDS, refresh_activity_summaries, summary_annotations
+from wells.filters import WellQaQcFilterBackend
+from wells.models import Well, ActivitySubmission, Casing, WellActivitySummary
+from wells.stack import StackWells
+
+
+class WellActivitySummaryTest(TestCase):
+
+    fixtures = ['wellsearch-codetables.json', ]
+
+    def setUp(self):
+        self.driller = Person.objects.create(
+            first_name='Bobby',
+            surname='Driller'
+        )
+
+        self.province = ProvinceStateCode.objects.get_or_create(
+            province_state_code='BC',
+            description='British Columbia',
+            display_order=1
+        )[0]
+
+    def stack_construction(self):
+        submission = ActivitySubmission.objects.create(
+            create_user='Something',
+            update_user='Something',
+            owner_full_name='Bob',
+            work_start_date=date(2018, 1, 1),
+            work_end_date=date(2018, 2, 1),
+            person_responsible=self.driller,
+            owner_province_state=self.province,
+            well_activity_type=WellActivityCode.types.construction())
+        Casing.objects.create(
+            activity_submission=submission,
+            start=0,
+            end=10,
+            diameter=Decimal('6.000'),
+            create_user='Something',
+            update_user='Something')
+        return StackWells().process(submission.filing_number)
+
+    def qaqc_filter(self, **filter_group):
+        request = Request(APIRequestFactory().get('/', {'filter_group': json.dumps(filter_group)}))
+        return WellQaQcFilterBackend().filter_queryset(request, Well.objects.all(), None)
+
+    def test_summary_kept_up_to_date_by_stacking(self):
+        well = self.stack_construction()
+        summary = WellActivitySummary.objects.get(well=well)
+        self.assertEqual(summary.latest_well_activity_type_code, 'CON')
+        self.assertEqual(summary.last_work_start_date, date(2018, 1, 1))
+        self.assertEqual(summary.last_work_end_date, date(2018, 2, 1))
+        self.assertEqual(summary.last_casing_diameter, Decimal('6.000'))
+
+    def test_refresh_matches_annotations(self):
+        self.stack_construction()
+        Well.objects.create(create_user='Something', update_user='Something')
+        WellActivitySummary.objects.all().delete()
+
+        call_command('refresh_activity_summary')
+
+        expected = Well.objects.annotate(**summary_annotations()) \
+            .order_by('well_tag_number').values_list('well_tag_number', *SUMMARY_FIELDS)
+        summaries = WellActivitySummary.objects.order_by('well') \
+            .values_list('well', *SUMMARY_FIELDS)
+        self.assertEqual(list(summaries), list(expected))
+        self.assertEqual(refresh_activity_summaries(), Well.objects.count())
+
+    def test_qaqc_filters_use_summary(self):
+        well = self.stack_construction()
+        no_activity = Well.objects.create(create_user='Something', update_user='Something')
+
+        self.assertEqual(list(self.qaqc_filter(well_activity_type='CON')), [well])
+        self.assertEqual(list(self.qaqc_filter(well_activity_type='null')), [no_activity])
+        self.assertEqual(list(self.qaqc_filter(diameter='null')), [no_activity])
+        self.assertEqual(list(self.qaqc_filter(work_start_date='null')), [no_activity])
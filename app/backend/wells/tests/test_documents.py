@@ -12,6 +12,11 @@
     limitations under the License.
 """
 import collections
+import io
+from collections import Counter
+from unittest.mock import Mock, patch
+
+from django.core.management import call_command
 from django.test import TestCase
 
 from rest_framework import status
@@ -20,6 +25,8 @@ from rest_framework.reverse import reverse
 
 from gwells.settings import REST_FRAMEWORK
 from gwells.documents import MinioClient
+from wells.management.commands.populate_attachments_count import count_folder
+from wells.models import Well, WellAttachment
 
 
 class DocumentTests(TestCase):
@@ -53,3 +60,60 @@ class TestDocumentsAPI(APITestCase):
         url = reverse('file-list', kwargs={'tag': 987654321, 'version': 'v1'})
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class FakeBucketClient:
+    """ Lists objects from a list of names, like Minio.list_objects """
+
+    ListedObject = collections.namedtuple('ListedObject', 'object_name is_dir')
+
+    def __init__(self, names):
+        self.names = names
+
+    def list_objects(self, bucket, prefix='', recursive=False):
+        if recursive:
+            return [self.ListedObject(name, False) for name in self.names if name.startswith(prefix)]
+        folders = sorted({name.split('/', 1)[0] + '/' for name in self.names})
+        return [self.ListedObject(folder, True) for folder in folders]
+
+
+class PopulateAttachmentsCountTests(TestCase):
+
+    def setUp(self):
+        self.well = Well.objects.create(create_user='test', update_user='test')
+        self.other_well = Well.objects.create(create_user='test', update_user='test')
+        tag = self.well.well_tag_number
+        folder = MinioClient(disable_private=True, disable_public=True).get_bucket_folder(tag)
+        self.public = FakeBucketClient([
+            '{}/WTN {}_Well Construction_1700000000.pdf'.format(folder, tag),
+            '{}/WTN {}_Well Record_1700000001.pdf'.format(folder, tag),
+            '{}/WTN {}_Photo.jpg'.format(folder, tag),
+            '{}/WTN {}_Unknown Thing_Here_1700000002.pdf'.format(folder, tag),
+        ])
+        self.private = FakeBucketClient([
+            '{}/WTN {}_Water Quality_1700000003.pdf'.format(folder, tag),
+        ])
+
+    def test_count_folder(self):
+        folder = self.public.list_objects('bucket')[0].object_name
+        counts = count_folder(self.public, 'bucket', folder)
+
+        self.assertEqual(counts[self.well.well_tag_number], Counter({
+            'well_construction': 2, 'photo': 1, 'unknown thing_here': 1}))
+
+    @patch('wells.management.commands.populate_attachments_count.MinioClient')
+    def test_counts_every_well(self, minio_client):
+        minio_client.return_value = Mock(
+            public_client=self.public, public_bucket='public',
+            private_client=self.private, private_bucket='private')
+        WellAttachment.objects.create(well_tag_number=self.other_well, map=3)
+
+        call_command('populate_attachments_count', stdout=io.StringIO())
+
+        entry = WellAttachment.objects.get(well_tag_number=self.well)
+        self.assertEqual(entry.well_construction, 2)
+        self.assertEqual(entry.photo, 1)
+        self.assertEqual(entry.water_quality, 1)
+        self.assertEqual(entry.well_alteration, 0)
+        # Counts are recounted from the buckets, so documents that are gone aren't counted.
+        self.assertEqual(WellAttachment.objects.get(well_tag_number=self.other_well).map, 0)
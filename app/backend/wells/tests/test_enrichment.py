@@ -0,0 +1,160 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+from io import StringIO
+
+from requests import HTTPError
+
+from django.contrib.gis.geos import MultiPolygon, Point, Polygon
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from gwells.geocoder import Geocoder, RateLimiter
+from wells.enrichment import claim_jobs, queue_enrichment, run_jobs
+from wells.models import NaturalResourceRegion, Parcel, Well, WellEnrichmentJob
+
+
+class StubResponse():
+    def __init__(self, data):
+        self.status_code = 200
+        self.headers = {'RateLimit-Remaining': '1000'}
+        self.data = data
+
+    def json(self):
+        return self.data
+
+    def raise_for_status(self):
+        pass
+
+
+class StubSession():
+    """ Answers the geocoder requests made while scoring a well, without going to the network """
+
+    def get(self, url, params=None, **kwargs):
+        if 'sites/nearest' in url:
+            return StubResponse({'properties': {'fullAddress': '1 Main St, Victoria, BC', 'localityName': 'Victoria'}})
+        if 'addresses.json' in url:
+            return StubResponse({'features': [{'geometry': {'coordinates': [-123.36, 48.43]}}]})
+        raise ValueError('Unexpected request to {}'.format(url))
+
+
+class UnavailableSession(StubSession):
+    def get(self, url, params=None, **kwargs):
+        raise ConnectionError('Service unavailable')
+
+
+class BusyResponse(StubResponse):
+    def __init__(self):
+        super().__init__({})
+        self.status_code = 429
+
+    def raise_for_status(self):
+        raise HTTPError('429 Too Many Requests')
+
+
+class BusySiteSession(StubSession):
+    """ Finds addresses, but the nearest site lookups are rate limited """
+
+    def get(self, url, params=None, **kwargs):
+        if 'sites/nearest' in url:
+            return BusyResponse()
+        return super().get(url, params=params, **kwargs)
+
+
+@override_settings(WELL_ENRICHMENT_HTTP_BACKEND='wells.tests.test_enrichment.StubSession')
+class WellEnrichmentTest(TestCase):
+
+    def setUp(self):
+        area = Polygon.from_bbox((-124, 48, -123, 49))
+        area.srid = 4326
+        area.transform(3005)
+        NaturalResourceRegion.objects.create(
+            region_name='West Coast', org_unit_name='West Coast Natural Resource Region',
+            geom=MultiPolygon(area, srid=3005))
+        Parcel.objects.create(pid=123, geom=MultiPolygon(area, srid=3005))
+        self.well = Well.objects.create(
+            create_user='Something',
+            update_user='Something',
+            street_address='1 Main St',
+            city='Victoria',
+            legal_pid=123,
+            geom=Point(-123.36, 48.43, srid=4326))
+        queue_enrichment(self.well.well_tag_number)
+
+    def test_enrich_wells(self):
+        out = StringIO()
+        call_command('enrich_wells', workers=1, stdout=out)
+
+        self.assertIn('Scored 1 wells, 0 failed', out.getvalue())
+        self.well.refresh_from_db()
+        self.assertEqual(self.well.geocode_distance, 0)
+        self.assertEqual(self.well.distance_to_pid, 0)
+        self.assertEqual(self.well.score_city, 100)
+        self.assertEqual(self.well.natural_resource_region, 'West Coast Natural Resource Region')
+        self.assertFalse(WellEnrichmentJob.objects.exists())
+
+    @override_settings(WELL_ENRICHMENT_HTTP_BACKEND='wells.tests.test_enrichment.UnavailableSession')
+    def test_failed_job_is_retried(self):
+        call_command('enrich_wells', workers=1, max_attempts=2, stdout=StringIO())
+
+        job = WellEnrichmentJob.objects.get(well=self.well)
+        self.assertEqual(job.status, WellEnrichmentJob.PENDING)
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.run_after, timezone.now())
+
+        WellEnrichmentJob.objects.update(run_after=timezone.now())
+        call_command('enrich_wells', workers=1, max_attempts=2, stdout=StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, WellEnrichmentJob.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_geocoder_errors_are_retried(self):
+        # A busy geocoder doesn't store empty scores: the job is retried later.
+        Well.objects.filter(pk=self.well.pk).update(score_city=50)
+        job, = claim_jobs(10)
+        geocoder = Geocoder(session=BusySiteSession(), limiter=RateLimiter(pause=0))
+
+        self.assertEqual(run_jobs([job], geocoder, max_attempts=5), 0)
+
+        self.well.refresh_from_db()
+        self.assertEqual(self.well.score_city, 50)
+        job = WellEnrichmentJob.objects.get(well=self.well)
+        self.assertEqual(job.status, WellEnrichmentJob.PENDING)
+        self.assertIn('429', job.last_error)
+
+    def test_location_layers_not_imported(self):
+        # Without the parcels and regions, the well keeps its distance to PID and region.
+        Parcel.objects.all().delete()
+        NaturalResourceRegion.objects.all().delete()
+        Well.objects.filter(pk=self.well.pk).update(distance_to_pid=5, natural_resource_region='Somewhere')
+
+        call_command('enrich_wells', workers=1, stdout=StringIO())
+
+        self.well.refresh_from_db()
+        self.assertEqual(self.well.distance_to_pid, 5)
+        self.assertEqual(self.well.natural_resource_region, 'Somewhere')
+        self.assertEqual(self.well.score_city, 100)
+
+    def test_requeued_job_is_kept(self):
+        job, = claim_jobs(10)
+        self.assertEqual(claim_jobs(10), [])
+
+        # The well changes again while the job is running.
+        queue_enrichment(self.well.well_tag_number)
+        self.assertEqual(run_jobs([job], Geocoder(session=StubSession()), max_attempts=5), 1)
+
+        job = WellEnrichmentJob.objects.get(well=self.well)
+        self.assertEqual(job.attempts, 0)
+        self.assertEqual(job.status, WellEnrichmentJob.PENDING)
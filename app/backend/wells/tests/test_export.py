@@ -12,18 +12,22 @@
     limitations under the License.
 """
 
-from io import StringIO
+import csv
+from io import BytesIO, StringIO
 from unittest.mock import patch
 
 from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
 
+from wells.management.commands.export import copy_sheet, sanitise_record, sheet_rows, WELL_EXPORT_VIEW_V2
+
 
 class ExportTest(TestCase):
 
     # Minio and the file system are mocked out - so that we don't create any artifacts during this test.
     @patch('wells.management.commands.export.open')
-    @patch('wells.management.commands.export.Minio')
+    @patch('wells.management.commands.export.get_public_minio_client')
     @patch('wells.management.commands.export.os')
     @patch('wells.management.commands.export.zipfile')
     @patch('wells.management.commands.export.Workbook')
@@ -33,3 +37,50 @@ class ExportTest(TestCase):
         out = StringIO()
         call_command('export', stdout=out)
         self.assertIn('export complete', out.getvalue())
+
+    @patch('wells.management.commands.export.get_public_minio_client')
+    def test_parallel_export_no_exceptions(self, fake_minio):
+        # Each sheet is produced by a worker process, and merged into the zip and spreadsheet.
+        out = StringIO()
+        call_command('export', workers=2, upload=0, cleanup=1, stdout=out)
+        self.assertIn('export complete', out.getvalue())
+
+    @patch('wells.management.commands.export.get_public_minio_client')
+    def test_copy_export_no_exceptions(self, fake_minio):
+        out = StringIO()
+        call_command('export', copy=1, upload=0, cleanup=1, stdout=out)
+        self.assertIn('export complete', out.getvalue())
+
+
+class CopyExportTest(TestCase):
+    fixtures = ['gwells-codetables', 'wellsearch-codetables', 'wellsearch', 'registries', 'registries-codetables']
+
+    def cursor_csv(self):
+        out = StringIO()
+        writer = csv.writer(out, dialect='excel')
+        with connection.cursor() as cursor:
+            columns, rows = sheet_rows(cursor, WELL_EXPORT_VIEW_V2)
+            writer.writerow(columns)
+            for values in rows:
+                writer.writerow(values)
+        return out.getvalue()
+
+    def copy_csv(self):
+        out = BytesIO()
+        with connection.cursor() as cursor:
+            copy_sheet(cursor, WELL_EXPORT_VIEW_V2, out)
+        return out.getvalue().decode()
+
+    def test_copy_csv_matches_cursor_csv(self):
+        # Reading the sheet with COPY must not change the content of the csv file (COPY only ends lines
+        # with \n instead of \r\n).
+        self.assertEqual(list(csv.reader(StringIO(self.copy_csv()))),
+                         list(csv.reader(StringIO(self.cursor_csv()))))
+
+
+class SanitiseRecordTest(TestCase):
+
+    def test_sanitise_record(self):
+        values, num_values = sanitise_record((123, 'a\x00b', '=1+1', None, ''))
+        self.assertEqual(values, [123, 'ab', '\'=1+1', None, ''])
+        self.assertEqual(num_values, 3)
@@ -55,3 +55,22 @@ class TestWellsLithologySpatial(APITestCase):
                 'realtime': 'true', 'sw_lat': 49, 'sw_long': -125, 'ne_lat': 49, 'ne_long': -124
             })
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class TestWellsVectorTiles(APITestCase):
+
+    def test_wells_tile(self):
+        url = reverse('vector-tile', kwargs={'version': 'v2', 'layer': 'wells', 'z': 6, 'x': 10, 'y': 21})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/vnd.mapbox-vector-tile')
+
+    def test_lithology_tile(self):
+        url = reverse('vector-tile', kwargs={'version': 'v2', 'layer': 'lithology', 'z': 6, 'x': 10, 'y': 21})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_tile_outside_grid(self):
+        url = reverse('vector-tile', kwargs={'version': 'v2', 'layer': 'wells', 'z': 2, 'x': 4, 'y': 0})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
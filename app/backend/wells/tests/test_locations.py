@@ -0,0 +1,107 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.gis.geos import MultiPolygon, Point, Polygon
+from django.core.management import call_command
+from django.test import TestCase
+
+from wells.locations import refresh_location_attributes
+from wells.models import NaturalResourceRegion, Parcel, Well
+from wells.utils import calculate_natural_resource_region_for_well, calculate_pid_distance_for_well
+
+
+def feature_collection(features):
+    return {
+        'type': 'FeatureCollection',
+        'features': [
+            {'type': 'Feature', 'properties': properties, 'geometry': json.loads(Polygon.from_bbox(bbox).json)}
+            for properties, bbox in features
+        ]
+    }
+
+
+class LocationLayersTest(TestCase):
+
+    def import_layers(self, regions, parcels, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            files = {}
+            for name, features in (('regions', regions), ('parcels', parcels)):
+                files[name] = os.path.join(directory, '{}.geojson'.format(name))
+                with open(files[name], 'w') as f:
+                    json.dump(feature_collection(features), f)
+            out = StringIO()
+            call_command('import_location_layers', stdout=out, **files, **options)
+        return out.getvalue()
+
+    def create_well(self, longitude, latitude, legal_pid=None):
+        return Well.objects.create(
+            create_user='Something',
+            update_user='Something',
+            legal_pid=legal_pid,
+            geom=Point(longitude, latitude, srid=4326))
+
+    def test_import_and_lookup(self):
+        out = self.import_layers(
+            regions=[
+                ({'REGION_NAME': 'West Coast', 'ORG_UNIT_NAME': 'West Coast Natural Resource Region'},
+                 (-124, 48, -123, 49)),
+                ({'REGION_NAME': 'South Coast', 'ORG_UNIT_NAME': 'South Coast Natural Resource Region'},
+                 (-123, 48, -122, 49)),
+            ],
+            parcels=[
+                ({'PID_NUMBER': 123}, (-123.5, 48.5, -123.4, 48.6)),
+                ({'PID_NUMBER': None}, (-123.3, 48.5, -123.2, 48.6)),
+            ])
+
+        self.assertIn('Imported 2 natural resource regions', out)
+        self.assertIn('Imported 1 parcels', out)
+        self.assertEqual(Parcel.objects.get().geom.srid, 3005)
+
+        inside = self.create_well(-123.45, 48.55, legal_pid=123)
+        self.assertEqual(calculate_natural_resource_region_for_well(inside), 'West Coast Natural Resource Region')
+        self.assertEqual(calculate_pid_distance_for_well(inside), 0)
+
+        away = self.create_well(-122.5, 48.55, legal_pid=123)
+        self.assertEqual(calculate_natural_resource_region_for_well(away), 'South Coast Natural Resource Region')
+        self.assertGreater(calculate_pid_distance_for_well(away), 50000)
+        self.assertIsNone(calculate_pid_distance_for_well(self.create_well(-122.5, 48.55, legal_pid=456)))
+
+    def test_refresh_matches_lookups(self):
+        area = Polygon.from_bbox((-124, 48, -123, 49))
+        area.srid = 4326
+        area.transform(3005)
+        NaturalResourceRegion.objects.create(
+            region_name='West Coast', org_unit_name='West Coast Natural Resource Region',
+            geom=MultiPolygon(area, srid=3005))
+        Parcel.objects.create(pid=123, geom=MultiPolygon(area, srid=3005))
+        wells = [
+            self.create_well(-123.5, 48.5, legal_pid=123),
+            self.create_well(-121.5, 48.5, legal_pid=123),
+            self.create_well(-121.5, 48.5),
+        ]
+
+        self.assertEqual(refresh_location_attributes(), 2)
+        # Nothing changed since the last refresh.
+        self.assertEqual(refresh_location_attributes(), 0)
+
+        for well in wells:
+            well.refresh_from_db()
+            self.assertEqual(well.natural_resource_region, calculate_natural_resource_region_for_well(well))
+            self.assertEqual(
+                well.distance_to_pid,
+                calculate_pid_distance_for_well(well))
@@ -0,0 +1,43 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+from django.test import TestCase
+
+from wells.scoring import normalise_street_address, score_address, score_city, street_address_slug, \
+    token_set_score, token_set_scores
+
+
+class ScoringTest(TestCase):
+
+    def test_normalise_street_address(self):
+        self.assertEqual(normalise_street_address('101 Main Street'), '101 main st')
+        self.assertEqual(normalise_street_address('5 Broadway Road'), '5 broadway rd')
+        self.assertEqual(normalise_street_address(None), '')
+
+    def test_street_address_slug(self):
+        address = {'civicNumber': 101, 'streetName': 'Main', 'streetType': 'St', 'streetDirection': ''}
+        self.assertEqual(street_address_slug(address), '101 Main St')
+
+    def test_batch_scores_match_single_scores(self):
+        left = ['101 main st', 'victoria', '', 'Old Island Hwy']
+        right = ['101 Main St W', 'Saanich', 'Victoria', 'old island hwy.']
+
+        self.assertEqual(list(token_set_scores(left, right)),
+                         [token_set_score(a, b) for a, b in zip(left, right)])
+
+    def test_scores(self):
+        address = {'civicNumber': '101', 'streetName': 'Main', 'streetType': 'St', 'localityName': 'Victoria'}
+        self.assertEqual(score_address('101 Main Street', address), 100)
+        self.assertEqual(score_city('VICTORIA', address), 100)
+        self.assertIsNone(score_address('101 Main Street', None))
+        self.assertIsNone(score_city('Victoria', {}))
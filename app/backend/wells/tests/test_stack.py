@@ -12,10 +12,16 @@
     limitations under the License.
 """
 from datetime import date
+from decimal import Decimal
 import logging
+import random
 from unittest.mock import patch
 
+from reversion.models import Version
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from rest_framework.exceptions import ValidationError, APIException
 from rest_framework.status import HTTP_500_INTERNAL_SERVER_ERROR, HTTP_400_BAD_REQUEST
 
@@ -23,6 +29,7 @@ from gwells.models import ProvinceStateCode
 from wells.models import Well, ActivitySubmission, Casing, Screen, LinerPerforation, LithologyDescription, FieldsProvided
 from submissions.models import WellActivityCode
 from wells.stack import StackWells, overlap, merge_series
+from wells.management.commands.restack_wells import Command as RestackWellsCommand, parse_wells
 from registries.models import Person
 
 
@@ -168,6 +175,60 @@ class SeriesMergeTest(TestCase):
         self.assertEqual(new, expected)
 
 
+def pairwise_merge_series(prev_series, next_series):
+    """ merge_series as it was originally written, comparing every pair of records with overlap(). """
+    prev_series = [record for record in prev_series if not any(
+        overlap((record.get('start'), record.get('end')), (other.get('start'), other.get('end')))
+        for other in next_series)]
+    new = prev_series + next_series
+    new.sort(key=lambda record: (record.get('start'), record.get('end')))
+    return new
+
+
+class SeriesMergePropertyTest(TestCase):
+    """
+    Compare merge_series with the pairwise implementation over randomly generated series, including
+    touching, identical, nested, reversed and incomplete intervals.
+    """
+
+    EXAMPLES = 5000
+
+    def random_series(self, rng, position):
+        series = []
+        for index in range(rng.randint(0, 10)):
+            start = None if rng.random() < 0.1 else position(rng.randint(0, 40))
+            end = None if rng.random() < 0.1 else position(rng.randint(0, 40))
+            series.append({'id': index, 'start': start, 'end': end})
+        return series
+
+    def assert_same_as_pairwise(self, position):
+        rng = random.Random(0)
+        for _ in range(self.EXAMPLES):
+            prev = self.random_series(rng, position)
+            incoming = self.random_series(rng, position)
+            try:
+                expected = pairwise_merge_series(prev, incoming)
+            except TypeError:
+                # Sorting series with missing positions fails the same way in both implementations.
+                with self.assertRaises(TypeError):
+                    merge_series(prev, incoming)
+                continue
+            self.assertEqual(merge_series(prev, incoming), expected, (prev, incoming))
+
+    def test_numbers(self):
+        self.assert_same_as_pairwise(lambda value: Decimal(value) / 2)
+
+    def test_serialized_decimals(self):
+        # Stacked sets are serializer data, where depths are strings.
+        self.assert_same_as_pairwise(lambda value: '{:.2f}'.format(value / 2))
+
+    def test_nested(self):
+        # A previous record containing a new one doesn't overlap() it, so it's kept.
+        prev = [{'start': 0, 'end': 30}]
+        incoming = [{'start': 10, 'end': 20}]
+        self.assertEqual(merge_series(prev, incoming), prev + incoming)
+
+
 def errors_side_effect(*args, **kwargs):
     return []
 
@@ -505,3 +566,141 @@ class StackTest(TestCase):
                 self.assertEqual(e.status_code, HTTP_500_INTERNAL_SERVER_ERROR)
                 # Re-raise the exception, handing it to the assertRaises above.
                 raise
+
+
+class StackQueryCountTest(TestCase):
+
+    fixtures = ['wellsearch-codetables.json', ]
+
+    def setUp(self):
+        self.driller = Person.objects.create(
+            first_name='Bobby',
+            surname='Driller'
+        )
+
+        self.province = ProvinceStateCode.objects.get_or_create(
+            province_state_code='BC',
+            description='British Columbia',
+            display_order=1
+        )[0]
+
+    def create_well(self, alterations):
+        # Create a well with a construction, a number of alterations, and depth intervals on each.
+        well = Well.objects.create(
+            create_user='Something',
+            update_user='Something')
+        for index in range(alterations + 1):
+            if index == 0:
+                activity_type = WellActivityCode.types.construction()
+            else:
+                activity_type = WellActivityCode.types.alteration()
+            submission = ActivitySubmission.objects.create(
+                create_user='Something',
+                update_user='Something',
+                owner_full_name='Bob {}'.format(index),
+                work_start_date=date(2018, 1, 1),
+                work_end_date=date(2018, 2, 1),
+                person_responsible=self.driller,
+                owner_province_state=self.province,
+                well_activity_type=activity_type,
+                well=well)
+            for model in (Casing, Screen, LithologyDescription):
+                model.objects.create(
+                    activity_submission=submission,
+                    start=index * 10,
+                    end=index * 10 + 10,
+                    create_user='Something',
+                    update_user='Something')
+        return well
+
+    def count_stack_queries(self, well):
+        # Only count the queries needed to build the composite, not the ones saving the well.
+        records = ActivitySubmission.objects.filter(well=well)
+        with patch.object(StackWells, '_update_well_view', side_effect=lambda well, composite: well):
+            with CaptureQueriesContext(connection) as context:
+                StackWells()._stack(records, well)
+        return len(context.captured_queries)
+
+    def test_stack_query_count_does_not_grow_with_submissions(self):
+        few = self.count_stack_queries(self.create_well(alterations=1))
+        many = self.count_stack_queries(self.create_well(alterations=5))
+        self.assertEqual(few, many)
+
+    def test_stack_composite_from_prefetched_submissions(self):
+        well = self.create_well(alterations=2)
+        records = ActivitySubmission.objects.filter(well=well)
+        with patch.object(StackWells, '_update_well_view', side_effect=lambda well, composite: composite):
+            composite = StackWells()._stack(records, well)
+        self.assertEqual(composite['owner_full_name'], 'Bob 2')
+        self.assertEqual(composite['owner_province_state'], self.province.province_state_code)
+        self.assertEqual(composite['person_responsible'], self.driller.person_guid)
+        self.assertEqual(len(composite['casing_set']), 3)
+        self.assertEqual(len(composite['lithologydescription_set']), 3)
+
+
+class RestackWellsTest(TestCase):
+
+    fixtures = ['wellsearch-codetables.json', ]
+
+    def setUp(self):
+        self.driller = Person.objects.create(
+            first_name='Bobby',
+            surname='Driller'
+        )
+
+        self.province = ProvinceStateCode.objects.get_or_create(
+            province_state_code='BC',
+            description='British Columbia',
+            display_order=1
+        )[0]
+
+    def create_submission(self, activity_type, owner_full_name, well=None):
+        submission = ActivitySubmission.objects.create(
+            create_user='Something',
+            update_user='Something',
+            owner_full_name=owner_full_name,
+            work_start_date=date(2018, 1, 1),
+            work_end_date=date(2018, 2, 1),
+            person_responsible=self.driller,
+            owner_province_state=self.province,
+            well_activity_type=activity_type,
+            well=well)
+        Casing.objects.create(
+            activity_submission=submission,
+            start=0,
+            end=10,
+            create_user='Something',
+            update_user='Something')
+        return submission
+
+    def test_parse_wells(self):
+        self.assertIsNone(parse_wells(['all']))
+        self.assertIsNotNone(parse_wells(['1', '10-20']))
+
+    def test_restack_matches_process(self):
+        stacker = StackWells()
+        construction = self.create_submission(WellActivityCode.types.construction(), 'Bob')
+        well = stacker.process(construction.filing_number)
+        alteration = self.create_submission(WellActivityCode.types.alteration(), 'Joe', well=well)
+        well = stacker.process(alteration.filing_number)
+        # Change the well behind the stack's back.
+        Well.objects.filter(well_tag_number=well.well_tag_number).update(owner_full_name='Someone else')
+        well.casing_set.all().delete()
+        versions = Version.objects.get_for_object(well).count()
+
+        composites = stacker.stack_composites([well.well_tag_number])
+        written, failures = RestackWellsCommand().write_batch(composites)
+
+        self.assertEqual(written, 1)
+        self.assertEqual(failures, [])
+        well.refresh_from_db()
+        self.assertEqual(well.owner_full_name, 'Joe')
+        self.assertEqual(well.casing_set.count(), 1)
+        self.assertEqual(Version.objects.get_for_object(well).count(), versions + 1)
+
+    def test_restack_skips_legacy_only_wells(self):
+        well = Well.objects.create(
+            create_user='Something',
+            update_user='Something')
+        self.create_submission(WellActivityCode.types.legacy(), 'Bob', well=well)
+        self.assertEqual(StackWells().stack_composites([well.well_tag_number]), {})
@@ -1,159 +1,119 @@
 import json
-import requests
-import geopandas as gpd
-from time import sleep
+from functools import lru_cache
 from shapely.geometry import Point
 from django.contrib.gis.geos import GEOSGeometry
-from wells.constants import ADDRESS_COLUMNS, GEOCODER_ENDPOINT
-from thefuzz import fuzz
+from wells.constants import ADDRESS_COLUMNS
+from django.contrib.gis.db.models.functions import Distance
 from django.db.models import Case, When, Value, DateField, F
-from wells.models import Well
-from pyproj import Proj, transform
+from wells.models import Well, NaturalResourceRegion, Parcel
+from pyproj import Transformer
+from gwells.geocoder import get_geocoder
+from wells.scoring import score_address, score_city
 
 WELL_STATUS_CODE_CONSTRUCTION = 'CONSTRUCTION'
 WELL_STATUS_CODE_ALTERATION = 'ALTERATION'
 WELL_STATUS_CODE_DECOMMISSION = 'DECOMMISSION'
 EPSG_4326 = 'epsg:4326'
 EPSG_3005 = 'epsg:3005'
+EPSG_32610 = 'epsg:32610'
+
+@lru_cache(maxsize=None)
+def get_transformer(source_crs, target_crs):
+    """
+    A (cached) pyproj Transformer between two coordinate reference systems, taking and returning
+    x (longitude), y (latitude) ordered coordinates.
+    """
+    return Transformer.from_crs(source_crs, target_crs, always_xy=True)
+
 
 def calculate_pid_distance_for_well(well):
     """
-    Calculate the distance from a single well to the nearest parcel using a WFS query.
-    :param well: A well instance with latitude, longitude attributes
-    :return: Distance to the nearest parcel in meters
+    Calculate the distance from a single well to the parcel with the well's PID, using the local copy of
+    the parcel fabric (wells.models.Parcel).
+    :param well: A well instance with geom and legal_pid attributes
+    :return: Distance to the nearest parcel with the PID in meters
     """
-    # Define projections
-    proj_4326 = Proj(init=EPSG_4326)  # WGS 84
-    proj_3005 = Proj(init=EPSG_3005)  # NAD83 / BC Albers, uses meters
-
-    # Transform the well's point to NAD83 / BC Albers
-    x_3005, y_3005 = transform(proj_4326, proj_3005, well.longitude, well.latitude)
-    well_point_3005 = Point(x_3005, y_3005)
-
-    # Define base URL and parameters for the WFS request
-    base_url = "https://openmaps.gov.bc.ca/geo/pub/wfs"
-    params = {
-        "service": "WFS",
-        "version": "2.0.0",
-        "request": "GetFeature",
-        "typeName": "WHSE_CADASTRE.PMBC_PARCEL_FABRIC_POLY_SVW",
-        "outputFormat": "json",
-        "srsName": "EPSG:3005",  # Ensure the response is in the same projection as the well point
-        "CQL_FILTER": f"PID_NUMBER={well.legal_pid}"
-    }
-
-    # Construct and make the request
-    response = requests.get(f"{base_url}?{'&'.join([f'{k}={v}' for k, v in params.items()])}")
-    if response.status_code != 200:
-        print("Error making request to WFS service.")
+    if not well.legal_pid or not well.geom:
         return None
 
-    # Load response into GeoDataFrame, already in EPSG:3005
-    data = response.json()
-    parcels_gdf = gpd.GeoDataFrame.from_features(data["features"], crs="EPSG:3005")
+    # Parcels are stored in NAD83 / BC Albers, so the distance is in meters.
+    nearest = Parcel.objects.filter(pid=well.legal_pid) \
+        .annotate(distance=Distance('geom', well.geom)) \
+        .order_by('distance').first()
 
-    if parcels_gdf.empty:
+    if nearest is None:
         print("No parcels found for the specified PID.")
         return None
 
-    # Calculate distances in meters from the well to each parcel
-    parcels_gdf["distance"] = parcels_gdf.geometry.distance(well_point_3005)
-
-    # Return the minimum distance
-    min_distance = parcels_gdf["distance"].min()
-
-    return round(min_distance)
+    return round(nearest.distance.m)
 
 
 def calculate_natural_resource_region_for_well(well):
     """
-    Retrieve the natural resource region name that a well is within using a WFS query.
-    :param well: A well instance with latitude, longitude attributes
+    Retrieve the natural resource region name that a well is within, using the local copy of the
+    regions (wells.models.NaturalResourceRegion).
+    :param well: A well instance with a geom attribute
     :return: Natural Resource Region name
     """
-    # convert between projections
-    proj_4326 = Proj(init=EPSG_4326)  # WGS 84
-    proj_3005 = Proj(init=EPSG_3005)  # NAD83 / BC Albers
-
-    # Transform the point
-    x_3005, y_3005 = transform(proj_4326, proj_3005, well.longitude, well.latitude)
-
-    # Base URL for the WFS request
-    base_url = "https://openmaps.gov.bc.ca/geo/pub/wfs"
-    params = {
-        "service": "WFS",
-        "version": "2.0.0",
-        "request": "GetFeature",
-        "typeName": "WHSE_ADMIN_BOUNDARIES.ADM_NR_REGIONS_SPG",
-        "outputFormat": "json",
-        "srsName": "EPSG:4326",
-        "CQL_FILTER": f"CONTAINS(SHAPE, POINT({x_3005} {y_3005}))",
-        "propertyName": "REGION_NAME,ORG_UNIT_NAME"
-    }
-
-    # Construct the request URL
-    request_url = f"{base_url}?{'&'.join([f'{k}={v}' for k, v in params.items()])}"
-
-    # Make the request
-    response = requests.get(request_url)
-    if response.status_code != 200:
-        print("Error making request to WFS service.")
+    if not well.geom:
         return None
 
-    # Load response into GeoDataFrame
-    data = response.json()
-    regions_gdf = gpd.GeoDataFrame.from_features(data["features"])
+    region = NaturalResourceRegion.objects.filter(geom__contains=well.geom) \
+        .order_by('id').values_list('org_unit_name', flat=True).first()
 
-    if regions_gdf.empty:
+    if region is None:
         print("No natural resource regions found near well location.")
-        return None
 
-    # Assuming the well can only be in one region, return the name of the first region found
-    return regions_gdf.iloc[0]['ORG_UNIT_NAME']
+    return region
 
 
-def geocode(options={}):
+def geocode(options={}, geocoder=None, raise_errors=False):
     """
-    Performs an HTTP request to the BC Physical Address Geocoder API, 
-    returning a django.contrib.gis.geos.Point for the first result. Supports query 
-    string parameters via the 'options' argument. Raises HTTPError for 
-    communication issues and ValueError if no matching coordinate is found.
+    Geocodes an address with the BC Physical Address Geocoder API (through gwells.geocoder),
+    returning a shapely Point for the first result, or None if the address could not be geocoded.
     Example 'options': {"addressString": "101 main st.", "localityName": "Kelowna"}.
+    A failed geocoder request also gives None, unless raise_errors is set.
     """
-    url = "https://geocoder.api.gov.bc.ca/addresses.json"
     try:
-        response = requests.get(url, params=options)
-        
-        # Check if response status is ok
-        if response.status_code == 200:
-            data = response.json()
-            first_feature = data.get("features", [])[0] if data.get("features") else None
-
-            if first_feature:
-                geometry = first_feature.get("geometry", {})
-                # Directly extract coordinates to create a shapely Point
-                coordinates = geometry.get("coordinates", [])
-                if coordinates:
-                    # Note the order: GeoJSON specifies coordinates as [longitude, latitude]
-                    shapely_point = Point(coordinates[0], coordinates[1])
-                    return shapely_point
-                else:
-                    raise ValueError("Geometry coordinates not found.")
+        first_feature = (geocoder or get_geocoder()).geocode(options)
+    except Exception as e:
+        if raise_errors:
+            raise
+        print(f"Error during geocoding: {e}")
+        return None
+    try:
+        if first_feature:
+            geometry = first_feature.get("geometry", {})
+            # Directly extract coordinates to create a shapely Point
+            coordinates = geometry.get("coordinates", [])
+            if coordinates:
+                # Note the order: GeoJSON specifies coordinates as [longitude, latitude]
+                shapely_point = Point(coordinates[0], coordinates[1])
+                return shapely_point
             else:
-                raise ValueError("No matching coordinate found for the given address.")
+                raise ValueError("Geometry coordinates not found.")
         else:
-            response.raise_for_status()  # This will raise an HTTPError if the response was an error
+            raise ValueError("No matching coordinate found for the given address.")
     except Exception as e:
         print(f"Error during geocoding: {e}")
         return None
 
 
+def empty_address():
+    """ The result of reverse_geocode when no address is found """
+    empty_result = dict([(k, "") for k in ADDRESS_COLUMNS])
+    empty_result["distance"] = 99999
+    return empty_result
+
+
 def reverse_geocode(
     x,
     y,
     distance_start=200,
     distance_increment=200,
     distance_max=2000,
+    geocoder=None,
+    raise_errors=False,
 ):
     """
     Provided a location as x/y coordinates (EPSG:4326), request an address
@@ -162,47 +122,31 @@ def reverse_geocode(
     If no result is found, request using an expanding search radius in
     distance_increment steps, until distance_max is reached.
 
-    A dict with 'distance' = 99999 is returned if no result is found.
+    A dict with 'distance' = 99999 is returned if no result is found. If the geocoder request fails,
+    None is returned, or the error is raised if raise_errors is set.
 
     """
     try:
-        result = False
-        distance = distance_start
-        # expand the search distance until we get a result or hit the max distance
-        while result is False and distance <= distance_max:
-            params = {
-                "point": str(x) + "," + str(y),
-                "apikey": 'fake_api_key', # api key not required to be valid
-                "outputFormat": "json",
-                "maxDistance": distance,
-            }
-            r = requests.get(GEOCODER_ENDPOINT, params=params)
-
-            # pause for 2s per request if near limit of 1000 requests/min
-            if int(r.headers["RateLimit-Remaining"]) < 30:
-                sleep(2)
-            if r.status_code == 200:
-                result = True
-            else:
-                distance = distance + distance_increment
-        if r.status_code == 200:
-            address = r.json().get("properties", {})
-            if address:  # Check if address is not empty
-                address["distance"] = distance
-                return address
-        # If no address return we default to an empty result
-        empty_result = dict([(k, "") for k in ADDRESS_COLUMNS])
-        empty_result["distance"] = 99999
-        return empty_result
+        address = (geocoder or get_geocoder()).reverse_geocode(
+            x, y, distance_start, distance_increment, distance_max)
     except Exception as e:
+        if raise_errors:
+            raise
         print("geocode error:", e)
+        return None
+    if address:
+        return address
+    # If no address return we default to an empty result
+    return empty_address()
 
 
-def calculate_geocode_distance(well):
+def calculate_geocode_distance(well, geocoder=None, raise_errors=False):
     """
     Calculates the geodesic distance between a well's location and its geocoded address.
 
     :param well: An object that contains the well's address, city, longitude, and latitude.
+    :param geocoder: The gwells.geocoder.Geocoder to use (by default, the shared one)
+    :param raise_errors: Raise failed geocoder requests, rather than returning None
     :return: The distance in meters between the well's actual location and its geocoded address.
     """
     # Prepare the geocode request options with the well's street address and city
@@ -214,15 +158,15 @@ def calculate_geocode_distance(well):
         return None
 
     # Geocode the address to get a point representation (assuming WKT format)
-    geocoded_point = geocode(options)
+    geocoded_point = geocode(options, geocoder=geocoder, raise_errors=raise_errors)
+    if geocoded_point is None:
+        return None
     well_point = Point(well.longitude, well.latitude)
 
-    # Initialize projections for WGS84 and UTM Zone 10N (example)
-    proj_wgs84 = Proj(init='EPSG:4326')
-    proj_utm = Proj(init='epsg:32610')
-    # Transform the geocoded point and the well's location from WGS84 to UTM coordinates
-    x1, y1 = transform(proj_wgs84, proj_utm, geocoded_point.x, geocoded_point.y)
-    x2, y2 = transform(proj_wgs84, proj_utm, well_point.x, well_point.y)
+    # Transform the geocoded point and the well's location from WGS84 to UTM Zone 10N coordinates
+    to_utm = get_transformer(EPSG_4326, EPSG_32610)
+    x1, y1 = to_utm.transform(geocoded_point.x, geocoded_point.y)
+    x2, y2 = to_utm.transform(well_point.x, well_point.y)
     # Calculate the distance between the points in meters within the UTM projection
     distance_meters = Point(x1, y1).distance(Point(x2, y2))
 
@@ -231,21 +175,15 @@ def calculate_geocode_distance(well):
 
 def calculate_score_address(well, geocoded_address):
     """
-    Calculates the similarity score between the well's address and the geocoded address.
+    Calculates the similarity score between the well's address and the geocoded street address.
 
     :param well: An object that contains the well's street address.
-    :param geocoded_address: A dictionary containing the full address as geocoded.
+    :param geocoded_address: A dictionary containing the geocoded civic number, street name, type and
+        direction.
     :return: A similarity score or None if geocoded_address is not provided.
     """
-    if not geocoded_address:
-        # Return None if there's no geocoded address to compare with
-        return None
-    # Ensure the well's address is lowercased, using an empty string if address is None
-    street_address_lower = well.street_address.lower() if well.street_address is not None else ''
-    # Safely get the lowercased full address from geocoded_address, default to an empty string
-    geocoded_address_lower = geocoded_address.get('fullAddress', '').lower()
-    # Calculate and return the fuzzy similarity score between the two addresses
-    return fuzz.token_set_ratio(street_address_lower, geocoded_address_lower)
+    # Scored the same way as the location QA script (scripts/qaqc/gwells_locationqa.py)
+    return score_address(well.street_address, geocoded_address)
 
 
 def calculate_score_city(well, geocoded_address):
@@ -256,12 +194,4 @@ def calculate_score_city(well, geocoded_address):
     :param geocoded_address: A dictionary containing the city name as 'localityName'.
     :return: A similarity score or None if geocoded_address is not provided.
     """
-    if not geocoded_address:
-        # Return None if there's no geocoded address to compare with
-        return None
-    # Ensure the well's city is lowercased, using an empty string if city is None
-    city_lower = well.city.lower() if well.city is not None else ''
-    # Safely get the lowercased locality name from geocoded_address, default to an empty string
-    locality_name_lower = geocoded_address.get('localityName', '').lower()
-    # Calculate and return the fuzzy similarity score between the two city names
-    return fuzz.token_set_ratio(city_lower, locality_name_lower)
\ No newline at end of file
+    return score_city(well.city, geocoded_address)
\ No newline at end of file
@@ -14,7 +14,6 @@
 from urllib.parse import quote
 import logging
 import json
-import requests
 
 from django.contrib.gis.db.models.functions import Distance
 from django.contrib.gis.geos import GEOSException, GEOSGeometry
@@ -38,10 +37,9 @@ from rest_framework.generics import ListAPIView, RetrieveAPIView
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 
-from minio import Minio
-
-from gwells.documents import MinioClient
-from gwells.roles import WELLS_VIEWER_ROLE, WELLS_EDIT_ROLE
+from gwells.documents import MinioClient, get_public_minio_client, invalidate_documents
+from gwells.geocoder import get_geocoder
+from gwells.roles import WELLS_VIEWER_ROLE, WELLS_EDIT_ROLE, has_role
 from gwells.pagination import APILimitOffsetPagination
 from gwells.settings.base import get_env_variable
 from gwells.open_api import (
@@ -115,7 +113,7 @@ class WellDetail(RetrieveAPIView):
 
     def get_queryset(self):
         """ Excludes Unpublished wells for users without edit permissions """
-        if self.request.user.groups.filter(name=WELLS_EDIT_ROLE).exists():
+        if has_role(self.request.user, WELLS_EDIT_ROLE):
             qs = Well.objects.all()
         else:
             qs = Well.objects.all().exclude(well_publication_status='Unpublished')
@@ -124,11 +122,11 @@ class WellDetail(RetrieveAPIView):
     def get(self, request, *args, **kwargs):
         """ Removes internal-only fields for public user """
         response = super().get(self, request, *args, **kwargs)
-        if not(request.user.groups.filter(name=WELLS_VIEWER_ROLE).exists()):
+        if not(has_role(request.user, WELLS_VIEWER_ROLE)):
             response.data.pop('internal_comments')
 
         """ Removes aquifer paramaters marked private for users without the edit role """
-        if not request.user.groups.filter(name=WELLS_EDIT_ROLE).exists():
+        if not has_role(request.user, WELLS_EDIT_ROLE):
           aquifer_params = response.data.get('aquifer_parameters_set', [])
           response.data['aquifer_parameters_set'] = [
             param for param in aquifer_params if not param.get('private', False)
@@ -157,13 +155,7 @@ class ListExtracts(APIView):
     @swagger_auto_schema(auto_schema=None)
     def get(self, request, **kwargs):
         host = get_env_variable('S3_HOST')
-        use_secure = int(get_env_variable('S3_USE_SECURE', 1))
-        minioClient = Minio(host,
-                            access_key=get_env_variable(
-                                'S3_PUBLIC_ACCESS_KEY'),
-                            secret_key=get_env_variable(
-                                'S3_PUBLIC_SECRET_KEY'),
-                            secure=use_secure)
+        minioClient = get_public_minio_client()
         objects = minioClient.list_objects(
             get_env_variable('S3_WELL_EXPORT_BUCKET'), 'export/v2/')
         urls = list(
@@ -225,11 +217,10 @@ class ListFiles(APIView):
 
         if well.well_publication_status\
                 .well_publication_status_code == 'Unpublished':
-            if not self.request.user.groups.filter(name=WELLS_EDIT_ROLE).exists():
+            if not has_role(self.request.user, WELLS_EDIT_ROLE):
                 return HttpResponseNotFound()
 
-        user_is_staff = self.request.user.groups.filter(
-            name=WELLS_VIEWER_ROLE).exists()
+        user_is_staff = has_role(self.request.user, WELLS_VIEWER_ROLE)
 
         client = MinioClient(
             request=request, disable_private=(not user_is_staff))
@@ -250,7 +241,7 @@ class FileSumView(APIView):
     
     def get(self, request, tag, **kwargs):
         # Verify user has permissions to edit wells
-        if not self.request.user.groups.filter(name=WELLS_EDIT_ROLE).exists():
+        if not has_role(self.request.user, WELLS_EDIT_ROLE):
             return HttpResponse(status=403)
         increment = self.request.query_params.get('inc')
         document_type = self.request.query_params.get('documentType')
@@ -262,6 +253,8 @@ class FileSumView(APIView):
             return HttpResponse(status=400)
         
         attachment = document_type.replace(' ', "_").lower()
+        # Called once an upload or delete is done, so the listing is current from here on
+        invalidate_documents(int(tag), "well")
         try:
             # Create entry to WellAttachment in event it does not already have one
             if not WellAttachment.objects.filter(well_tag_number=tag).exists():
@@ -310,14 +303,14 @@ class WellListAPIViewV1(ListAPIView):
         """Returns a different serializer class for admin users."""
         serializer_class = WellListSerializerV1
         if (self.request.user and self.request.user.is_authenticated and
-                self.request.user.groups.filter(name=WELLS_VIEWER_ROLE).exists()):
+                has_role(self.request.user, WELLS_VIEWER_ROLE)):
             serializer_class = WellListAdminSerializerV1
 
         return serializer_class
 
     def get_queryset(self):
         """ Excludes Unpublished wells for users without edit permissions """
-        if self.request.user.groups.filter(name=WELLS_EDIT_ROLE).exists():
+        if has_role(self.request.user, WELLS_EDIT_ROLE):
             qs = Well.objects.all()
         else:
             qs = Well.objects.all().exclude(well_publication_status='Unpublished')
@@ -355,7 +348,7 @@ class WellTagSearchAPIView(ListAPIView):
 
     def get_queryset(self):
         """ Excludes Unpublished wells for users without edit permissions """
-        if self.request.user.groups.filter(name=WELLS_EDIT_ROLE).exists():
+        if has_role(self.request.user, WELLS_EDIT_ROLE):
             qs = Well.objects.all()
         else:
             qs = Well.objects.all().exclude(well_publication_status='Unpublished')
@@ -409,7 +402,7 @@ class WellLocationListAPIViewV1(ListAPIView):
 
     def get_queryset(self):
         """ Excludes Unpublished wells for users without edit permissions """
-        if self.request.user.groups.filter(name=WELLS_EDIT_ROLE).exists():
+        if has_role(self.request.user, WELLS_EDIT_ROLE):
             qs = Well.objects.all()
         else:
             qs = Well.objects.all().exclude(well_publication_status='Unpublished')
@@ -493,7 +486,7 @@ class WellExportListAPIViewV1(ListAPIView):
     def get_queryset(self):
         """Excludes unpublished wells for users without edit permissions.
         """
-        if self.request.user.groups.filter(name=WELLS_EDIT_ROLE).exists():
+        if has_role(self.request.user, WELLS_EDIT_ROLE):
             qs = Well.objects.all()
         else:
             qs = Well.objects.all().exclude(well_publication_status='Unpublished')
@@ -525,7 +518,7 @@ class WellExportListAPIViewV1(ListAPIView):
         """Returns a different serializer class for admin users."""
         serializer_class = WellExportSerializerV1
         if (self.request.user and self.request.user.is_authenticated and
-                self.request.user.groups.filter(name=WELLS_VIEWER_ROLE).exists()):
+                has_role(self.request.user, WELLS_VIEWER_ROLE)):
             serializer_class = WellExportAdminSerializerV1
 
         return serializer_class
@@ -653,6 +646,7 @@ class DeleteWellDocument(APIView):
         # TODO: This should probably be "S3_WELL_BUCKET" but that will require a file migration
         client.delete_document(
             object_name, bucket_name=bucket_name, private=is_private)
+        invalidate_documents(int(well.well_tag_number), "well")
 
         return HttpResponse(status=204)
 
@@ -875,7 +869,7 @@ class WellScreens(ListAPIView):
             .prefetch_related('screen_set')
 
 
-        if not self.request.user.groups.filter(name=WELLS_EDIT_ROLE).exists():
+        if not has_role(self.request.user, WELLS_EDIT_ROLE):
             qs = qs.exclude(well_publication_status='Unpublished')
 
         # check if a point was supplied (note: actual filtering will be by
@@ -928,7 +922,7 @@ class WellLithology(ListAPIView):
     def get_queryset(self):
         qs = Well.objects.all()
 
-        if not self.request.user.groups.filter(name=WELLS_EDIT_ROLE).exists():
+        if not has_role(self.request.user, WELLS_EDIT_ROLE):
             qs = qs.exclude(well_publication_status='Unpublished')
 
         # allow comma separated list of wells by well tag number
@@ -954,7 +948,7 @@ class AddressGeocoder(APIView):
     """
     def get(self, request,**kwargs):
         GEOCODER_ADDRESS_URL = get_env_variable('GEOCODER_ADDRESS_API_BASE') + self.request.query_params.get('searchTag')
-        response = requests.get(GEOCODER_ADDRESS_URL)
+        response = get_geocoder().get(GEOCODER_ADDRESS_URL)
         # Check if the request was successful (status code 200)
         if response.status_code == 200:
             data = response.json()
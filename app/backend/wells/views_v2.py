@@ -27,7 +27,7 @@ from rest_framework import status, filters
 from rest_framework.exceptions import PermissionDenied, NotFound, ValidationError
 from rest_framework.generics import ListAPIView
 from rest_framework.response import Response
-from gwells.roles import WELLS_VIEWER_ROLE, WELLS_EDIT_ROLE
+from gwells.roles import WELLS_VIEWER_ROLE, WELLS_EDIT_ROLE, has_role
 from gwells.pagination import apiLimitedPagination, APILimitOffsetPagination
 from gwells.geojson import GeoJSONIterator
 
@@ -94,7 +94,7 @@ class WellLocationListV2APIView(ListAPIView):
 
     def get_queryset(self):
         """ Excludes Unpublished wells for users without edit permissions """
-        if self.request.user.groups.filter(name=WELLS_EDIT_ROLE).exists():
+        if has_role(self.request.user, WELLS_EDIT_ROLE):
             qs = Well.objects.all()
         else:
             qs = Well.objects.all().exclude(well_publication_status='Unpublished')
@@ -165,7 +165,7 @@ class WellLocationListV2APIView(ListAPIView):
         locations = self.filter_queryset(qs)
 
         # If the user can edit wells then we can add the `is_published` property to the response
-        if self.request.user.groups.filter(name=WELLS_EDIT_ROLE).exists():
+        if has_role(self.request.user, WELLS_EDIT_ROLE):
             locations = locations.extra(select={'is_published': "well_publication_status_code = 'Published'"})
             fields.append("is_published")
 
@@ -200,7 +200,7 @@ class WellAquiferListV2APIView(ListAPIView):
 
         qs = VerticalAquiferExtent.objects.filter(well=well).select_related('aquifer')
 
-        if not self.request.user.groups.filter(name=WELLS_EDIT_ROLE).exists():
+        if not has_role(self.request.user, WELLS_EDIT_ROLE):
             qs = qs.exclude(well__well_publication_status='Unpublished')
 
         return qs
@@ -344,14 +344,14 @@ class WellListAPIViewV2(ListAPIView):
         """Returns a different serializer class for admin users."""
         serializer_class = WellListSerializerV2
         if (self.request.user and self.request.user.is_authenticated and
-                self.request.user.groups.filter(name=WELLS_VIEWER_ROLE).exists()):
+                has_role(self.request.user, WELLS_VIEWER_ROLE)):
             serializer_class = WellListAdminSerializerV2
 
         return serializer_class
 
     def get_queryset(self):
         """ Excludes Unpublished wells for users without edit permissions """
-        if self.request.user.groups.filter(name=WELLS_EDIT_ROLE).exists():
+        if has_role(self.request.user, WELLS_EDIT_ROLE):
             qs = Well.objects.all()
         else:
             qs = Well.objects.all().exclude(well_publication_status='Unpublished')
@@ -422,7 +422,7 @@ class WellExportListAPIViewV2(ListAPIView):
     def get_queryset(self):
         """Excludes unpublished wells for users without edit permissions.
         """
-        if self.request.user.groups.filter(name=WELLS_EDIT_ROLE).exists():
+        if has_role(self.request.user, WELLS_EDIT_ROLE):
             qs = Well.objects.all()
         else:
             qs = Well.objects.all().exclude(well_publication_status='Unpublished')
@@ -454,7 +454,7 @@ class WellExportListAPIViewV2(ListAPIView):
         """Returns a different serializer class for admin users."""
         serializer_class = WellExportSerializerV2
         if (self.request.user and self.request.user.is_authenticated and
-                self.request.user.groups.filter(name=WELLS_VIEWER_ROLE).exists()):
+                has_role(self.request.user, WELLS_VIEWER_ROLE)):
             serializer_class = WellExportAdminSerializerV2
 
         return serializer_class
@@ -536,7 +536,7 @@ class WellSubsurface(ListAPIView):
                             'aquifer__subtype') \
             .prefetch_related('screen_set')
 
-        if not self.request.user.groups.filter(name=WELLS_EDIT_ROLE).exists():
+        if not has_role(self.request.user, WELLS_EDIT_ROLE):
             qs = qs.exclude(well_publication_status='Unpublished')
 
         # check if a point was supplied (note: actual filtering will be by
@@ -60,6 +60,9 @@ const ApiService = {
   presignedPutUrl (resource, record, filename, isPrivate) {
     return axios.get(`${resource}/${record}/presigned_put_url?filename=${filename}&private=${isPrivate}`)
   },
+  documentUploaded (resource, record) {
+    return axios.post(`${resource}/${record}/document_uploaded`)
+  },
   download (url, options) {
     options = { ...options, responseType: 'blob' }
     return axios.get(url, options).then((response) => {
@@ -189,6 +189,9 @@ export const useCommonStore = defineStore('common', {
                     const fileNameSplit = objectName.split('_')
                     const fileDocumentType = fileNameSplit.length > 2 ? `${fileNameSplit[0]}_${fileNameSplit[1]}` : fileNameSplit[0]
                     ApiService.incrementFileCount(`wells/${recordId}`, fileDocumentType)
+                  } else {
+                    // so the new document is listed straight away
+                    ApiService.documentUploaded(documentType, recordId)
                   }
                 })
                 .catch(error => {
@@ -0,0 +1,95 @@
+# benchmark-export-sanitise.py
+#
+# Micro-benchmark of the string sanitisation done for every cell of the nightly well export
+# (wells/management/commands/export.py), comparing the original per-character loop with the
+# current implementation over a representative set of rows.
+#
+# Run from the backend directory:
+#   python ../scripts/benchmark-export-sanitise.py
+
+import datetime
+import os
+import random
+import string
+import sys
+import timeit
+from decimal import Decimal
+
+import django
+
+# Set up Django environment
+sys.path.insert(0, os.getcwd())
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "gwells.settings")
+django.setup()
+
+from wells.management.commands.export import sanitise_record
+
+ROWS = 20000
+REPEAT = 3
+
+WORDS = ('well', 'drilled', 'casing', 'sand', 'gravel', 'clay', 'water', 'bearing', 'static', 'level',
+         'pump', 'test', 'gpm', 'ft', 'bedrock', 'fractured', 'granite', 'Québec', 'naïve', '°C')
+
+
+def legacy_sanitise_record(record):
+    """ The per-character implementation, as it was before. """
+    values = []
+    num_values = 0
+    for col, value in enumerate(record):
+        if not (value == "" or value is None):
+            num_values += 1
+        if type(value) is str:
+            v = ''.join([s for s in value if s in string.printable])
+            if v.startswith('='):
+                v = '\'{}'.format(v)
+            values.append(v)
+        else:
+            values.append(value)
+    return values, num_values
+
+
+def text(rng, words):
+    """ Free text as found in comments and descriptions, with the odd control character. """
+    value = ' '.join(rng.choice(WORDS) for _ in range(words))
+    if rng.random() < 0.1:
+        value += '\x0b\x00\r\n'
+    return value
+
+
+def fixture(rows):
+    """ Rows shaped like the well sheet: ids, codes, numbers, dates, addresses and free text. """
+    rng = random.Random(42)
+    return [
+        (
+            tag,
+            rng.choice(('NEW', 'ALTERATION', 'CLOSURE')),
+            rng.choice(('DOM', 'IRR', 'COM', None)),
+            '{} Main St'.format(rng.randint(1, 9999)),
+            rng.choice(('Victoria', 'Kelowna', 'Prince George', '')),
+            Decimal('{}.{}'.format(rng.randint(1, 500), rng.randint(0, 99))),
+            datetime.date(2000 + rng.randint(0, 24), rng.randint(1, 12), rng.randint(1, 28)),
+            text(rng, rng.randint(0, 60)),
+            text(rng, rng.randint(0, 30)),
+            rng.choice(('=SUM(A1)', 'Y', 'N', None)),
+        )
+        for tag in range(rows)
+    ]
+
+
+def rows_per_second(function, rows):
+    seconds = min(timeit.repeat(lambda: [function(record) for record in rows], number=1, repeat=REPEAT))
+    return len(rows) / seconds
+
+
+def main():
+    rows = fixture(ROWS)
+    assert [legacy_sanitise_record(record) for record in rows] == [sanitise_record(record) for record in rows]
+    before = rows_per_second(legacy_sanitise_record, rows)
+    after = rows_per_second(sanitise_record, rows)
+    print('before: {:>12,.0f} rows/s'.format(before))
+    print('after:  {:>12,.0f} rows/s'.format(after))
+    print('speedup: {:.1f}x'.format(after / before))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# benchmark-merge-series.py
+#
+# Micro-benchmark of merging depth interval sets while stacking wells (wells.stack.merge_series),
+# comparing the original pairwise overlap check with the current implementation on lithology sized
+# series.
+#
+# Run from the backend directory:
+#   python ../scripts/benchmark-merge-series.py
+
+import os
+import random
+import sys
+import timeit
+
+import django
+
+# Set up Django environment
+sys.path.insert(0, os.getcwd())
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "gwells.settings")
+django.setup()
+
+from wells.stack import merge_series, overlap
+
+REPEAT = 3
+SIZES = (10, 100, 500, 1000)
+
+
+def legacy_merge_series(prev_series, next_series):
+    """ The pairwise implementation, as it was before. """
+    def series_overlaps(record, record_set):
+        for other_record in record_set:
+            if overlap((record.get('start'), record.get('end')),
+                       (other_record.get('start'), other_record.get('end'))):
+                return True
+        return False
+
+    prev_series = [record for record in prev_series if not series_overlaps(record, next_series)]
+    new = prev_series + next_series
+    new.sort(key=lambda record: (record.get('start'), record.get('end')))
+    return new
+
+
+def lithology(rng, intervals, depth=0):
+    """ A lithology log: consecutive intervals of varying thickness, as serializer data. """
+    series = []
+    for _ in range(intervals):
+        thickness = rng.randint(1, 200) / 4
+        series.append({'start': '{:.2f}'.format(depth), 'end': '{:.2f}'.format(depth + thickness),
+                       'lithology_raw_data': 'sand and gravel'})
+        depth += thickness
+    return series
+
+
+def seconds(function, prev, incoming):
+    return min(timeit.repeat(lambda: function(prev, incoming), number=1, repeat=REPEAT))
+
+
+def main():
+    rng = random.Random(42)
+    print('{:<10} {:>10} {:>14} {:>14} {:>8}'.format(
+        'scenario', 'intervals', 'before (ms)', 'after (ms)', 'speedup'))
+    for size in SIZES:
+        prev = lithology(rng, size)
+        scenarios = (
+            # An alteration re-logging a well that already has a long log.
+            ('relogged', lithology(rng, size)),
+            # An alteration deepening a well, logging below the existing log.
+            ('deepened', lithology(rng, size, depth=100000)),
+        )
+        for name, incoming in scenarios:
+            assert legacy_merge_series(prev, incoming) == merge_series(prev, incoming)
+            before = seconds(legacy_merge_series, prev, incoming)
+            after = seconds(merge_series, prev, incoming)
+            print('{:<10} {:>10} {:>14.2f} {:>14.2f} {:>7.1f}x'.format(
+                name, size, before * 1000, after * 1000, before / after))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,12 @@
 import csv
+import json
 import logging
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from zipfile import ZipFile, BadZipFile
 from io import BytesIO
-from time import sleep
+from time import monotonic, sleep
 import os
 from pathlib import Path
 import tarfile
@@ -17,10 +20,21 @@ import rasterio
 import geopandas as gpd
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import Retry
 import click
-from thefuzz import fuzz
 import bcdata
 
+# score addresses with the GWELLS backend's scoring functions, so QA scores match the scores GWELLS
+# gives wells as they are saved
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "backend"))
+from wells.scoring import (  # noqa: E402
+    STREET_ABBREVIATIONS_RE,
+    STREET_ADDRESS_FIELDS,
+    abbreviate_street_type,
+    token_set_scores,
+)
+
 
 """
 BC Geocoder ADDRESS API
@@ -46,6 +60,8 @@ WELLS_URL = "https://s3.ca-central-1.amazonaws.com/gwells-export/export/v2/gwell
 
 # bc geocoder endpoint of interest
 GEOCODER_ENDPOINT = "https://geocoder.api.gov.bc.ca/sites/nearest.json"
+# requests made to the geocoder at once
+GEOCODER_WORKERS = 8
 ADDRESS_COLUMNS = [
     "fullAddress",
     "siteName",
@@ -205,6 +221,70 @@ def get_gwells(outfile=os.path.join("data", WELLS_FILENAME)):
         return df
 
 
+class RateLimiter:
+    """
+    Shared by the geocoding threads: holds back requests for a while once the geocoder's
+    RateLimit-Remaining header says the limit of 1000 requests/min is nearly used up, or once
+    a request is turned away (429, for at least its Retry-After seconds).
+    """
+
+    def __init__(self, reserve=30, pause=2):
+        self.reserve = reserve
+        self.pause = pause
+        self.paused_until = 0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            delay = self.paused_until - monotonic()
+        if delay > 0:
+            sleep(delay)
+
+    def update(self, response):
+        pause = None
+        if response.status_code == 429:
+            pause = self.pause
+            try:
+                pause = max(pause, int(response.headers.get("Retry-After")))
+            except (TypeError, ValueError):
+                pass
+        else:
+            try:
+                remaining = int(response.headers.get("RateLimit-Remaining"))
+            except (TypeError, ValueError):
+                return
+            if remaining < self.reserve:
+                pause = self.pause
+        if pause:
+            LOG.info("Approaching API limit, pausing requests for %s seconds to refresh.", pause)
+            with self.lock:
+                self.paused_until = max(self.paused_until, monotonic() + pause)
+
+
+def geocoder_session(pool_size=GEOCODER_WORKERS):
+    """
+    A requests.Session that keeps up to pool_size connections to the geocoder open,
+    retrying requests that fail while the geocoder is briefly unavailable
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=pool_size,
+        max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504]),
+    )
+    session.mount("https://", adapter)
+    return session
+
+
+SESSION = geocoder_session()
+RATE_LIMITER = RateLimiter()
+
+
+def coordinate_key(x, y):
+    """Cache key for a location: coordinates rounded to 5 decimal places (about a metre)"""
+    return "{:.5f},{:.5f}".format(float(x), float(y))
+
+
 def reverse_geocode(
     x,
     y,
@@ -212,6 +292,9 @@ def reverse_geocode(
     distance_start=200,
     distance_increment=200,
     distance_max=2000,
+    session=SESSION,
+    limiter=RATE_LIMITER,
+    max_retries=5,
 ):
     """
     Provided a location as x/y coordinates (EPSG:4326), request an address
@@ -222,41 +305,51 @@ def reverse_geocode(
 
     A dict with 'distance' = 99999 is returned if no result is found.
 
-    This could sped up by:
-    - just make the request using the max distance and derive distance between
-      source point and returned location
-    - make requests either in parallel or async
-
+    Requests reuse the connections of session, and wait for limiter (shared
+    by every thread geocoding at once). A request turned away by the rate
+    limit (429) is tried again after the limiter's pause, up to max_retries
+    times. If the geocoder stays busy or is unavailable (5xx), HTTPError is
+    raised rather than searching further out, so the location isn't cached
+    as having no address.
     """
-    result = False
+    retries = 0
     distance = distance_start
     # expand the search distance until we get a result or hit the max distance
-    while result is False and distance <= distance_max:
+    while distance <= distance_max:
         params = {
-            "point": str(x) + "," + str(y),
+            "point": coordinate_key(x, y),
             "apikey": geocoder_api_key,
             "outputFormat": "json",
             "maxDistance": distance,
         }
-        r = requests.get(GEOCODER_ENDPOINT, params=params)
+        limiter.wait()
+        r = session.get(GEOCODER_ENDPOINT, params=params, timeout=30)
         LOG.debug(r.request.url)
-
-        # pause for 2s per request if near limit of 1000 requests/min
-        if int(r.headers["RateLimit-Remaining"]) < 30:
-            LOG.info("Approaching API limit, sleeping for 2 seconds to refresh.")
-            sleep(2)
+        limiter.update(r)
         if r.status_code == 200:
-            result = True
-        else:
-            distance = distance + distance_increment
-    if r.status_code == 200:
-        address = r.json()["properties"]
-        address["distance"] = distance
-        return address
-    else:
-        empty_result = dict([(k, "") for k in ADDRESS_COLUMNS])
-        empty_result["distance"] = 99999
-        return empty_result
+            address = r.json()["properties"]
+            address["distance"] = distance
+            return address
+        if r.status_code == 429 and retries < max_retries:
+            retries += 1
+            continue
+        if r.status_code == 429 or r.status_code >= 500:
+            r.raise_for_status()
+        distance = distance + distance_increment
+    empty_result = dict([(k, "") for k in ADDRESS_COLUMNS])
+    empty_result["distance"] = 99999
+    return empty_result
+
+
+def load_geocode_cache(cache_file):
+    """Reverse geocoded addresses from earlier runs, by coordinate_key"""
+    cache = {}
+    if os.path.exists(cache_file):
+        with open(cache_file) as f:
+            for line in f:
+                entry = json.loads(line)
+                cache[entry["key"]] = entry["address"]
+    return cache
 
 
 def pidmatch(wells_gdf):
@@ -386,10 +479,6 @@ def agriculture_overlays(in_gdf):
     return ag_overlays
 
 
-def compare_strings(x):
-    return fuzz.token_set_ratio(x[0], x[1])
-
-
 @click.group()
 def cli():
     """
@@ -420,7 +509,19 @@ def download():
     default=os.path.join("data", "wells_geocoded.csv"),
     help="Name of output file.",
 )
-def geocode(geocoder_api_key, out_file):
+@click.option(
+    "--cache_file",
+    "-c",
+    default=os.path.join("data", "reverse_geocode_cache.jsonl"),
+    help="Addresses found by earlier runs, by location. Delete it to geocode every well again.",
+)
+@click.option(
+    "--workers",
+    "-w",
+    default=GEOCODER_WORKERS,
+    help="Number of requests to make at once.",
+)
+def geocode(geocoder_api_key, out_file, cache_file, workers):
     """Reverse geocode well locations with BC Geocoder API"""
     # only process if output file does not already exist
     if not os.path.exists(out_file):
@@ -432,21 +533,55 @@ def geocode(geocoder_api_key, out_file):
             ["well_tag_number", "longitude_Decdeg", "latitude_Decdeg"]
         ].to_dict("records")
 
-        LOG.info("Reverse geocoding well locations")
+        # locations geocoded by earlier runs are not requested again
+        cache = load_geocode_cache(cache_file)
+        keys = [
+            coordinate_key(row["longitude_Decdeg"], row["latitude_Decdeg"])
+            for row in well_locations
+        ]
+        missing = list(dict.fromkeys(key for key in keys if key not in cache))
+        LOG.info(
+            "Reverse geocoding %s well locations (%s cached)",
+            len(missing),
+            len(set(keys)) - len(missing),
+        )
+
+        def lookup(key):
+            x, y = key.split(",")
+            try:
+                return key, reverse_geocode(x, y, geocoder_api_key)
+            except requests.exceptions.RequestException as e:
+                LOG.warning("Could not reverse geocode %s: %s", key, e)
+                return key, None
+
+        failed = 0
+
+        with open(cache_file, "a") as f, ThreadPoolExecutor(max_workers=workers) as executor:
+            with click.progressbar(
+                executor.map(lookup, missing), length=len(missing)
+            ) as bar:
+                for key, address in bar:
+                    # failed lookups aren't cached, so the next run requests them again
+                    if address is None:
+                        failed += 1
+                        continue
+                    cache[key] = address
+                    f.write(json.dumps({"key": key, "address": address}) + "\n")
+
+        if failed:
+            raise click.ClickException(
+                "{} locations could not be reverse geocoded, run again to retry them".format(failed)
+            )
+
         with open(out_file, "w", newline="") as csvfile:
             writer = csv.DictWriter(
                 csvfile, fieldnames=ADDRESS_COLUMNS + ["well_tag_number"]
             )
             writer.writeheader()
-            with click.progressbar(well_locations) as bar:
-                for row in bar:
-                    r = reverse_geocode(
-                        row["longitude_Decdeg"],
-                        row["latitude_Decdeg"],
-                        geocoder_api_key,
-                    )
-                    r["well_tag_number"] = row["well_tag_number"]
-                    writer.writerow(r)
+            for row, key in zip(well_locations, keys):
+                r = dict(cache[key])
+                r["well_tag_number"] = row["well_tag_number"]
+                writer.writerow(r)
 
 
 @cli.command()
@@ -541,54 +676,48 @@ def qa():
         ""
     )
     scoring["city"] = scoring["city"].fillna("")
-    # lowercasify the scoring address strings
-    scoring["street_address"] = scoring["street_address"].str.lower()
-    # abbreviate road types to match geocoder
-    street_abbreviations = {
-        "road": "rd",
-        "drive": "dr",
-        "avenue": "ave",
-        "highway": "hwy",
-        "street": "st",
-        "boulevard": "blvd",
-        "crescent": "cres",
-        "frontage": "frtg",
-        "place": "pl",
-        "court": "crt",
-        "terrace": "terr",
-        "lookout": "lkout",
-        "heights": "hts",
-    }
-    for k in street_abbreviations:
-        scoring["street_address"] = scoring["street_address"].str.replace(
-            k, street_abbreviations[k]
-        )
-    # combine geocoder number/name/type/direction into a single slug
-    t = scoring[["civicNumber", "streetName", "streetType", "streetDirection"]]
-    scoring["streetAddress"] = t.apply(
-        lambda x: " ".join(x.dropna().astype(str).values), axis=1
+    # lowercasify the scoring address strings and abbreviate road types to
+    # match geocoder
+    scoring["street_address"] = (
+        scoring["street_address"]
+        .str.lower()
+        .str.replace(STREET_ABBREVIATIONS_RE, abbreviate_street_type, regex=True)
     )
+    # combine geocoder number/name/type/direction into a single slug
+    street_address = scoring[STREET_ADDRESS_FIELDS[0]].fillna("").astype(str)
+    for field in STREET_ADDRESS_FIELDS[1:]:
+        street_address = street_address + " " + scoring[field].fillna("").astype(str)
+    scoring["streetAddress"] = street_address.str.replace(
+        r"\s+", " ", regex=True
+    ).str.strip()
+
+    # Each score is the token set ratio of two columns, computed for all rows
+    # at once (on all cores) rather than row by row.
 
     #
     # "score_address"
     #
     # compares gwells address to geocoder address
-    t = scoring[["street_address", "streetAddress"]]
-    scoring["score_address"] = t.apply(compare_strings, axis=1)
+    scoring["score_address"] = token_set_scores(
+        scoring["street_address"].tolist(), scoring["streetAddress"].tolist()
+    )
 
     #
     # "score_location_description"
     #
     # compares well_location_description with geocoder full street address
-    t = scoring[["well_location_description", "fullAddress"]]
-    scoring["score_location_description"] = t.apply(compare_strings, axis=1)
+    scoring["score_location_description"] = token_set_scores(
+        scoring["well_location_description"].tolist(),
+        scoring["fullAddress"].fillna("").tolist(),
+    )
 
     #
     # "city_score"
     #
     # compares gwells city to geocoder locality
-    t = scoring[["city", "localityName"]]
-    scoring["score_city"] = t.apply(compare_strings, axis=1)
+    scoring["score_city"] = token_set_scores(
+        scoring["city"].tolist(), scoring["localityName"].fillna("").tolist()
+    )
 
     # extract only columns of interest
     scoring = scoring[